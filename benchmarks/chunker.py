@@ -0,0 +1,66 @@
+"""Micro-benchmark for bot.chains.chunker on multi-megabyte inputs.
+
+Usage:
+    uv run python benchmarks/chunker.py [--approximate]
+"""
+
+import argparse
+import time
+
+from bot.chains.chunker import chunk_spans
+from bot.tokens import ApproximateTokenizer
+from bot.tokens import get_tokenizer
+
+EN_SENTENCE = "The quick brown fox jumps over the lazy dog while the market closes higher. "
+JA_SENTENCE = "今日は東京で新しい展示会が開かれ、多くの人が訪れました。"
+
+
+def make_text(sentence: str, size_mb: int) -> str:
+    repeats = size_mb * 1024 * 1024 // len(sentence.encode("utf-8"))
+    paragraphs = [sentence * 20] * (repeats // 20)
+    return "\n\n".join(paragraphs)
+
+
+def chunk_on_delimiter(text: str, delimiter: str = " ", max_length: int = 200_000) -> list[str]:
+    # the previous character-based chunker, for comparison
+    chunks = []
+    current_chunk = ""
+    for word in text.split(delimiter):
+        if len(current_chunk) + len(word) + len(delimiter) <= max_length:
+            current_chunk += word + delimiter
+        else:
+            chunks.append(current_chunk)
+            current_chunk = word + delimiter
+    if current_chunk:
+        chunks.append(current_chunk)
+    return chunks
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--approximate", action="store_true", help="estimate tokens instead of using tiktoken")
+    args = parser.parse_args()
+
+    tokenizer = ApproximateTokenizer() if args.approximate else get_tokenizer()
+    print(f"tokenizer: {tokenizer.__class__.__name__}")
+
+    for name, sentence in [("en", EN_SENTENCE), ("ja", JA_SENTENCE)]:
+        for size_mb in [1, 4, 16]:
+            text = make_text(sentence, size_mb)
+
+            start = time.perf_counter()
+            n_chunks = sum(1 for _ in chunk_spans(text, max_tokens=8_000, overlap_tokens=200, tokenizer=tokenizer))
+            elapsed = time.perf_counter() - start
+
+            start = time.perf_counter()
+            n_old_chunks = len(chunk_on_delimiter(text))
+            old_elapsed = time.perf_counter() - start
+
+            print(
+                f"{name} {size_mb:>2} MB: {elapsed:6.2f}s ({size_mb / elapsed:6.2f} MB/s, {n_chunks} chunks), "
+                f"chunk_on_delimiter: {old_elapsed:6.2f}s ({n_old_chunks} chunks)"
+            )
+
+
+if __name__ == "__main__":
+    main()
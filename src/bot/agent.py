@@ -1,12 +1,14 @@
 from __future__ import annotations
 
+import os
 import textwrap
+from typing import Any
 
 from agents import Agent
 from agents import Runner
 from agents import handoff
 from agents.extensions import handoff_filters
-from agents.mcp import MCPServerStdio
+from agents.result import RunResultBase
 from loguru import logger
 from telegram import Message
 from telegram import Update
@@ -18,8 +20,19 @@ from telegram.ext import filters
 from bot.utils import async_load_url
 
 from .cache import get_cache_from_env
+from .callbacks.streaming import StreamingReply
+from .callbacks.streaming import is_streaming_enabled
+from .callbacks.streaming import stream_text_deltas
 from .callbacks.utils import get_message_text
 from .config import ServiceParams
+from .context import ContextWindow
+from .documents import format_content
+from .documents import format_reference
+from .documents import read_document
+from .documents import save_document
+from .mcp_servers import get_mcp_server_pool
+from .memory import get_idle_ttl
+from .memory import get_memory_store
 from .model import get_openai_model
 from .model import get_openai_model_settings
 from .utils import parse_url
@@ -54,13 +67,17 @@ class AgentService:
 
         agent_params = params["agent"]
 
+        # agents configured with the same server share one process
+        self.mcp_servers = get_mcp_server_pool()
+
         self.handoff_agents = [
             Agent(
                 name=agent["name"],
                 instructions=agent["instructions"],
                 model=get_openai_model(),
                 model_settings=get_openai_model_settings(),
-                mcp_servers=[MCPServerStdio(params=p) for p in agent["mcp_servers"].values()],
+                mcp_servers=[self.mcp_servers.get(n, p) for n, p in agent["mcp_servers"].items()],
+                tools=[read_document],
             )
             for agent in params["handoffs"]
         ]
@@ -70,34 +87,65 @@ class AgentService:
             instructions=agent_params["instructions"],
             model=get_openai_model(),
             model_settings=get_openai_model_settings(),
-            mcp_servers=[MCPServerStdio(params=p) for p in agent_params["mcp_servers"].values()],
+            mcp_servers=[self.mcp_servers.get(n, p) for n, p in agent_params["mcp_servers"].items()],
+            tools=[read_document],
             handoffs=[handoff(agent, input_filter=handoff_filters.remove_all_tools) for agent in self.handoff_agents],
         )
 
-        # Set the current agent to the triage agent
-        self._current_agent = self.triage_agent
+        # agents by name, the current agent of each chat is stored by name next to its memory
+        self.agents = {agent.name: agent for agent in [self.triage_agent, *self.handoff_agents]}
 
         # max_cache_size is the maximum number of messages to keep in the cache
         self.max_cache_size = max_cache_size
 
         # message.chat.id -> list of messages
+        self.memory = get_memory_store()
         self.cache = get_cache_from_env()
 
-    async def connect(self) -> None:
-        for mcp_server in self.triage_agent.mcp_servers:
-            await mcp_server.connect()
+        # keeps the prompt within the token budget, older turns are folded into a summary
+        self.context = ContextWindow(self.cache)
+
+    async def load_memory(self, chat_id: int) -> list[Any]:
+        messages = await self.memory.get(chat_id, limit=self.max_cache_size)
+        if messages:
+            return remove_tool_messages(messages)
+
+        # older versions stored the whole memory as one value at bot:{chat_id}
+        legacy_key = f"bot:{chat_id}"
+        legacy_messages = await self.cache.get(legacy_key)
+        if not legacy_messages:
+            logger.info("No memory found for chat {chat_id}", chat_id=chat_id)
+            return []
+
+        messages = remove_tool_messages(legacy_messages)[-self.max_cache_size :]
+        await self.memory.append(chat_id, messages, max_items=self.max_cache_size)
+        await self.cache.delete(legacy_key)
+        logger.info("Migrated {n} items of chat {chat_id} to the memory store", n=len(messages), chat_id=chat_id)
+        return messages
+
+    async def get_current_agent(self, chat_id: int) -> Agent:
+        # the chat can move to another worker, which must see the agent it switched to
+        name = await self.cache.get(f"bot:{chat_id}:agent", local=False)
+        if name is None:
+            return self.triage_agent
+
+        agent = self.agents.get(name)
+        if agent is None:
+            logger.warning("Unknown agent {name} for chat {chat_id}", name=name, chat_id=chat_id)
+            return self.triage_agent
+        return agent
+
+    async def set_current_agent(self, chat_id: int, agent: Agent) -> None:
+        await self.cache.set(f"bot:{chat_id}:agent", agent.name, ttl=get_idle_ttl(), local=False)
 
-        for agent in self.handoff_agents:
-            for mcp_server in agent.mcp_servers:
-                await mcp_server.connect()
+    async def connect(self) -> None:
+        # servers resolved by npx or uvx can take minutes to start, the bot does not wait for them
+        if os.getenv("MCP_WARM_START", "true").lower() != "false":
+            self.mcp_servers.start()
 
     async def cleanup(self) -> None:
-        for mcp_server in self.triage_agent.mcp_servers:
-            await mcp_server.cleanup()
-
-        for agent in self.handoff_agents:
-            for mcp_server in agent.mcp_servers:
-                await mcp_server.cleanup()
+        await self.context.close()
+        await self.mcp_servers.close()
 
     def get_command_handler(self, filters: filters.BaseFilter) -> CommandHandler:
         return CommandHandler(command=self.command, callback=self.handle_command, filters=filters)
@@ -105,18 +153,23 @@ class AgentService:
     def get_message_handler(self, filters: filters.BaseFilter) -> MessageHandler:
         return MessageHandler(filters=filters, callback=self.handle_reply)
 
-    async def load_url_content(self, message_text: str) -> str:
+    async def load_url_content(self, message_text: str) -> tuple[str, str]:
+        """Replace the URL in the message with its content.
+
+        Returns:
+            The message with the full content for this turn, and the message with a reference to the stored
+            document and a digest for the memory
+        """
         parsed_url = parse_url(message_text)
         if not parsed_url:
-            return message_text
+            return message_text, message_text
 
         url_content = await async_load_url(parsed_url)
-        message_text = message_text.replace(
-            parsed_url,
-            f"[URL content from {parsed_url}]:\n'''\n{url_content}\n'''\n[END of URL content]\n",
-            1,
+        document = await save_document(parsed_url, url_content)
+        return (
+            message_text.replace(parsed_url, format_content(parsed_url, url_content), 1),
+            message_text.replace(parsed_url, format_reference(document), 1),
         )
-        return message_text
 
     async def handle_message(
         self,
@@ -132,45 +185,52 @@ class AgentService:
         if not message_text:
             return
 
-        # Get the memory for the current chat (group or user)
-        key = f"bot:{message.chat.id}"
-        messages = await self.cache.get(key)
-        if messages is None:
-            messages = []
-            logger.info("No key found for {key}", key=key)
+        chat_id = message.chat.id
+        agent = self.triage_agent if use_triage_agent else await self.get_current_agent(chat_id)
+
+        # show a placeholder right away, it is edited as the answer streams in
+        async with StreamingReply(message, title=agent.name) as reply:
+            streaming = is_streaming_enabled()
+            if streaming:
+                await reply.start()
 
-        # remove all tool messages from the memory
-        messages = remove_tool_messages(messages)
+            # Get the memory for the current chat (group or user)
+            messages = await self.load_memory(chat_id)
 
-        # replace the URL with the content
-        message_text = await self.load_url_content(message_text)
+            # replace the URL with the content, the memory only keeps a reference to it
+            message_text, stored_text = await self.load_url_content(message_text)
 
-        # add the user message to the list of messages
-        messages.append(
-            {
+            # add the user message to the list of messages
+            messages.append(
+                {
+                    "role": "user",
+                    "content": message_text,
+                }
+            )
+            user_message = {
                 "role": "user",
-                "content": message_text,
+                "content": stored_text,
             }
-        )
+            messages = await self.context.build(chat_id, messages)
 
-        # send the messages to the agent
-        if use_triage_agent:
-            self._current_agent = self.triage_agent
-        result = await Runner.run(self._current_agent, input=messages)
+            # send the messages to the agent
+            if streaming:
+                streamed_result = Runner.run_streamed(agent, input=messages)
+                await reply.stream(stream_text_deltas(streamed_result))
+                result: RunResultBase = streamed_result
+            else:
+                result = await Runner.run(agent, input=messages)
 
-        logger.info("New items: {new_items}", new_items=result.new_items)
+            logger.info("New items: {new_items}", new_items=result.new_items)
 
-        # update the memory
-        input_items = result.to_input_list()
-        messages = remove_tool_messages(messages)
-        if len(input_items) > self.max_cache_size:
-            input_items = input_items[-self.max_cache_size :]
-        await self.cache.set(key, input_items)
+            # append only this turn to the memory, without tool messages
+            new_items = remove_tool_messages([item.to_input_item() for item in result.new_items])
+            await self.memory.append(chat_id, [user_message, *new_items], max_items=self.max_cache_size)
 
-        # handoff to another agent
-        self._current_agent = result.last_agent
+            # handoff to another agent, for this chat only
+            await self.set_current_agent(chat_id, result.last_agent)
 
-        await message.reply_text(result.final_output)
+            await reply.finish(str(result.final_output))
 
     async def handle_command(self, update: Update, _: ContextTypes.DEFAULT_TYPE) -> None:
         message = update.message
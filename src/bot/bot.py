@@ -1,7 +1,10 @@
 from __future__ import annotations
 
+import asyncio
 import os
+from enum import Enum
 from typing import Annotated
+from typing import Final
 
 import typer
 from loguru import logger
@@ -12,16 +15,54 @@ from telegram.ext import MessageHandler
 from telegram.ext import filters
 
 from .agent import AgentService
+from .cache import close_redis_client
 from .callbacks import ErrorCallback
 from .callbacks import HelpCallback
 from .callbacks import TranslationCallback
 from .callbacks import echo_callback
 from .callbacks import file_callback
 from .callbacks import format_callback
+from .callbacks import memory_stats_callback
 from .callbacks import query_ticker_callback
 from .callbacks import search_youtube_callback
 from .callbacks import summarize_callback
+from .cluster import build_ingress_application
+from .cluster import serve_worker
 from .config import load_config
+from .executor import shutdown_executors
+from .loaders import close_http_client
+from .loaders import get_browser_pool
+from .monitor import get_loop_monitor
+from .monitor import get_metrics_server
+from .monitor import instrument_handlers
+from .pages import close_telegraph_client
+from .pages import get_telegraph_client
+from .processor import ChatUpdateProcessor
+from .processor import create_update_queue
+from .ratelimit import Priority
+from .ratelimit import TelegramRateLimiter
+from .ratelimit import prioritize_handlers
+from .symbols import get_symbol_index
+from .webhook import serve_webhook
+
+# quick lookups go ahead of long summarization jobs when sends or model calls have to wait
+COMMAND_PRIORITIES: Final[dict[str, Priority]] = {
+    "help": Priority.HIGH,
+    "t": Priority.HIGH,
+    "yt": Priority.HIGH,
+    "echo": Priority.HIGH,
+    "s": Priority.LOW,
+    "f": Priority.LOW,
+}
+
+
+class Role(str, Enum):
+    # receive and process updates in this process
+    ALL = "all"
+    # receive updates and publish them to the workers through Redis
+    INGRESS = "ingress"
+    # process the updates of the partitions this worker owns
+    WORKER = "worker"
 
 
 def get_chat_filter() -> filters.BaseFilter:
@@ -41,18 +82,46 @@ def get_bot_token() -> str:
     return token
 
 
-def run_bot(config_file: Annotated[str, typer.Option("-c", "--config")] = "config/default.json") -> None:  # noqa
+def build_application(config_file: str) -> Application:  # noqa
+    """Build the application with every handler registered, shared by polling and webhook mode."""
     chat_filter = get_chat_filter()
 
     service = AgentService(load_config(config_file))
 
     async def connect(application: Application) -> None:
+        await get_loop_monitor().start()
+        metrics_server = get_metrics_server()
+        if metrics_server is not None:
+            await metrics_server.start()
         await service.connect()
+        await get_browser_pool().warm_up()
+        await get_telegraph_client().start()
+        await get_symbol_index().start()
 
     async def cleanup(application: Application) -> None:
         await service.cleanup()
-
-    app = Application.builder().token(get_bot_token()).post_init(connect).post_shutdown(cleanup).build()
+        await get_symbol_index().stop()
+        await get_browser_pool().stop()
+        await close_http_client()
+        await close_telegraph_client()
+        await close_redis_client()
+        metrics_server = get_metrics_server()
+        if metrics_server is not None:
+            await metrics_server.stop()
+        await get_loop_monitor().stop()
+        shutdown_executors()
+
+    app = (
+        Application.builder()
+        .token(get_bot_token())
+        .concurrent_updates(ChatUpdateProcessor())
+        .rate_limiter(TelegramRateLimiter())
+        # bounded by the updates not yet processed, so a burst waits for room instead of piling up in memory
+        .update_queue(create_update_queue())
+        .post_init(connect)
+        .post_shutdown(cleanup)
+        .build()
+    )
 
     helps = [
         "code: https://github.com/narumiruna/bot",
@@ -83,10 +152,39 @@ def run_bot(config_file: Annotated[str, typer.Option("-c", "--config")] = "confi
         ]
     )
 
+    developer_chat_id = os.getenv("DEVELOPER_CHAT_ID")
+    if developer_chat_id:
+        app.add_handler(CommandHandler("memstats", memory_stats_callback, filters=filters.Chat(int(developer_chat_id))))
+
     # Message handlers should be placed at the end.
     app.add_handler(service.get_message_handler(filters=chat_filter & filters.REPLY))
     app.add_handler(MessageHandler(filters=chat_filter, callback=file_callback))
 
-    app.add_error_handler(ErrorCallback(os.getenv("DEVELOPER_CHAT_ID")))
-
-    app.run_polling(allowed_updates=Update.ALL_TYPES)
+    app.add_error_handler(ErrorCallback(developer_chat_id))
+    prioritize_handlers(app, COMMAND_PRIORITIES)
+    instrument_handlers(app)
+    return app
+
+
+def run_bot(
+    config_file: Annotated[str, typer.Option("-c", "--config")] = "config/default.json",
+    webhook_url: Annotated[
+        str | None,
+        typer.Option(
+            help="Public URL of the webhook, receive updates by webhook instead of polling", envvar="WEBHOOK_URL"
+        ),
+    ] = None,
+    host: Annotated[str, typer.Option(help="Address the webhook server listens on", envvar="WEBHOOK_HOST")] = "0.0.0.0",
+    port: Annotated[int, typer.Option(help="Port the webhook server listens on", envvar="WEBHOOK_PORT")] = 8080,
+    role: Annotated[Role, typer.Option(help="Run everything, only receive updates or only process them")] = Role.ALL,
+) -> None:
+    if role == Role.WORKER:
+        asyncio.run(serve_worker(build_application(config_file)))
+        return
+
+    app = build_ingress_application(get_bot_token()) if role == Role.INGRESS else build_application(config_file)
+
+    if webhook_url:
+        asyncio.run(serve_webhook(app, webhook_url, host=host, port=port))
+    else:
+        app.run_polling(allowed_updates=Update.ALL_TYPES)
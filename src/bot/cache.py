@@ -1,20 +1,344 @@
+from __future__ import annotations
+
+import asyncio
+import json
 import os
+import time
+import zlib
+from collections import OrderedDict
+from collections.abc import Awaitable
+from collections.abc import Callable
 from functools import cache
+from typing import Any
 from typing import Final
+from typing import Generic
+from typing import TypeVar
+from urllib.parse import parse_qsl
+from urllib.parse import urlencode
+from urllib.parse import urlsplit
+from urllib.parse import urlunsplit
 
-from aiocache import BaseCache
-from aiocache import Cache
+import redis.asyncio as redis
 from loguru import logger
 
-DEFAULT_REDIS_URL: Final[str] = "redis://localhost:6379/0?pool_max_size=1"
+DEFAULT_REDIS_URL: Final[str] = "redis://localhost:6379/0"
 DEFAULT_MEMORY_URL: Final[str] = "memory://"
+DEFAULT_POOL_SIZE: Final[int] = 16
+DEFAULT_L1_MAX_BYTES: Final[int] = 64 * 1024 * 1024
+DEFAULT_L1_TTL: Final[int] = 30
+# values at least this large are compressed
+COMPRESS_MIN_BYTES: Final[int] = 1024
 
+T = TypeVar("T")
 
-@cache
-def get_cache_from_env() -> BaseCache:
+
+def encode_value(value: Any) -> bytes:
+    data = json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if len(data) >= COMPRESS_MIN_BYTES:
+        return b"Z" + zlib.compress(data)
+    return b"J" + data
+
+
+def decode_value(data: bytes) -> Any:
+    marker, payload = data[:1], data[1:]
+    if marker == b"J":
+        return json.loads(payload)
+    if marker == b"Z":
+        return json.loads(zlib.decompress(payload))
+    # written by the aiocache JSON serializer of earlier versions, JSON text never starts with a marker
+    return json.loads(data)
+
+
+class TierStats:
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.seconds = 0.0
+
+    def record(self, hit: bool, seconds: float) -> None:
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        self.seconds += seconds
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    @property
+    def latency_mean(self) -> float:
+        total = self.hits + self.misses
+        return self.seconds / total if total else 0.0
+
+    def as_dict(self) -> dict[str, float]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+            "latency_mean": self.latency_mean,
+        }
+
+
+class MemoryTier:
+    """An in-process LRU of encoded values, bounded by total bytes."""
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        # key -> (encoded value, expiry time)
+        self._entries: OrderedDict[str, tuple[bytes, float]] = OrderedDict()
+        self._bytes = 0
+
+    def get(self, key: str) -> bytes | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        data, expires_at = entry
+        if expires_at <= time.monotonic():
+            self.delete(key)
+            return None
+
+        self._entries.move_to_end(key)
+        return data
+
+    def set(self, key: str, data: bytes, ttl: float | None = None) -> None:
+        self.delete(key)
+        if len(data) > self.max_bytes:
+            return
+
+        self._entries[key] = (data, time.monotonic() + ttl if ttl else float("inf"))
+        self._bytes += len(data)
+        while self._bytes > self.max_bytes:
+            _, (evicted, _) = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+
+    def delete(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[0])
+
+    @property
+    def size(self) -> int:
+        return self._bytes
+
+
+class TieredCache:
+    """A key-value cache with an in-process LRU (L1) in front of an optional Redis (L2).
+
+    Values are JSON, compressed with zlib when large. L1 entries live at most l1_ttl seconds when there is an L2,
+    so other processes writing to Redis are seen soon; without an L2 they follow the ttl of each entry. Keys that
+    other processes change, such as the state of a chat that can move between workers, are read and written with
+    local=False to skip L1 whenever there is an L2.
+    """
+
+    def __init__(
+        self, l2: redis.Redis | None = None, l1_max_bytes: int = DEFAULT_L1_MAX_BYTES, l1_ttl: int = DEFAULT_L1_TTL
+    ):
+        self.l1 = MemoryTier(l1_max_bytes)
+        self.l2 = l2
+        self.l1_ttl = l1_ttl
+        self.l1_stats = TierStats()
+        self.l2_stats = TierStats()
+
+    def _l1_ttl(self, ttl: int | None) -> float | None:
+        if self.l2 is None:
+            return ttl
+        return min(ttl, self.l1_ttl) if ttl else self.l1_ttl
+
+    def _get_l1(self, key: str) -> bytes | None:
+        start = time.perf_counter()
+        data = self.l1.get(key)
+        self.l1_stats.record(data is not None, time.perf_counter() - start)
+        return data
+
+    async def get(self, key: str, default: Any = None, local: bool = True) -> Any:
+        local = local or self.l2 is None
+        data = self._get_l1(key) if local else None
+        if data is None and self.l2 is not None:
+            start = time.perf_counter()
+            data = await self.l2.get(key)
+            self.l2_stats.record(data is not None, time.perf_counter() - start)
+            if data is not None and local:
+                self.l1.set(key, data, ttl=self.l1_ttl)
+
+        return default if data is None else decode_value(data)
+
+    async def set(self, key: str, value: Any, ttl: int | None = None, local: bool = True) -> None:
+        data = encode_value(value)
+        if local or self.l2 is None:
+            self.l1.set(key, data, ttl=self._l1_ttl(ttl))
+        else:
+            self.l1.delete(key)
+        if self.l2 is not None:
+            await self.l2.set(key, data, ex=ttl or None)
+
+    async def delete(self, key: str) -> None:
+        self.l1.delete(key)
+        if self.l2 is not None:
+            await self.l2.delete(key)
+
+    def stats(self) -> dict[str, dict[str, float]]:
+        return {
+            "l1": {**self.l1_stats.as_dict(), "bytes": self.l1.size},
+            "l2": self.l2_stats.as_dict(),
+        }
+
+
+def create_redis_client(url: str, max_connections: int | None = None) -> redis.Redis:
+    """Create a Redis client from a cache URL, the aiocache style pool_max_size parameter sets the pool size."""
+    parts = urlsplit(url)
+    query = dict(parse_qsl(parts.query))
+    pool_max_size = query.pop("pool_max_size", None)
+    url = urlunsplit(parts._replace(query=urlencode(query)))
+
+    # a blocking pool makes callers wait for a free connection instead of failing when all are in use
+    pool: redis.BlockingConnectionPool = redis.BlockingConnectionPool.from_url(
+        url, max_connections=max_connections or int(pool_max_size or DEFAULT_POOL_SIZE)
+    )
+    return redis.Redis(connection_pool=pool)
+
+
+def get_cache_url() -> str:
     url = os.getenv("CACHE_URL")
     if not url:
         logger.warning("No cache url provided, using {url}", url=DEFAULT_REDIS_URL)
         url = DEFAULT_REDIS_URL
+    return url
+
+
+@cache
+def get_redis_client() -> redis.Redis | None:
+    url = get_cache_url()
+    if urlsplit(url).scheme not in ("redis", "rediss"):
+        return None
+
+    pool_size = os.getenv("CACHE_POOL_SIZE")
+    return create_redis_client(url, max_connections=int(pool_size) if pool_size else None)
+
+
+async def close_redis_client() -> None:
+    if get_redis_client.cache_info().currsize:
+        client = get_redis_client()
+        if client is not None:
+            await client.connection_pool.disconnect()
+        get_redis_client.cache_clear()
+
+
+@cache
+def get_cache_from_env() -> TieredCache:
+    return TieredCache(
+        get_redis_client(),
+        l1_max_bytes=int(os.getenv("CACHE_L1_MAX_BYTES", DEFAULT_L1_MAX_BYTES)),
+        l1_ttl=int(os.getenv("CACHE_L1_TTL", DEFAULT_L1_TTL)),
+    )
+
+
+class SingleFlight(Generic[T]):
+    """Share one in-flight call between concurrent callers of the same key."""
+
+    def __init__(self) -> None:
+        self._futures: dict[str, asyncio.Future[T]] = {}
+
+    def _done(self, key: str, future: asyncio.Future[T]) -> None:
+        if self._futures.get(key) is future:
+            del self._futures[key]
+
+        # mark the exception as retrieved when every caller has gone away
+        if not future.cancelled():
+            future.exception()
+
+    async def do(self, key: str, func: Callable[[], Awaitable[T]]) -> T:
+        future = self._futures.get(key)
+        if future is None:
+            future = asyncio.ensure_future(func())
+            self._futures[key] = future
+            future.add_done_callback(lambda f: self._done(key, f))
+        else:
+            logger.debug("Joining in-flight call for {key}", key=key)
+
+        # a cancelled caller must not cancel the call shared with the others
+        return await asyncio.shield(future)
+
+
+class LRUCache:
+    """A string cache on a cache backend, bounded by total bytes with LRU eviction.
+
+    The LRU index lives in this process, so with a shared Redis backend each process only
+    evicts the entries it wrote; the ttl bounds everything else.
+    """
+
+    def __init__(self, backend: TieredCache, namespace: str, max_bytes: int, ttl: int | None = None) -> None:
+        self.backend = backend
+        self.namespace = namespace
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+        # key -> (size in bytes, expiry time)
+        self._index: OrderedDict[str, tuple[int, float]] = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def _expires_at(self, ttl: int | None) -> float:
+        return time.monotonic() + ttl if ttl else float("inf")
+
+    def _forget(self, key: str) -> None:
+        size, _ = self._index.pop(key, (0, 0.0))
+        self._bytes -= size
+
+    async def get(self, key: str) -> str | None:
+        value = await self.backend.get(self._key(key))
+        if value is None:
+            self.misses += 1
+            self._forget(key)
+            return None
+
+        self.hits += 1
+        if key in self._index:
+            self._index.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: str, ttl: int | None = None) -> None:
+        """Store the value, for ttl seconds if given instead of the ttl of the cache."""
+        ttl = ttl or self.ttl
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            logger.info("Not caching {key}: {size} bytes exceeds the limit", key=key, size=size)
+            return
+
+        await self.backend.set(self._key(key), value, ttl=ttl)
+
+        self._forget(key)
+        self._index[key] = (size, self._expires_at(ttl))
+        self._bytes += size
+        await self._evict()
+
+    async def delete(self, key: str) -> None:
+        self._forget(key)
+        await self.backend.delete(self._key(key))
+
+    async def _evict(self) -> None:
+        now = time.monotonic()
+        for key, (_, expires_at) in list(self._index.items()):
+            if expires_at <= now:
+                self._forget(key)
+
+        while self._bytes > self.max_bytes and self._index:
+            key, (size, _) = self._index.popitem(last=False)
+            self._bytes -= size
+            await self.backend.delete(self._key(key))
+            logger.debug("Evicted {key} ({size} bytes)", key=key, size=size)
+
+    @property
+    def size(self) -> int:
+        return self._bytes
 
-    return Cache.from_url(url)
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
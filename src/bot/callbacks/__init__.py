@@ -3,6 +3,7 @@ from .error import ErrorCallback
 from .file_notes import file_callback
 from .format import format_callback
 from .help import HelpCallback
+from .memory import memory_stats_callback
 from .summary import summarize_callback
 from .ticker import query_ticker_callback
 from .translate import TranslationCallback
@@ -9,7 +9,8 @@ from telegram import Update
 from telegram.ext import ContextTypes
 
 from .. import chains
-from ..utils import create_page
+from ..executor import run_in_executor
+from ..pages import create_page
 
 MAX_LENGTH: Final[int] = 1_000
 
@@ -28,9 +29,9 @@ async def file_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
 
     text = None
     if file_path.suffix == ".pdf":
-        text = read_pdf_content(file_path)
+        text = await run_in_executor(read_pdf_content, file_path)
     elif file_path.suffix == ".html":
-        text = read_html_content(file_path)
+        text = await run_in_executor(read_html_content, file_path)
 
     os.remove(file_path)
 
@@ -39,7 +40,7 @@ async def file_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
 
     result = await chains.format(text)
     if len(str(result)) > MAX_LENGTH:
-        text = create_page(title=result.title, html_content=str(result).replace("\n", "<br>"))
+        text = await create_page(title=result.title, html_content=str(result).replace("\n", "<br>"))
     else:
         text = str(result)
 
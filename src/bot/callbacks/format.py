@@ -8,7 +8,7 @@ from telegram.ext import ContextTypes
 from bot.utils import async_load_url
 
 from .. import chains
-from ..utils import create_page
+from ..pages import create_page
 from ..utils import parse_url
 from .utils import get_message_text
 
@@ -31,7 +31,7 @@ async def format_callback(update: Update, _: ContextTypes.DEFAULT_TYPE) -> None:
     result = await chains.format(message_text)
 
     if len(str(result)) > MAX_LENGTH:
-        text = create_page(title=result.title, html_content=str(result).replace("\n", "<br>"))
+        text = await create_page(title=result.title, html_content=str(result).replace("\n", "<br>"))
     else:
         text = str(result)
 
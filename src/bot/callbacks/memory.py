@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+import html
+from datetime import datetime
+
+from telegram import Update
+from telegram.constants import ParseMode
+from telegram.ext import ContextTypes
+
+from ..memory import get_memory_store
+
+
+def format_bytes(size: float) -> str:
+    for unit in ["B", "KiB", "MiB"]:
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+
+async def memory_stats_callback(update: Update, _: ContextTypes.DEFAULT_TYPE) -> None:
+    """Reply with the chats holding the most conversation memory."""
+    message = update.message
+    if not message:
+        return
+
+    usage = await get_memory_store().usage(limit=10)
+    if not usage:
+        await message.reply_text("No conversation memory stored")
+        return
+
+    lines = [
+        f"{html.escape(str(u.chat_id))}: {format_bytes(u.bytes)}, {u.items} items, "
+        f"last active {datetime.fromtimestamp(u.last_active):%Y-%m-%d %H:%M}"
+        for u in usage
+    ]
+    await message.reply_text("<pre>" + "\n".join(lines) + "</pre>", parse_mode=ParseMode.HTML)
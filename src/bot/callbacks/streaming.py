@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from collections.abc import AsyncIterable
+from collections.abc import AsyncIterator
+from typing import Any
+from typing import Final
+
+from agents import RunResultStreaming
+from loguru import logger
+from openai.types.responses import ResponseTextDeltaEvent
+from telegram import Message
+from telegram.constants import MessageLimit
+from telegram.error import BadRequest
+from telegram.error import RetryAfter
+
+from ..pages import create_page
+
+# Telegram allows about one edit per second on a message, stay below that
+DEFAULT_EDIT_INTERVAL: Final[float] = 1.5
+PLACEHOLDER: Final[str] = "⏳"
+ERROR_TEXT: Final[str] = "⚠️ Something went wrong, please try again later."
+CURSOR: Final[str] = " ▌"
+
+
+def is_streaming_enabled() -> bool:
+    return os.getenv("STREAM_REPLIES", "true").lower() in ("1", "true", "yes")
+
+
+def get_edit_interval() -> float:
+    return float(os.getenv("STREAM_EDIT_INTERVAL", DEFAULT_EDIT_INTERVAL))
+
+
+async def stream_text_deltas(result: RunResultStreaming) -> AsyncIterator[str]:
+    async for event in result.stream_events():
+        if event.type == "raw_response_event" and isinstance(event.data, ResponseTextDeltaEvent):
+            yield event.data.delta
+
+
+class StreamingReply:
+    """Reply with a placeholder and edit it as the text arrives.
+
+    Edits are throttled to one every `interval` seconds and skipped while Telegram asks to retry later. The
+    finished text is moved to a Telegraph page when it is longer than max_length.
+
+    Used as an async context manager, the placeholder is replaced with an error text when the work inside fails,
+    instead of staying in the chat.
+    """
+
+    def __init__(
+        self,
+        message: Message,
+        title: str,
+        max_length: int = MessageLimit.MAX_TEXT_LENGTH,
+        interval: float | None = None,
+    ) -> None:
+        self.message = message
+        self.title = title
+        self.max_length = max_length
+        self.interval = get_edit_interval() if interval is None else interval
+        self.reply: Message | None = None
+        self.edits = 0
+        self._shown = ""
+        self._next_edit = 0.0
+
+    async def __aenter__(self) -> StreamingReply:
+        return self
+
+    async def __aexit__(self, exc_type: type[BaseException] | None, exc: BaseException | None, tb: Any) -> None:
+        if isinstance(exc, Exception):
+            await self.fail()
+
+    async def start(self, placeholder: str = PLACEHOLDER) -> None:
+        self.reply = await self.message.reply_text(placeholder)
+        self._shown = placeholder
+        self._next_edit = time.monotonic() + self.interval
+
+    async def update(self, text: str, force: bool = False) -> None:
+        """Show the partial text, unless the last edit was less than `interval` seconds ago."""
+        if not text.strip() or (not force and time.monotonic() < self._next_edit):
+            return
+
+        limit = MessageLimit.MAX_TEXT_LENGTH - len(CURSOR)
+        if len(text) > limit:
+            text = text[: limit - 1] + "…"
+        await self._edit(text if force else text + CURSOR)
+
+    async def stream(self, chunks: AsyncIterable[str]) -> str:
+        if self.reply is None:
+            await self.start()
+
+        text = ""
+        async for chunk in chunks:
+            text += chunk
+            await self.update(text)
+        return text
+
+    async def finish(self, text: str, **kwargs: Any) -> None:
+        """Replace the placeholder with the final text, or reply with it when nothing was sent yet.
+
+        Args:
+            text: The final text
+            **kwargs: Passed to reply_text or edit_text, e.g. parse_mode
+        """
+        if len(text) > self.max_length:
+            text = await create_page(title=self.title, html_content=text.replace("\n", "<br>"))
+            kwargs.pop("parse_mode", None)
+
+        if self.reply is None:
+            await self.message.reply_text(text, **kwargs)
+            return
+
+        # the final edit must not be dropped, wait out the flood control instead
+        while True:
+            try:
+                await self._edit(text, raise_retry_after=True, **kwargs)
+                return
+            except RetryAfter as e:
+                await asyncio.sleep(_seconds(e.retry_after))
+
+    async def fail(self, text: str = ERROR_TEXT) -> None:
+        """Replace the placeholder with an error text, the error itself is left to the caller."""
+        if self.reply is None:
+            return
+
+        try:
+            await self._edit(text)
+        except Exception as e:
+            logger.warning("Failed to replace the placeholder, got error: {error}", error=e)
+
+    async def _edit(self, text: str, raise_retry_after: bool = False, **kwargs: Any) -> None:
+        if self.reply is None or text == self._shown:
+            return
+
+        try:
+            await self.reply.edit_text(text, **kwargs)
+        except RetryAfter as e:
+            if raise_retry_after:
+                raise
+            logger.warning("Streaming edits throttled by Telegram for {seconds}s", seconds=e.retry_after)
+            self._next_edit = time.monotonic() + _seconds(e.retry_after)
+            return
+        except BadRequest as e:
+            if "not modified" not in str(e).lower():
+                raise
+
+        self.edits += 1
+        self._shown = text
+        self._next_edit = time.monotonic() + self.interval
+
+
+def _seconds(retry_after: Any) -> float:
+    # python-telegram-bot gives an int or a timedelta depending on its settings
+    return retry_after.total_seconds() if hasattr(retry_after, "total_seconds") else float(retry_after)
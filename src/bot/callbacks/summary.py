@@ -9,6 +9,8 @@ from bot.utils import async_load_url
 
 from .. import chains
 from ..utils import parse_url
+from .streaming import StreamingReply
+from .streaming import is_streaming_enabled
 from .utils import get_message_text
 
 
@@ -27,14 +29,23 @@ async def summarize_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
         return
     logger.info("Parsed URL: {url}", url=url)
 
-    try:
-        text = await async_load_url(url)
-    except Exception as e:
-        logger.warning("Failed to load URL: {url}, got error: {error}", url=url, error=e)
-        await message.reply_text(f"Failed to load URL: {url}")
-        return
+    # the summary is structured output, so show the progress instead of the tokens
+    async with StreamingReply(message, title="Summary") as reply:
+        streaming = is_streaming_enabled()
+        if streaming:
+            await reply.start("⏳ 讀取網址中...")
+
+        try:
+            text = await async_load_url(url)
+        except Exception as e:
+            logger.warning("Failed to load URL: {url}, got error: {error}", url=url, error=e)
+            await reply.finish(f"Failed to load URL: {url}")
+            return
+
+        if streaming:
+            await reply.update("⏳ 摘要中...", force=True)
 
-    result = await chains.summarize(text)
+        result = await chains.summarize(text)
 
-    logger.info("Summarized text: {text}", text=result)
-    await message.reply_text(result, parse_mode=ParseMode.HTML, disable_web_page_preview=True)
+        logger.info("Summarized text: {text}", text=result)
+        await reply.finish(str(result), parse_mode=ParseMode.HTML, disable_web_page_preview=True)
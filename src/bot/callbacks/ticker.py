@@ -1,14 +1,23 @@
 from __future__ import annotations
 
-import json
+import asyncio
 
-from loguru import logger
 from telegram import Update
 from telegram.constants import ParseMode
 from telegram.ext import ContextTypes
-from twse.stock_info import get_stock_info
 
-from ..yahoo_finance import query_tickers
+from ..quotes import Market
+from ..symbols import get_symbol_index
+from ..twse import query_stock
+from ..yahoo_finance import async_query_tickers
+
+
+async def query_symbol(text: str) -> str:
+    """Query the one backend that lists the symbol: TWSE for Taiwan stocks, Yahoo Finance for the rest."""
+    listing = get_symbol_index().resolve(text)
+    if listing.market == Market.TWSE:
+        return await query_stock(listing.symbol)
+    return await async_query_tickers(listing.symbol)
 
 
 async def query_ticker_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -18,32 +27,10 @@ async def query_ticker_callback(update: Update, context: ContextTypes.DEFAULT_TY
     if not context.args:
         return
 
-    # Query Yahoo Finance
-    try:
-        yf_result = query_tickers(context.args)
-    except Exception as e:
-        logger.warning("Failed to get ticker for {symbols}, got error: {error}", symbols=context.args, error=e)
-        yf_result = ""
-
-    # Query TWSE
-    twse_results = []
-    for symbol in context.args:
-        try:
-            twse_results += [get_stock_info(symbol.strip()).pretty_repr()]
-        except json.JSONDecodeError as e:
-            logger.warning("Failed to get ticker for {symbol}, got error: {error}", symbol=symbol, error=e)
-            continue
-
-    # Combine results
-    results = []
-    if yf_result:
-        results += [yf_result]
-
-    for twse_result in twse_results:
-        if twse_result:
-            results += [twse_result]
-
-    result = "\n\n".join(results).strip()
+    # both backends skip the symbols they fail on, the results keep the order of the arguments
+    results = await asyncio.gather(*[query_symbol(arg) for arg in context.args])
+
+    result = "\n\n".join(r for r in results if r).strip()
 
     if not result:
         return
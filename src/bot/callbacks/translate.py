@@ -9,8 +9,9 @@ from telegram.ext import ContextTypes
 from bot.utils import async_load_url
 
 from .. import chains
-from ..utils import create_page
 from ..utils import parse_url
+from .streaming import StreamingReply
+from .streaming import is_streaming_enabled
 from .utils import get_message_text
 
 MAX_LENGTH: Final[int] = 1_000
@@ -29,13 +30,20 @@ class TranslationCallback:
         if not message_text:
             return
 
-        url = parse_url(message_text)
-        if url:
-            message_text = await async_load_url(url)
+        async with StreamingReply(message, title="Translation", max_length=MAX_LENGTH) as reply:
+            streaming = is_streaming_enabled()
+            if streaming:
+                await reply.start()
 
-        reply_text = await chains.translate(message_text, lang=self.lang)
-        logger.info("Translated text to {lang}: {text}", lang=self.lang, text=reply_text)
+            url = parse_url(message_text)
+            if url:
+                message_text = await async_load_url(url)
 
-        if len(reply_text) > MAX_LENGTH:
-            reply_text = create_page(title="Translation", html_content=reply_text.replace("\n", "<br>"))
-        await message.reply_text(reply_text)
+            if streaming:
+                reply_text = await reply.stream(chains.stream_translate(message_text, lang=self.lang))
+                reply_text = reply_text.strip('"')
+            else:
+                reply_text = await chains.translate(message_text, lang=self.lang)
+            logger.info("Translated text to {lang}: {text}", lang=self.lang, text=reply_text)
+
+            await reply.finish(reply_text)
@@ -8,6 +8,8 @@ from telegram.constants import ParseMode
 from telegram.ext import ContextTypes
 from youtube_search import YoutubeSearch
 
+from ..executor import run_in_executor
+
 MAX_RESULTS: Final[int] = 10
 
 
@@ -18,7 +20,8 @@ async def search_youtube_callback(update: Update, context: ContextTypes.DEFAULT_
     if not context.args:
         return
 
-    result = YoutubeSearch(search_terms="_".join(context.args), max_results=MAX_RESULTS).to_dict()
+    search = await run_in_executor(YoutubeSearch, search_terms="_".join(context.args), max_results=MAX_RESULTS)
+    result = search.to_dict()
     if not result:
         return
 
@@ -1,3 +1,4 @@
+from .conversation import summarize_conversation
 from .formatter import format
 from .jlpt import learn_japanese
 from .keyword import extract_keywords
@@ -6,6 +7,7 @@ from .polisher import polish
 from .product import extract_product
 from .recipe import generate_recipe
 from .summary import summarize
+from .translation import stream_translate
 from .translation import translate
 from .translation import translate_and_explain
 from .translation import translate_to_taiwanese
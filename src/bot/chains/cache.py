@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from collections.abc import Awaitable
+from collections.abc import Callable
+from functools import cache
+from typing import Any
+from typing import Final
+
+from agents import Agent
+from agents import Runner
+from loguru import logger
+from pydantic import BaseModel
+
+from ..cache import LRUCache
+from ..cache import SingleFlight
+from ..cache import get_cache_from_env
+from ..model import get_openai_model_name
+
+DEFAULT_LLM_CACHE_TTL: Final[int] = 24 * 60 * 60
+DEFAULT_LLM_CACHE_MAX_BYTES: Final[int] = 32 * 1024 * 1024
+
+_single_flight: SingleFlight[Any] = SingleFlight()
+
+
+@cache
+def get_llm_cache() -> LRUCache:
+    return LRUCache(
+        get_cache_from_env(),
+        namespace="llm",
+        max_bytes=int(os.getenv("LLM_CACHE_MAX_BYTES", DEFAULT_LLM_CACHE_MAX_BYTES)),
+        ttl=int(os.getenv("LLM_CACHE_TTL", DEFAULT_LLM_CACHE_TTL)),
+    )
+
+
+def is_cacheable(temperature: float | None) -> bool:
+    # sampling with a temperature gives different answers on purpose, so only cache it when asked to
+    if not temperature:
+        return True
+    return os.getenv("LLM_CACHE_ALL_TEMPERATURES", "false").lower() in ("1", "true", "yes")
+
+
+def make_cache_key(
+    model: str,
+    system: str | None,
+    messages: list[str],
+    response_format: type[BaseModel] | None,
+    temperature: float | None,
+) -> str:
+    payload = {
+        "model": model,
+        "system": system,
+        "messages": messages,
+        "response_format": response_format.model_json_schema() if response_format else None,
+        "temperature": temperature,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def dump_response(response: BaseModel | str) -> str:
+    if isinstance(response, BaseModel):
+        return response.model_dump_json()
+    return response
+
+
+def load_response(value: str, response_format: type[BaseModel] | None) -> Any:
+    if response_format:
+        return response_format.model_validate_json(value)
+    return value
+
+
+async def cached_response(
+    key: str,
+    call: Callable[[], Awaitable[Any]],
+    response_format: type[BaseModel] | None = None,
+) -> Any:
+    """Return the cached response for the key, or make the call and cache its response.
+
+    Concurrent calls with the same key share one request.
+
+    Args:
+        key: The cache key from make_cache_key
+        call: Makes the request on a cache miss
+        response_format: The pydantic model to deserialize the cached response into
+
+    Returns:
+        The response, a response_format instance or a string
+    """
+    llm_cache = get_llm_cache()
+
+    value = await llm_cache.get(key)
+    if value is not None:
+        logger.info("LLM cache hit, hit rate: {rate:.1%}", rate=llm_cache.hit_rate)
+        return load_response(value, response_format)
+
+    async def call_and_store() -> Any:
+        response = await call()
+        await llm_cache.set(key, dump_response(response))
+        return response
+
+    logger.info("LLM cache miss, hit rate: {rate:.1%}", rate=llm_cache.hit_rate)
+    return await _single_flight.do(key, call_and_store)
+
+
+async def run_agent_cached(agent: Agent, input: str) -> Any:
+    """Run a single agent without tools or handoffs and return its final output through the response cache."""
+
+    async def run() -> Any:
+        result = await Runner.run(agent, input=input)
+        return result.final_output
+
+    output_type = agent.output_type if isinstance(agent.output_type, type) else None
+    if output_type is not None and not issubclass(output_type, BaseModel):
+        output_type = None
+
+    temperature = agent.model_settings.temperature
+    if not is_cacheable(temperature) or agent.tools or agent.handoffs:
+        return await run()
+
+    instructions = agent.instructions if isinstance(agent.instructions, str) else None
+    key = make_cache_key(get_openai_model_name(), instructions, [input], output_type, temperature)
+    return await cached_response(key, run, output_type)
@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import re
+from collections.abc import Iterator
+from typing import Final
+from typing import NamedTuple
+
+from ..tokens import Tokenizer
+from ..tokens import get_tokenizer
+
+DEFAULT_MAX_TOKENS: Final[int] = 50_000
+
+# blank lines, sentence ends (ASCII punctuation must be followed by whitespace) and line breaks
+SEGMENT_END: Final[re.Pattern[str]] = re.compile(r"\n\s*\n|[。！？；…]+[」』）〕】]*\s*|[.!?;]+[\"')\]]*(?:\s+|$)|\n")
+
+
+class Span(NamedTuple):
+    start: int
+    end: int
+
+
+class Segment(NamedTuple):
+    start: int
+    end: int
+    tokens: int
+    paragraph_end: bool
+
+
+def iter_segments(text: str, tokenizer: Tokenizer, max_tokens: int) -> Iterator[Segment]:
+    """Yield sentence-sized segments of at most max_tokens tokens with their token counts."""
+    start = 0
+    for match in SEGMENT_END.finditer(text):
+        end = match.end()
+        if end > start:
+            yield from split_segment(text, start, end, match.group().count("\n") >= 2, tokenizer, max_tokens)
+        start = end
+
+    if start < len(text):
+        yield from split_segment(text, start, len(text), True, tokenizer, max_tokens)
+
+
+def split_segment(
+    text: str,
+    start: int,
+    end: int,
+    paragraph_end: bool,
+    tokenizer: Tokenizer,
+    max_tokens: int,
+) -> Iterator[Segment]:
+    tokens = tokenizer.count(text[start:end])
+    if tokens <= max_tokens:
+        yield Segment(start, end, tokens, paragraph_end)
+        return
+
+    # a single sentence longer than a chunk is cut at token boundaries
+    offsets = [start + cut for cut in tokenizer.split(text[start:end], max_tokens)] + [end]
+    for piece_start, piece_end in zip([start, *offsets[:-1]], offsets, strict=True):
+        yield Segment(
+            piece_start,
+            piece_end,
+            tokenizer.count(text[piece_start:piece_end]),
+            paragraph_end and piece_end == end,
+        )
+
+
+def find_cut(window: list[Segment], max_tokens: int) -> int:
+    """Prefer to end a chunk at the last paragraph boundary past half of the budget."""
+    cut = len(window)
+    tokens = 0
+    for i, segment in enumerate(window[:-1]):
+        tokens += segment.tokens
+        if segment.paragraph_end and tokens >= max_tokens // 2:
+            cut = i + 1
+    return cut
+
+
+def take_overlap(segments: list[Segment], overlap_tokens: int) -> list[Segment]:
+    tokens = 0
+    i = len(segments)
+    while i > 1 and tokens + segments[i - 1].tokens <= overlap_tokens:
+        tokens += segments[i - 1].tokens
+        i -= 1
+    return segments[i:]
+
+
+def chunk_spans(
+    text: str,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    overlap_tokens: int = 0,
+    tokenizer: Tokenizer | None = None,
+) -> Iterator[Span]:
+    """Split text into chunks of at most max_tokens model tokens, lazily yielding their offsets.
+
+    Chunks end on sentence boundaries (including CJK punctuation), preferring paragraph breaks, and each chunk
+    repeats up to overlap_tokens tokens from the end of the previous one. Token counts are summed per sentence,
+    so they can differ slightly from the count of the joined text.
+
+    Args:
+        text: The text to split
+        max_tokens: The maximum number of tokens per chunk
+        overlap_tokens: The number of tokens shared with the previous chunk
+        tokenizer: The tokenizer to count with, defaults to the one of the configured model
+
+    Returns:
+        An iterator of (start, end) offsets into the text
+    """
+    if overlap_tokens >= max_tokens:
+        raise ValueError(f"overlap_tokens ({overlap_tokens}) must be less than max_tokens ({max_tokens})")
+
+    tokenizer = tokenizer or get_tokenizer()
+
+    window: list[Segment] = []
+    window_tokens = 0
+    for segment in iter_segments(text, tokenizer, max_tokens):
+        if window and window_tokens + segment.tokens > max_tokens:
+            cut = find_cut(window, max_tokens)
+            emitted, rest = window[:cut], window[cut:]
+            yield Span(emitted[0].start, emitted[-1].end)
+
+            window = take_overlap(emitted, overlap_tokens) + rest if overlap_tokens else rest
+            window_tokens = sum(s.tokens for s in window)
+            if window_tokens + segment.tokens > max_tokens and len(window) > len(rest):
+                # no room for the overlap
+                window = rest
+                window_tokens = sum(s.tokens for s in window)
+            if window and window_tokens + segment.tokens > max_tokens:
+                yield Span(window[0].start, window[-1].end)
+                window = []
+                window_tokens = 0
+
+        window.append(segment)
+        window_tokens += segment.tokens
+
+    if window:
+        yield Span(window[0].start, window[-1].end)
+
+
+def chunk_text(
+    text: str,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    overlap_tokens: int = 0,
+    tokenizer: Tokenizer | None = None,
+) -> Iterator[str]:
+    for span in chunk_spans(text, max_tokens=max_tokens, overlap_tokens=overlap_tokens, tokenizer=tokenizer):
+        yield text[span.start : span.end]
@@ -0,0 +1,19 @@
+from .utils import generate
+
+SYSTEM_PROMPT = """
+Maintain a running summary of a chat conversation so that an assistant can continue it without the old messages.
+
+# Steps
+1. Start from the previous summary, if there is one, and fold the new messages into it.
+2. Keep facts, decisions, open questions, names, numbers and links that later turns may refer to.
+3. Drop greetings, repetition and tool chatter.
+4. Write in the language of the conversation, as short bullet points, in at most 300 words.
+""".strip()
+
+
+async def summarize_conversation(messages: list[str], previous_summary: str | None = None) -> str:
+    parts = []
+    if previous_summary:
+        parts.append(f"Previous summary:\n{previous_summary}")
+    parts.append("New messages:\n" + "\n\n".join(messages))
+    return await generate("\n\n".join(parts), system=SYSTEM_PROMPT)
@@ -1,12 +1,12 @@
-import asyncio
+import functools
 from textwrap import dedent
 from typing import cast
 
 from loguru import logger
 from pydantic import BaseModel
 
+from .mapreduce import MapReduce
 from .notes import create_notes_from_chunk
-from .utils import chunk_on_delimiter
 from .utils import generate
 
 
@@ -48,10 +48,5 @@ async def _format(text: str, lang: str = "台灣中文") -> FormattedContent:
 
 
 async def format(text: str, lang: str = "台灣中文") -> FormattedContent:
-    chunks = chunk_on_delimiter(text)
-
-    if len(chunks) == 1:
-        return await _format(text)
-
-    results = await asyncio.gather(*[create_notes_from_chunk(chunk) for chunk in chunks])
-    return await _format("\n".join(results))
+    map_reduce = MapReduce(map_fn=create_notes_from_chunk, reduce_fn=functools.partial(_format, lang=lang))
+    return await map_reduce.run(text)
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from collections.abc import Awaitable
+from collections.abc import Callable
+from typing import Final
+from typing import Generic
+from typing import NamedTuple
+from typing import TypeVar
+
+from agents.exceptions import ModelBehaviorError
+from loguru import logger
+from pydantic import ValidationError
+
+from ..tokens import get_tokenizer
+from .chunker import DEFAULT_MAX_TOKENS
+from .chunker import chunk_text
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+DEFAULT_CONCURRENCY: Final[int] = 4
+DEFAULT_RETRIES: Final[int] = 2
+MAX_REDUCE_LEVELS: Final[int] = 5
+SEPARATOR: Final[str] = "\n\n"
+# a reply that does not parse into the output type, the OpenAI client already retries connection and rate limit errors
+RETRY_ERRORS: Final[tuple[type[Exception], ...]] = (ModelBehaviorError, ValidationError)
+
+
+class ChunkTiming(NamedTuple):
+    stage: str
+    chunk: int
+    tokens: int
+    seconds: float
+    attempts: int
+
+
+class MapReduce(Generic[T]):
+    """Process a long text chunk by chunk and combine the partial results.
+
+    The map stage runs map_fn on every chunk with at most `concurrency` calls in flight. Partial results are then
+    merged level by level with merge_fn (map_fn by default) until they fit in max_tokens, and reduce_fn turns the
+    merged text into the final result. Every call is timed in `timings`, and retried with backoff when the model
+    replies with output that does not parse.
+    """
+
+    def __init__(
+        self,
+        map_fn: Callable[[str], Awaitable[str]],
+        reduce_fn: Callable[[str], Awaitable[T]],
+        merge_fn: Callable[[str], Awaitable[str]] | None = None,
+        max_tokens: int = DEFAULT_MAX_TOKENS,
+        concurrency: int | None = None,
+        retries: int = DEFAULT_RETRIES,
+    ) -> None:
+        self.map_fn = map_fn
+        self.reduce_fn = reduce_fn
+        self.merge_fn = merge_fn or map_fn
+        self.max_tokens = max_tokens
+        self.concurrency = concurrency or int(os.getenv("MAP_REDUCE_CONCURRENCY", DEFAULT_CONCURRENCY))
+        self.retries = retries
+        self.timings: list[ChunkTiming] = []
+
+    async def run(self, text: str) -> T:
+        tokenizer = get_tokenizer()
+        chunks = list(chunk_text(text, max_tokens=self.max_tokens, tokenizer=tokenizer))
+        if len(chunks) <= 1:
+            return await self._call("reduce", 0, self.reduce_fn, text)
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        partials = await asyncio.gather(
+            *[self._bounded(semaphore, "map", i, self.map_fn, chunk) for i, chunk in enumerate(chunks)]
+        )
+
+        for level in range(1, MAX_REDUCE_LEVELS + 1):
+            groups = self._group(partials)
+            if len(groups) == 1:
+                break
+
+            logger.info(
+                "Merging {n} partial results into {m} at level {level}", n=len(partials), m=len(groups), level=level
+            )
+            partials = await asyncio.gather(
+                *[
+                    self._bounded(semaphore, f"merge{level}", i, self.merge_fn, SEPARATOR.join(group))
+                    for i, group in enumerate(groups)
+                ]
+            )
+        else:
+            logger.warning("Partial results still exceed {max_tokens} tokens", max_tokens=self.max_tokens)
+
+        return await self._call("reduce", 0, self.reduce_fn, SEPARATOR.join(partials))
+
+    def _group(self, partials: list[str]) -> list[list[str]]:
+        """Group consecutive partial results so that each group fits in max_tokens."""
+        tokenizer = get_tokenizer()
+        groups: list[list[str]] = []
+        group_tokens = 0
+        for partial in partials:
+            tokens = tokenizer.count(partial)
+            if groups and group_tokens + tokens <= self.max_tokens:
+                groups[-1].append(partial)
+                group_tokens += tokens
+            else:
+                groups.append([partial])
+                group_tokens = tokens
+        return groups
+
+    async def _bounded(
+        self,
+        semaphore: asyncio.Semaphore,
+        stage: str,
+        index: int,
+        fn: Callable[[str], Awaitable[str]],
+        text: str,
+    ) -> str:
+        async with semaphore:
+            return await self._call(stage, index, fn, text)
+
+    async def _call(self, stage: str, index: int, fn: Callable[[str], Awaitable[R]], text: str) -> R:
+        start = time.perf_counter()
+        for attempt in range(1, self.retries + 2):
+            try:
+                result = await fn(text)
+            except RETRY_ERRORS as e:
+                if attempt > self.retries:
+                    raise
+                logger.warning(
+                    "{stage} #{index} failed on attempt {attempt}, retrying: {error}",
+                    stage=stage,
+                    index=index,
+                    attempt=attempt,
+                    error=e,
+                )
+                await asyncio.sleep(2 ** (attempt - 1))
+                continue
+
+            timing = ChunkTiming(stage, index, get_tokenizer().count(text), time.perf_counter() - start, attempt)
+            self.timings.append(timing)
+            logger.info(
+                "{stage} #{index} ({tokens} tokens) took {seconds:.2f}s",
+                stage=stage,
+                index=index,
+                tokens=timing.tokens,
+                seconds=timing.seconds,
+            )
+            return result
+
+        raise AssertionError("unreachable")
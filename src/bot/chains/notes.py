@@ -1,11 +1,10 @@
-import asyncio
 from textwrap import dedent
 from typing import cast
 
 from loguru import logger
 from pydantic import BaseModel
 
-from .utils import chunk_on_delimiter
+from .mapreduce import MapReduce
 from .utils import generate
 
 
@@ -104,10 +103,5 @@ async def create_notes_from_chunk(text: str) -> str:
 
 
 async def create_notes(text: str) -> ResearchReport:
-    chunks = chunk_on_delimiter(text)
-
-    if len(chunks) == 1:
-        return await extract_notes(text)
-
-    results = await asyncio.gather(*[create_notes_from_chunk(chunk) for chunk in chunks])
-    return await extract_notes("\n".join(results))
+    map_reduce = MapReduce(map_fn=create_notes_from_chunk, reduce_fn=extract_notes)
+    return await map_reduce.run(text)
@@ -1,10 +1,10 @@
 from agents import Agent
 from agents import ModelSettings
-from agents import Runner
 from pydantic import BaseModel
 from pydantic import Field
 
 from ..model import get_openai_model
+from .cache import run_agent_cached
 
 
 class PolishedText(BaseModel):
@@ -43,8 +43,5 @@ async def polish(text: str) -> str:
         instructions=SYSTEM_PROMPT,
         output_type=PolishedText,
     )
-    result = await Runner.run(
-        agent,
-        input=f"Polish the following text:\n{text}",
-    )
-    return str(result.final_output)
+    output = await run_agent_cached(agent, input=f"Polish the following text:\n{text}")
+    return str(output)
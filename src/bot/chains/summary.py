@@ -3,12 +3,14 @@ from __future__ import annotations
 import markdown2
 from agents import Agent
 from agents import ModelSettings
-from agents import Runner
 from pydantic import BaseModel
 from pydantic import Field
 
 from ..model import get_openai_model
-from ..utils import create_page
+from ..pages import create_page
+from .cache import run_agent_cached
+from .mapreduce import MapReduce
+from .notes import create_notes_from_chunk
 
 PROMPT_TEMPLATE = """
 請以台灣繁體中文為以下內容生成：
@@ -78,39 +80,46 @@ class Summary(BaseModel):
     )
 
     def __str__(self) -> str:
+        return "\n\n".join(self._sections())
+
+    async def render(self) -> str:
+        """Format the summary with a link to a Telegraph page of the chain of thought."""
+        url = await create_page(title="推理過程", html_content=markdown2.markdown(str(self.chain_of_thought)))
+        return "\n\n".join([*self._sections(), f"🔗 <a href='{url}'>推理過程</a>"])
+
+    def _sections(self) -> list[str]:
         insights = "\n".join([f"  • {insight.strip()}" for insight in self.insights])
         hashtags = " ".join(self.hashtags)
+        return [
+            "📝 <b>摘要</b>",
+            self.summary_text.strip(),
+            "💡 <b>見解</b>",
+            insights,
+            f"🏷️ <b>Hashtags</b>: {hashtags}",
+        ]
 
-        url = create_page(title="推理過程", html_content=markdown2.markdown(str(self.chain_of_thought)))
-        return "\n\n".join(
-            [
-                "📝 <b>摘要</b>",
-                self.summary_text.strip(),
-                "💡 <b>見解</b>",
-                insights,
-                f"🏷️ <b>Hashtags</b>: {hashtags}",
-                f"🔗 <a href='{url}'>推理過程</a>",
-            ]
-        )
+
+async def _summarize(text: str) -> str:
+    agent = Agent(
+        "summary",
+        output_type=Summary,
+        model=get_openai_model(),
+        model_settings=ModelSettings(temperature=0.0),
+    )
+    output: Summary = await run_agent_cached(agent, input=PROMPT_TEMPLATE.format(text=text))
+    return await output.render()
 
 
 async def summarize(text: str) -> str:
     """Generate a summary of the given text.
 
+    Long texts are split into chunks, condensed into notes and summarized from the merged notes.
+
     Args:
         text (str): The text to summarize.
 
     Returns:
         str: A formatted string containing the summary, key points, takeaways, and hashtags.
     """
-    agent = Agent(
-        "summary",
-        output_type=Summary,
-        model=get_openai_model(),
-        model_settings=ModelSettings(temperature=0.0),
-    )
-    result = await Runner.run(
-        agent,
-        input=PROMPT_TEMPLATE.format(text=text),
-    )
-    return str(result.final_output)
+    map_reduce = MapReduce(map_fn=create_notes_from_chunk, reduce_fn=_summarize)
+    return await map_reduce.run(text)
@@ -1,6 +1,8 @@
 import inspect
+from collections.abc import AsyncIterator
 
 from .utils import generate
+from .utils import stream_generate
 
 
 async def translate_to_taiwanese(text: str) -> str:
@@ -12,16 +14,28 @@ async def translate_to_taiwanese(text: str) -> str:
     return await generate(inspect.cleandoc(prompt))
 
 
-async def translate(text: str, lang: str) -> str:
+def build_translate_prompts(text: str, lang: str) -> tuple[str, str]:
     user_prompt = f'"""{text}"""'
 
     system_prompt = f"""
     Translate the text delimited by triple quotation marks into {lang}.
     """.strip()
+    return user_prompt, system_prompt
+
+
+async def translate(text: str, lang: str) -> str:
+    user_prompt, system_prompt = build_translate_prompts(text, lang)
     result = await generate(user_prompt, system=system_prompt)
     return result.strip('"')
 
 
+async def stream_translate(text: str, lang: str) -> AsyncIterator[str]:
+    """Translate the text and yield the translation as it is generated, quotation marks are left to the caller."""
+    user_prompt, system_prompt = build_translate_prompts(text, lang)
+    async for delta in stream_generate(user_prompt, system=system_prompt):
+        yield delta
+
+
 async def translate_and_explain(text: str, lang: str) -> str:
     user_prompt = f'"""{text}"""'
 
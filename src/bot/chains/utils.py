@@ -1,32 +1,140 @@
-import asyncio
-import concurrent.futures
+from collections.abc import AsyncIterator
+from typing import Any
 
 import lazyopenai
 from lazyopenai.chat import BaseTool
 from lazyopenai.chat import ResponseFormatT
 
+from ..executor import run_in_executor
+from ..model import get_openai_client
+from ..model import get_openai_max_tokens
+from ..model import get_openai_model_name
+from ..model import get_openai_temperature
+from .cache import cached_response
+from .cache import get_llm_cache
+from .cache import is_cacheable
+from .cache import make_cache_key
+
+
+def build_messages(messages: str | list[str], system: str | None = None) -> list[dict[str, str]]:
+    if isinstance(messages, str):
+        messages = [messages]
+
+    result = []
+    if system:
+        result.append({"role": "system", "content": system})
+    for message in messages:
+        result.append({"role": "user", "content": message})
+    return result
+
+
+async def create_completion(kwargs: dict[str, Any], response_format: type[ResponseFormatT] | None = None):
+    client = get_openai_client()
+
+    if response_format:
+        parsed_completion = await client.beta.chat.completions.parse(response_format=response_format, **kwargs)
+        if not parsed_completion.choices:
+            raise ValueError("No completion choices returned")
+
+        parsed = parsed_completion.choices[0].message.parsed
+        if not parsed:
+            raise ValueError("No completion parsed content returned")
+        return parsed
+
+    completion = await client.chat.completions.create(**kwargs)
+    if not completion.choices:
+        raise ValueError("No completion choices returned")
+
+    content = completion.choices[0].message.content
+    if not content:
+        raise ValueError("No completion content returned")
+    return content
+
 
 async def generate(
     messages: str | list[str],
     system: str | None = None,
     response_format: type[ResponseFormatT] | None = None,
     tools: list[type[BaseTool]] | None = None,
+    use_cache: bool | None = None,
 ):
-    loop = asyncio.get_event_loop()
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        result = await loop.run_in_executor(executor, lazyopenai.generate, messages, system, response_format, tools)
-        return result
-
-
-def chunk_on_delimiter(text: str, delimiter: str = " ", max_length: int = 200_000) -> list[str]:
-    chunks = []
-    current_chunk = ""
-    for word in text.split(delimiter):
-        if len(current_chunk) + len(word) + len(delimiter) <= max_length:
-            current_chunk += word + delimiter
-        else:
-            chunks.append(current_chunk)
-            current_chunk = word + delimiter
-    if current_chunk:
-        chunks.append(current_chunk)
-    return chunks
+    if tools:
+        # lazyopenai runs the tool-call loop synchronously, keep it off the event loop
+        return await run_in_executor(lazyopenai.generate, messages, system, response_format, tools, pool="llm")
+
+    kwargs = build_completion_kwargs(messages, system=system)
+    if use_cache is None:
+        use_cache = is_cacheable(kwargs["temperature"])
+    if not use_cache:
+        return await create_completion(kwargs, response_format=response_format)
+
+    key = make_completion_cache_key(kwargs, messages, system, response_format)
+    return await cached_response(
+        key, lambda: create_completion(kwargs, response_format=response_format), response_format
+    )
+
+
+async def stream_generate(
+    messages: str | list[str],
+    system: str | None = None,
+    use_cache: bool | None = None,
+) -> AsyncIterator[str]:
+    """Generate a text completion and yield it piece by piece as the model produces it.
+
+    A cached completion is yielded at once, and a finished completion is cached like in generate.
+    """
+    kwargs = build_completion_kwargs(messages, system=system)
+    if use_cache is None:
+        use_cache = is_cacheable(kwargs["temperature"])
+
+    key = make_completion_cache_key(kwargs, messages, system, None)
+    llm_cache = get_llm_cache()
+    if use_cache:
+        value = await llm_cache.get(key)
+        if value is not None:
+            yield value
+            return
+
+    client = get_openai_client()
+    stream = await client.chat.completions.create(stream=True, **kwargs)
+
+    parts = []
+    async for chunk in stream:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            parts.append(delta)
+            yield delta
+
+    if not parts:
+        raise ValueError("No completion content returned")
+    if use_cache:
+        await llm_cache.set(key, "".join(parts))
+
+
+def build_completion_kwargs(messages: str | list[str], system: str | None = None) -> dict[str, Any]:
+    kwargs: dict[str, Any] = {
+        "messages": build_messages(messages, system=system),
+        "model": get_openai_model_name(),
+        "temperature": get_openai_temperature(),
+    }
+    max_tokens = get_openai_max_tokens()
+    if max_tokens:
+        kwargs["max_tokens"] = max_tokens
+    return kwargs
+
+
+def make_completion_cache_key(
+    kwargs: dict[str, Any],
+    messages: str | list[str],
+    system: str | None,
+    response_format: type[ResponseFormatT] | None,
+) -> str:
+    return make_cache_key(
+        kwargs["model"],
+        system,
+        [messages] if isinstance(messages, str) else messages,
+        response_format,
+        kwargs["temperature"],
+    )
@@ -0,0 +1,435 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import hashlib
+import json
+import os
+import signal
+import socket
+import time
+import uuid
+from collections.abc import Coroutine
+from typing import Any
+from typing import Final
+
+import redis.asyncio as redis
+from loguru import logger
+from redis.exceptions import ResponseError
+from telegram import Update
+from telegram.ext import Application
+from telegram.ext import ContextTypes
+from telegram.ext import TypeHandler
+
+from .cache import get_redis_client
+from .processor import create_update_queue
+
+DEFAULT_PARTITIONS: Final[int] = 16
+DEFAULT_LEASE_TTL: Final[float] = 15.0
+DEFAULT_MAX_IN_FLIGHT: Final[int] = 256
+DEFAULT_STREAM_MAX_LENGTH: Final[int] = 100_000
+# the longest a handler may run, e.g. an agent turn with tool calls or a /s summary of a long document
+DEFAULT_MAX_HANDLER_TIME: Final[float] = 600.0
+# Telegram redelivers an update for at most a day
+DEDUPE_TTL: Final[int] = 24 * 60 * 60
+READ_BLOCK_MS: Final[int] = 1_000
+READ_COUNT: Final[int] = 64
+# a new owner claims the entries of a worker gone from the membership only once they are idle for longer than a
+# blocked read of that worker may take to return
+CLAIM_MIN_IDLE: Final[float] = 2 * READ_BLOCK_MS / 1000
+
+GROUP: Final[str] = "workers"
+WORKERS_KEY: Final[str] = "bot:cluster:workers"
+# the consumer a worker moves its unprocessed entries to when it hands a partition over, none of them is running
+HANDED_OVER: Final[str] = "handed-over"
+
+# extend or drop a lease only while this worker still holds it
+RENEW_SCRIPT: Final[str] = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+RELEASE_SCRIPT: Final[str] = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+# add an update to its stream unless it was published before, the dedupe key is only set once the entry is added
+PUBLISH_SCRIPT: Final[str] = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return 0
+end
+redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[2], '*', 'update', ARGV[3])
+redis.call('SET', KEYS[1], 1, 'EX', ARGV[1])
+return 1
+"""
+
+
+def get_partitions() -> int:
+    return int(os.getenv("CLUSTER_PARTITIONS", DEFAULT_PARTITIONS))
+
+
+def get_stream_key(partition: int) -> str:
+    return f"bot:updates:{partition}"
+
+
+def get_lease_key(partition: int) -> str:
+    return f"bot:cluster:lease:{partition}"
+
+
+def get_dedupe_key(update_id: int) -> str:
+    return f"bot:update:{update_id}"
+
+
+def parse_entry_id(entry_id: bytes) -> tuple[int, int]:
+    milliseconds, _, sequence = entry_id.partition(b"-")
+    return int(milliseconds), int(sequence)
+
+
+def get_partition(update: Update, partitions: int) -> int:
+    """Updates of a chat always land in the same partition, updates without a chat go by user."""
+    if update.effective_chat:
+        key = update.effective_chat.id
+    elif update.effective_user:
+        key = update.effective_user.id
+    else:
+        key = 0
+    return key % partitions
+
+
+def get_owner(partition: int, workers: list[str]) -> str:
+    """Pick the owner of a partition by rendezvous hashing, so a worker joining or leaving moves few partitions."""
+    return max(workers, key=lambda worker: hashlib.sha1(f"{worker}:{partition}".encode()).digest())
+
+
+def assign_partitions(worker_id: str, workers: list[str], partitions: int) -> set[int]:
+    if not workers:
+        return set()
+    return {p for p in range(partitions) if get_owner(p, workers) == worker_id}
+
+
+def require_redis_client() -> redis.Redis:
+    client = get_redis_client()
+    if client is None:
+        raise ValueError("Multi-worker mode needs a redis:// CACHE_URL")
+    return client
+
+
+class UpdatePublisher:
+    """Publish each received update once to the stream of its partition."""
+
+    def __init__(self, client: redis.Redis, partitions: int | None = None, max_length: int | None = None) -> None:
+        self.client = client
+        self.partitions = partitions or get_partitions()
+        self.max_length = max_length or int(os.getenv("CLUSTER_STREAM_MAX_LENGTH", DEFAULT_STREAM_MAX_LENGTH))
+        self._publish = client.register_script(PUBLISH_SCRIPT)
+
+    async def publish(self, update: Update) -> bool:
+        partition = get_partition(update, self.partitions)
+        published = await self._publish(
+            keys=[get_dedupe_key(update.update_id), get_stream_key(partition)],
+            args=[DEDUPE_TTL, self.max_length, json.dumps(update.to_dict(), ensure_ascii=False)],
+        )
+        if not published:
+            # redelivered by Telegram or received by another ingress instance
+            logger.info("Skipping duplicate update {update_id}", update_id=update.update_id)
+            return False
+        return True
+
+    async def __call__(self, update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
+        if isinstance(update, Update):
+            await self.publish(update)
+
+
+def build_ingress_application(token: str) -> Application:
+    """Build an application that only forwards updates to the workers, in the order they arrive."""
+    publisher = UpdatePublisher(require_redis_client())
+    app = Application.builder().token(token).update_queue(create_update_queue()).build()
+    app.add_handler(TypeHandler(Update, publisher))
+    return app
+
+
+class ClusterWorker:
+    """Process the updates of the partitions this worker owns.
+
+    Live workers heartbeat into a sorted set, and every worker assigns partitions to the live ones with rendezvous
+    hashing. A worker takes a partition by acquiring its lease, so two workers never read the same partition even
+    while their views of the membership differ. A partition is handed over only after its in-flight updates finish,
+    and the new owner claims the entries the old one never acknowledged before reading new ones.
+
+    An entry may still be running on a worker that lost its lease without leaving, so the entries of live workers
+    are only claimed once idle for live_claim_min_idle seconds, the lease TTL plus CLUSTER_MAX_HANDLER_TIME.
+
+    Updates reach the handlers through the update processor of the application, so the updates of a chat still run
+    one at a time and in order.
+    """
+
+    def __init__(
+        self,
+        application: Application,
+        client: redis.Redis,
+        partitions: int | None = None,
+        lease_ttl: float | None = None,
+        max_in_flight: int | None = None,
+        claim_min_idle: float = CLAIM_MIN_IDLE,
+        live_claim_min_idle: float | None = None,
+    ) -> None:
+        self.application = application
+        self.client = client
+        self.partitions = partitions or get_partitions()
+        self.lease_ttl = lease_ttl or float(os.getenv("CLUSTER_LEASE_TTL", DEFAULT_LEASE_TTL))
+        self.claim_min_idle = claim_min_idle
+        self.live_claim_min_idle = live_claim_min_idle or self.lease_ttl + float(
+            os.getenv("CLUSTER_MAX_HANDLER_TIME", DEFAULT_MAX_HANDLER_TIME)
+        )
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        # partitions whose lease this worker holds, and the ones among them it reads from
+        self.leases: set[int] = set()
+        self.owned: set[int] = set()
+        self._tasks: set[asyncio.Task[None]] = set()
+        self._in_flight: dict[int, set[asyncio.Task[None]]] = {}
+        self._slots = asyncio.Semaphore(max_in_flight or int(os.getenv("CLUSTER_MAX_IN_FLIGHT", DEFAULT_MAX_IN_FLIGHT)))
+        self._renew = client.register_script(RENEW_SCRIPT)
+        self._release = client.register_script(RELEASE_SCRIPT)
+        self._stopped = asyncio.Event()
+        # cleared while a read is in progress, a partition is only handed over once the read that may include it ends
+        self._read_done = asyncio.Event()
+        self._read_done.set()
+
+    async def run(self) -> None:
+        logger.info("Worker {worker_id} joining {n} partitions", worker_id=self.worker_id, n=self.partitions)
+        for partition in range(self.partitions):
+            with contextlib.suppress(ResponseError):
+                # the group already exists
+                await self.client.xgroup_create(get_stream_key(partition), GROUP, id="0", mkstream=True)
+
+        rebalance = asyncio.create_task(self._rebalance_forever())
+        try:
+            await self._consume()
+        finally:
+            # stop reading and let the in-flight updates finish while the rebalance task keeps the leases alive
+            self.owned.clear()
+            await self._drain()
+            rebalance.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await rebalance
+            await self._leave()
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    async def _rebalance_forever(self) -> None:
+        while True:
+            try:
+                await self.rebalance()
+            except Exception as e:
+                logger.warning("Failed to rebalance partitions, got error: {error}", error=e)
+            await asyncio.sleep(self.lease_ttl / 3)
+
+    async def rebalance(self) -> None:
+        now = time.time()
+        if self._stopped.is_set():
+            # let the others rebalance while this worker drains
+            await self.client.zrem(WORKERS_KEY, self.worker_id)
+        else:
+            await self.client.zadd(WORKERS_KEY, {self.worker_id: now})
+        await self.client.zremrangebyscore(WORKERS_KEY, "-inf", now - self.lease_ttl)
+        workers = sorted(value.decode() for value in await self.client.zrange(WORKERS_KEY, 0, -1))
+        desired = assign_partitions(self.worker_id, workers, self.partitions)
+
+        # stop reading right away, the lease is kept until the in-flight updates finish
+        for partition in sorted(self.owned - desired):
+            self.owned.discard(partition)
+            self._spawn(self._hand_over(partition))
+
+        ttl_ms = int(self.lease_ttl * 1000)
+        for partition in sorted(self.leases):
+            if not await self._renew(keys=[get_lease_key(partition)], args=[self.worker_id, ttl_ms]):
+                logger.warning("Lost the lease of partition {partition}", partition=partition)
+                self.leases.discard(partition)
+                self.owned.discard(partition)
+
+        for partition in sorted(desired - self.leases):
+            if await self.client.set(get_lease_key(partition), self.worker_id, nx=True, px=ttl_ms):
+                self.leases.add(partition)
+                self._spawn(self._take_over(partition))
+
+    def _spawn(self, coroutine: Coroutine[Any, Any, None]) -> None:
+        task = asyncio.create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _take_over(self, partition: int) -> None:
+        """Claim the entries previous owners read but never acknowledged, then start reading new ones.
+
+        The entries handed over or left by workers gone from the membership are claimed first, they are older than
+        any new entry. The entries of live workers may still be running there, they are claimed once they have been
+        idle for live_claim_min_idle seconds while this worker reads new ones.
+        """
+        claimed: set[bytes] = set()
+        reading = False
+        while partition in self.leases and not self._stopped.is_set():
+            if reading and partition not in self.owned:
+                # handed over again, the next owner claims whatever is left
+                return
+
+            gone, live = await self._claim(partition, claimed)
+            if not reading and not gone:
+                logger.info(
+                    "Taking over partition {partition} with {n} unacknowledged updates",
+                    partition=partition,
+                    n=len(claimed),
+                )
+                self.owned.add(partition)
+                reading = True
+            if not gone and not live:
+                return
+            await asyncio.sleep(self.claim_min_idle / 2 if gone else self.live_claim_min_idle / 10)
+
+    async def _claim(self, partition: int, claimed: set[bytes]) -> tuple[int, int]:
+        """Claim and dispatch the pending entries of other consumers that are idle long enough.
+
+        Returns:
+            The number of entries not claimed yet of workers gone from the membership, and of live workers
+        """
+        stream = get_stream_key(partition)
+        workers = {value.decode() for value in await self.client.zrange(WORKERS_KEY, 0, -1)}
+        pending = await self.client.xpending_range(stream, GROUP, min="-", max="+", count=10_000)
+
+        ready: dict[float, list[bytes]] = {}
+        gone = live = 0
+        for entry in pending:
+            consumer = entry["consumer"].decode()
+            if consumer == self.worker_id:
+                continue
+
+            min_idle = self._get_claim_min_idle(consumer, workers)
+            if entry["time_since_delivered"] >= min_idle * 1000:
+                ready.setdefault(min_idle, []).append(entry["message_id"])
+            elif consumer in workers:
+                live += 1
+            else:
+                gone += 1
+
+        entries = []
+        for min_idle, entry_ids in ready.items():
+            # checked again by Redis, an entry delivered again in the meantime is left to its consumer
+            entries += await self.client.xclaim(stream, GROUP, self.worker_id, int(min_idle * 1000), entry_ids)
+        for entry_id, fields in sorted(entries, key=lambda entry: parse_entry_id(entry[0])):
+            if not fields:
+                # trimmed from the stream before it was processed
+                await self.client.xack(stream, GROUP, entry_id)
+            elif entry_id not in claimed and partition in self.leases:
+                claimed.add(entry_id)
+                await self._dispatch(partition, entry_id, fields)
+        return gone, live
+
+    def _get_claim_min_idle(self, consumer: str, workers: set[str]) -> float:
+        if consumer == HANDED_OVER:
+            return 0.0
+        if consumer in workers:
+            return self.live_claim_min_idle
+        return self.claim_min_idle
+
+    async def _hand_over(self, partition: int) -> None:
+        # entries of the partition returned by a read still in progress are skipped, not processed
+        await self._read_done.wait()
+        tasks = self._in_flight.get(partition, set())
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        # the skipped entries are not running, the new owner claims them right away
+        stream = get_stream_key(partition)
+        pending = await self.client.xpending_range(
+            stream, GROUP, min="-", max="+", count=10_000, consumername=self.worker_id
+        )
+        if pending:
+            entry_ids = [entry["message_id"] for entry in pending]
+            await self.client.xclaim(stream, GROUP, HANDED_OVER, 0, entry_ids, justid=True)
+
+        self.leases.discard(partition)
+        await self._release(keys=[get_lease_key(partition)], args=[self.worker_id])
+        logger.info("Handed over partition {partition}", partition=partition)
+
+    async def _drain(self) -> None:
+        tasks = [*self._tasks, *[task for tasks in self._in_flight.values() for task in tasks]]
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _leave(self) -> None:
+        for partition in sorted(self.leases):
+            await self._release(keys=[get_lease_key(partition)], args=[self.worker_id])
+        self.leases.clear()
+        await self.client.zrem(WORKERS_KEY, self.worker_id)
+        logger.info("Worker {worker_id} left", worker_id=self.worker_id)
+
+    async def _consume(self) -> None:
+        while not self._stopped.is_set():
+            if not self.owned:
+                with contextlib.suppress(TimeoutError):
+                    await asyncio.wait_for(self._stopped.wait(), timeout=READ_BLOCK_MS / 1000)
+                continue
+
+            streams: dict[Any, Any] = {get_stream_key(p): ">" for p in sorted(self.owned)}
+            self._read_done.clear()
+            try:
+                response = await self.client.xreadgroup(
+                    GROUP, self.worker_id, streams, count=READ_COUNT, block=READ_BLOCK_MS
+                )
+                for stream, entries in response or []:
+                    partition = int(stream.decode().rsplit(":", 1)[1])
+                    for entry_id, fields in entries:
+                        # handed over while the read was blocked, the new owner claims the entry
+                        if partition in self.owned:
+                            await self._dispatch(partition, entry_id, fields)
+            except Exception as e:
+                logger.warning("Failed to read updates, got error: {error}", error=e)
+                await asyncio.sleep(1)
+            finally:
+                self._read_done.set()
+
+    async def _dispatch(self, partition: int, entry_id: bytes, fields: dict[bytes, bytes]) -> None:
+        # wait for a free slot, so a slow worker reads no more than it can process
+        await self._slots.acquire()
+        task = asyncio.create_task(self._process(partition, entry_id, fields))
+        self._in_flight.setdefault(partition, set()).add(task)
+        task.add_done_callback(lambda t: self._done(partition, t))
+
+    def _done(self, partition: int, task: asyncio.Task[None]) -> None:
+        self._slots.release()
+        self._in_flight.get(partition, set()).discard(task)
+
+    async def _process(self, partition: int, entry_id: bytes, fields: dict[bytes, bytes]) -> None:
+        try:
+            update = Update.de_json(json.loads(fields[b"update"]), self.application.bot)
+            await self.application.update_processor.process_update(update, self.application.process_update(update))
+        except Exception as e:
+            logger.exception("Failed to process update {entry_id}, got error: {error}", entry_id=entry_id, error=e)
+        # a failed update is not retried, retrying would block the updates of its chat behind it
+        await self.client.xack(get_stream_key(partition), GROUP, entry_id)
+
+
+async def serve_worker(application: Application) -> None:
+    """Run the application as a worker until SIGINT or SIGTERM, with the same hooks as polling mode."""
+    worker = ClusterWorker(application, require_redis_client())
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+
+    await application.initialize()
+    try:
+        if application.post_init:
+            await application.post_init(application)
+        await application.start()
+        await worker.run()
+    finally:
+        if application.running:
+            await application.stop()
+            if application.post_stop:
+                await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
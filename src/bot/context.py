@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+from typing import Any
+from typing import Final
+from typing import NamedTuple
+
+from loguru import logger
+
+from .cache import TieredCache
+from .chains.conversation import summarize_conversation
+from .memory import get_idle_ttl
+from .tokens import get_tokenizer
+
+DEFAULT_CONTEXT_MAX_TOKENS: Final[int] = 16_000
+# each old message contributes at most this many tokens to the summary prompt
+SUMMARY_ITEM_MAX_TOKENS: Final[int] = 1_000
+
+Item = dict[str, Any]
+
+
+class RollingSummary(NamedTuple):
+    text: str
+    # fingerprint of the newest message folded into the summary
+    until: str
+
+
+def get_summary_key(chat_id: int) -> str:
+    return f"bot:{chat_id}:summary"
+
+
+def item_text(item: Item) -> str:
+    """Return the text of an input item, joining the text parts of structured content."""
+    content = item.get("content")
+    if isinstance(content, str):
+        text = content
+    elif isinstance(content, list):
+        text = "\n".join(part.get("text", "") for part in content if isinstance(part, dict))
+    else:
+        return json.dumps(item, ensure_ascii=False)
+
+    role = item.get("role")
+    return f"{role}: {text}" if role else text
+
+
+def fingerprint(item: Item) -> str:
+    return hashlib.sha1(json.dumps(item, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def split_by_budget(items: list[Item], max_tokens: int) -> tuple[list[Item], list[Item]]:
+    """Keep the newest items that fit in max_tokens, the newest item is always kept.
+
+    Returns:
+        The older items that did not fit and the kept items, both oldest first
+    """
+    tokenizer = get_tokenizer()
+    tokens = 0
+    start = len(items)
+    while start > 0:
+        item_tokens = tokenizer.count(item_text(items[start - 1]))
+        if start < len(items) and tokens + item_tokens > max_tokens:
+            break
+        tokens += item_tokens
+        start -= 1
+    return items[:start], items[start:]
+
+
+def unsummarized(dropped: list[Item], summary: RollingSummary | None) -> list[Item]:
+    """Return the dropped items that are newer than the ones already folded into the summary."""
+    if summary is None:
+        return dropped
+
+    for i in range(len(dropped) - 1, -1, -1):
+        if fingerprint(dropped[i]) == summary.until:
+            return dropped[i + 1 :]
+
+    # the summary covers messages that have already left the memory
+    return dropped
+
+
+def truncate(text: str, max_tokens: int) -> str:
+    cuts = get_tokenizer().split(text, max_tokens)
+    return text[: cuts[0]] + "…" if cuts else text
+
+
+class ContextWindow:
+    """Fit a chat history into a token budget for the configured model.
+
+    The newest items are kept within max_tokens. Older items are replaced by a running summary stored at
+    bot:{chat_id}:summary, which is refreshed in a background task so no request waits for it. Until the refresh
+    finishes, the newest old items are simply left out.
+    """
+
+    def __init__(self, cache: TieredCache, max_tokens: int | None = None) -> None:
+        self.cache = cache
+        self.max_tokens = max_tokens or int(os.getenv("CONTEXT_MAX_TOKENS", DEFAULT_CONTEXT_MAX_TOKENS))
+        self._tasks: dict[int, asyncio.Task[None]] = {}
+
+    async def build(self, chat_id: int, items: list[Any]) -> list[Any]:
+        summary = await self.get_summary(chat_id)
+        summary_tokens = get_tokenizer().count(summary.text) if summary else 0
+
+        dropped, kept = split_by_budget(items, max(self.max_tokens - summary_tokens, 0))
+        if not dropped:
+            return kept
+
+        logger.info(
+            "Context of chat {chat_id}: kept {kept} items, {dropped} older items are summarized",
+            chat_id=chat_id,
+            kept=len(kept),
+            dropped=len(dropped),
+        )
+
+        pending = unsummarized(dropped, summary)
+        if pending:
+            self.schedule_refresh(chat_id, summary, pending)
+
+        if summary is None:
+            return kept
+        return [{"role": "system", "content": f"Summary of the earlier conversation:\n{summary.text}"}, *kept]
+
+    async def get_summary(self, chat_id: int) -> RollingSummary | None:
+        # skip the in-process tier, the summary may have been refreshed by another worker
+        value = await self.cache.get(get_summary_key(chat_id), local=False)
+        if value is None:
+            return None
+        return RollingSummary(**json.loads(value))
+
+    def schedule_refresh(self, chat_id: int, summary: RollingSummary | None, pending: list[Item]) -> None:
+        # one refresh per chat at a time, the next turn picks up whatever it missed
+        if chat_id in self._tasks:
+            return
+
+        task = asyncio.create_task(self._refresh(chat_id, summary, pending))
+        self._tasks[chat_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(chat_id, None))
+
+    async def _refresh(self, chat_id: int, summary: RollingSummary | None, pending: list[Item]) -> None:
+        try:
+            text = await summarize_conversation(
+                [truncate(item_text(item), SUMMARY_ITEM_MAX_TOKENS) for item in pending],
+                previous_summary=summary.text if summary else None,
+            )
+        except Exception as e:
+            logger.warning("Failed to summarize the conversation of chat {chat_id}: {error}", chat_id=chat_id, error=e)
+            return
+
+        new_summary = RollingSummary(text=text, until=fingerprint(pending[-1]))
+        await self.cache.set(
+            get_summary_key(chat_id),
+            json.dumps(new_summary._asdict(), ensure_ascii=False),
+            ttl=get_idle_ttl(),
+            local=False,
+        )
+        logger.info("Refreshed the conversation summary of chat {chat_id}", chat_id=chat_id)
+
+    async def close(self) -> None:
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+from functools import cache
+from typing import Final
+from typing import NamedTuple
+
+from agents import function_tool
+from loguru import logger
+
+from .cache import LRUCache
+from .cache import get_cache_from_env
+from .chains.chunker import chunk_text
+from .tokens import get_tokenizer
+
+DEFAULT_DOCUMENT_TTL: Final[int] = 7 * 24 * 60 * 60
+DEFAULT_DOCUMENT_MAX_BYTES: Final[int] = 256 * 1024 * 1024
+DIGEST_MAX_TOKENS: Final[int] = 150
+READ_MAX_TOKENS: Final[int] = 8_000
+READ_CHUNK_TOKENS: Final[int] = 1_000
+
+WORD: Final[re.Pattern[str]] = re.compile(r"\w+")
+
+
+class Document(NamedTuple):
+    id: str
+    url: str
+    digest: str
+
+
+@cache
+def get_document_store() -> LRUCache:
+    return LRUCache(
+        get_cache_from_env(),
+        namespace="doc",
+        max_bytes=int(os.getenv("DOCUMENT_STORE_MAX_BYTES", DEFAULT_DOCUMENT_MAX_BYTES)),
+        ttl=int(os.getenv("DOCUMENT_STORE_TTL", DEFAULT_DOCUMENT_TTL)),
+    )
+
+
+def get_document_id(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def make_digest(text: str, max_tokens: int = DIGEST_MAX_TOKENS) -> str:
+    # a token is rarely longer than 16 characters, so there is no need to look further
+    text = " ".join(text[: max_tokens * 16].split())
+    cuts = get_tokenizer().split(text, max_tokens)
+    return text[: cuts[0]] + "…" if cuts else text
+
+
+async def save_document(url: str, text: str) -> Document:
+    document = Document(id=get_document_id(text), url=url, digest=make_digest(text))
+    await get_document_store().set(document.id, text)
+    return document
+
+
+def format_content(url: str, text: str) -> str:
+    return f"[URL content from {url}]:\n'''\n{text}\n'''\n[END of URL content]\n"
+
+
+def format_reference(document: Document) -> str:
+    return (
+        f"[URL content from {document.url} is stored as document {document.id}, "
+        f"call read_document to read it]:\n'''\n{document.digest}\n'''\n"
+    )
+
+
+def select_chunks(
+    text: str,
+    query: str | None,
+    max_tokens: int = READ_MAX_TOKENS,
+    chunk_tokens: int = READ_CHUNK_TOKENS,
+) -> str:
+    """Return the whole text if it fits in max_tokens, else the chunks sharing the most words with the query."""
+    tokenizer = get_tokenizer()
+    if tokenizer.count(text) <= max_tokens:
+        return text
+
+    chunks = list(chunk_text(text, max_tokens=chunk_tokens, tokenizer=tokenizer))
+    words = set(WORD.findall(query.lower())) if query else set()
+    scores = [len(words & set(WORD.findall(chunk.lower()))) for chunk in chunks]
+
+    # the best chunks in their original order, ties go to earlier chunks
+    ranked = sorted(range(len(chunks)), key=lambda i: (-scores[i], i))
+    selected = sorted(ranked[: max(max_tokens // chunk_tokens, 1)])
+    return "\n...\n".join(chunks[i] for i in selected)
+
+
+@function_tool
+async def read_document(document_id: str, query: str | None = None) -> str:
+    """Read a document that was shared earlier in the conversation.
+
+    Args:
+        document_id: The id of the document
+        query: What to look for, long documents return only the most relevant parts
+    """
+    text = await get_document_store().get(document_id)
+    if text is None:
+        logger.info("Document {id} not found", id=document_id)
+        return f"Document {document_id} is no longer available, ask the user to send the URL again."
+    return select_chunks(text, query)
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+import os
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+from typing import Final
+from typing import Literal
+from typing import TypedDict
+from typing import TypeVar
+
+from loguru import logger
+
+T = TypeVar("T")
+
+PoolName = Literal["llm", "io"]
+
+# llm: network-bound calls to the model provider, io: blocking scrapers, parsers and SDKs
+DEFAULT_MAX_WORKERS: Final[dict[str, int]] = {"llm": 32, "io": 8}
+SLOW_WAIT_SECONDS: Final[float] = 1.0
+
+_executors: dict[str, BoundedExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+class ExecutorStats(TypedDict):
+    max_workers: int
+    queued: int
+    running: int
+    completed: int
+    wait_total: float
+    wait_max: float
+
+
+class BoundedExecutor(ThreadPoolExecutor):
+    """A thread pool that records queue depth and how long tasks wait for a free worker."""
+
+    def __init__(self, name: str, max_workers: int) -> None:
+        super().__init__(max_workers=max_workers, thread_name_prefix=f"bot-{name}")
+        self.name = name
+        self.max_workers = max_workers
+
+        self._stats_lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._completed = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def submit(self, fn: Callable[..., T], /, *args: Any, **kwargs: Any) -> Future[T]:
+        submitted_at = time.perf_counter()
+        with self._stats_lock:
+            self._queued += 1
+
+        def run() -> T:
+            waited = time.perf_counter() - submitted_at
+            with self._stats_lock:
+                self._queued -= 1
+                self._running += 1
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+
+            if waited > SLOW_WAIT_SECONDS:
+                logger.warning(
+                    "Task waited {waited:.2f}s for a worker in executor {name}",
+                    waited=waited,
+                    name=self.name,
+                )
+
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._stats_lock:
+                    self._running -= 1
+                    self._completed += 1
+
+        return super().submit(run)
+
+    def stats(self) -> ExecutorStats:
+        with self._stats_lock:
+            return ExecutorStats(
+                max_workers=self.max_workers,
+                queued=self._queued,
+                running=self._running,
+                completed=self._completed,
+                wait_total=self._wait_total,
+                wait_max=self._wait_max,
+            )
+
+
+def get_max_workers(name: PoolName) -> int:
+    value = os.getenv(f"EXECUTOR_{name.upper()}_WORKERS")
+    if not value:
+        return DEFAULT_MAX_WORKERS[name]
+    return int(value)
+
+
+def get_executor(name: PoolName = "io") -> BoundedExecutor:
+    """Get the process-wide executor for the given pool, creating it on first use."""
+    with _executors_lock:
+        executor = _executors.get(name)
+        if executor is None:
+            executor = BoundedExecutor(name, max_workers=get_max_workers(name))
+            _executors[name] = executor
+            logger.info("Created executor {name} with {n} workers", name=name, n=executor.max_workers)
+        return executor
+
+
+async def run_in_executor(func: Callable[..., T], *args: Any, pool: PoolName = "io", **kwargs: Any) -> T:
+    """Run a blocking function on a shared executor without blocking the event loop.
+
+    Args:
+        func: The blocking function to call
+        pool: The executor pool to run on, "llm" for model calls and "io" for everything else
+
+    Returns:
+        The return value of the function
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(pool), functools.partial(func, *args, **kwargs))
+
+
+def get_executor_stats() -> dict[str, ExecutorStats]:
+    with _executors_lock:
+        return {name: executor.stats() for name, executor in _executors.items()}
+
+
+def shutdown_executors(wait: bool = True) -> None:
+    with _executors_lock:
+        executors = list(_executors.values())
+        _executors.clear()
+
+    for executor in executors:
+        logger.info("Shutting down executor {name}: {stats}", name=executor.name, stats=executor.stats())
+        executor.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,13 @@
+from .browser import BrowserPool
+from .browser import PooledPlaywrightLoader
+from .browser import get_browser_pool
+from .cache import get_url_cache
+from .cache import load_url_cached
+from .cache import normalize_url
+from .http import HttpLoader
+from .http import close_http_client
+from .router import LoaderRouter
+from .router import UrlKind
+from .router import classify_url
+from .router import get_loader_router
+from .router import get_loader_stats
@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import os
+from collections.abc import AsyncIterator
+from functools import cache
+from typing import Final
+from typing import Literal
+
+from kabigon.loader import Loader
+from kabigon.utils import html_to_markdown
+from loguru import logger
+from playwright.async_api import Browser
+from playwright.async_api import BrowserContext
+from playwright.async_api import Page
+from playwright.async_api import Playwright
+from playwright.async_api import async_playwright
+
+from ..executor import run_in_executor
+
+WaitUntil = Literal["commit", "domcontentloaded", "load", "networkidle"]
+
+DEFAULT_MAX_CONCURRENCY: Final[int] = 4
+DEFAULT_MAX_PAGES_PER_CONTEXT: Final[int] = 20
+DEFAULT_MAX_PAGES_PER_BROWSER: Final[int] = 500
+DEFAULT_MAX_HEAP_BYTES: Final[int] = 256 * 1024 * 1024
+
+JS_HEAP_SIZE_SCRIPT: Final[str] = "() => performance.memory ? performance.memory.usedJSHeapSize : 0"
+
+
+class PooledContext:
+    def __init__(self, browser: Browser, context: BrowserContext) -> None:
+        self.browser = browser
+        self.context = context
+        self.pages = 0
+
+
+class BrowserPool:
+    """A warm Chromium instance with reusable browser contexts.
+
+    At most max_concurrency pages are open at a time. A context is closed after max_pages_per_context
+    pages or when a page leaves a JS heap larger than max_heap_bytes, and the browser is relaunched after
+    max_pages_per_browser pages, once the pages still open on it are done.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        max_pages_per_context: int = DEFAULT_MAX_PAGES_PER_CONTEXT,
+        max_pages_per_browser: int = DEFAULT_MAX_PAGES_PER_BROWSER,
+        max_heap_bytes: int = DEFAULT_MAX_HEAP_BYTES,
+        headless: bool = False,
+    ) -> None:
+        self.max_concurrency = max_concurrency
+        self.max_pages_per_context = max_pages_per_context
+        self.max_pages_per_browser = max_pages_per_browser
+        self.max_heap_bytes = max_heap_bytes
+        self.headless = headless
+
+        self._playwright: Playwright | None = None
+        self._browser: Browser | None = None
+        self._browser_pages = 0
+        self._idle: list[PooledContext] = []
+        # browser -> number of pages open on it
+        self._active: dict[Browser, int] = {}
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._lock = asyncio.Lock()
+
+        self.pages_loaded = 0
+        self.contexts_recycled = 0
+        self.browsers_launched = 0
+
+    async def start(self) -> None:
+        async with self._lock:
+            if self._browser is not None and self._browser.is_connected():
+                return
+
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+
+            browser = await self._playwright.chromium.launch(headless=self.headless)
+            self._browser = browser
+            self._browser_pages = 0
+            self._active[browser] = 0
+            self._idle = [PooledContext(browser, await browser.new_context()) for _ in range(self.max_concurrency)]
+            self.browsers_launched += 1
+            logger.info("Launched browser with {n} warm contexts", n=len(self._idle))
+
+    async def warm_up(self) -> None:
+        """Launch the browser ahead of the first page, without failing when Chromium is unavailable."""
+        try:
+            await self.start()
+        except Exception as e:
+            logger.warning("Failed to launch browser, pages will retry when they are loaded: {error}", error=e)
+
+    async def stop(self) -> None:
+        async with self._lock:
+            for browser in list(self._active):
+                await self._close_browser(browser)
+            self._browser = None
+            self._idle = []
+
+            if self._playwright is not None:
+                await self._playwright.stop()
+                self._playwright = None
+            logger.info("Stopped browser pool")
+
+    @contextlib.asynccontextmanager
+    async def page(self) -> AsyncIterator[Page]:
+        async with self._semaphore:
+            pooled = await self._acquire()
+            page: Page | None = None
+            try:
+                page = await pooled.context.new_page()
+                yield page
+            finally:
+                await self._release(pooled, page)
+
+    async def fetch(self, url: str, timeout: float | None = None, wait_until: WaitUntil | None = None) -> str:
+        async with self.page() as page:
+            await page.goto(url, timeout=timeout, wait_until=wait_until)
+            return await page.content()
+
+    async def _acquire(self) -> PooledContext:
+        pooled: PooledContext | None = None
+        while pooled is None:
+            # the browser may be retired by another page while we wait for start
+            await self.start()
+            if self._idle:
+                pooled = self._idle.pop()
+            elif self._browser is not None:
+                pooled = PooledContext(self._browser, await self._browser.new_context())
+
+        self._active[pooled.browser] = self._active.get(pooled.browser, 0) + 1
+        return pooled
+
+    async def _release(self, pooled: PooledContext, page: Page | None) -> None:
+        heap_size = 0
+        if page is not None:
+            with contextlib.suppress(Exception):
+                heap_size = await page.evaluate(JS_HEAP_SIZE_SCRIPT)
+            with contextlib.suppress(Exception):
+                await page.close()
+            pooled.pages += 1
+            self.pages_loaded += 1
+
+        # the browser is gone from the pool when stop() closed it while this page was open
+        if pooled.browser in self._active:
+            self._active[pooled.browser] -= 1
+
+        if pooled.browser is self._browser:
+            self._browser_pages += 1
+            if self._browser_pages >= self.max_pages_per_browser:
+                logger.info("Recycling browser after {n} pages", n=self._browser_pages)
+                self._retire_browser()
+
+        # without a page the context failed to open one, and it is closed instead of reused
+        if (
+            page is not None
+            and pooled.browser is self._browser
+            and pooled.pages < self.max_pages_per_context
+            and heap_size <= self.max_heap_bytes
+        ):
+            self._idle.append(pooled)
+        else:
+            self.contexts_recycled += 1
+            with contextlib.suppress(Exception):
+                await pooled.context.close()
+
+        if pooled.browser is not self._browser and self._active.get(pooled.browser) == 0:
+            await self._close_browser(pooled.browser)
+
+    def _retire_browser(self) -> None:
+        # the next acquire launches a new browser, the old one closes when its last page is released
+        self._browser = None
+        self._idle = []
+
+    async def _close_browser(self, browser: Browser) -> None:
+        self._active.pop(browser, None)
+        with contextlib.suppress(Exception):
+            await browser.close()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "pages_loaded": self.pages_loaded,
+            "contexts_recycled": self.contexts_recycled,
+            "browsers_launched": self.browsers_launched,
+            "idle_contexts": len(self._idle),
+        }
+
+
+@cache
+def get_browser_pool() -> BrowserPool:
+    return BrowserPool(
+        max_concurrency=int(os.getenv("BROWSER_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY)),
+        max_pages_per_context=int(os.getenv("BROWSER_MAX_PAGES_PER_CONTEXT", DEFAULT_MAX_PAGES_PER_CONTEXT)),
+        max_pages_per_browser=int(os.getenv("BROWSER_MAX_PAGES", DEFAULT_MAX_PAGES_PER_BROWSER)),
+        max_heap_bytes=int(os.getenv("BROWSER_MAX_HEAP_BYTES", DEFAULT_MAX_HEAP_BYTES)),
+        headless=os.getenv("BROWSER_HEADLESS", "false").lower() in ("1", "true", "yes"),
+    )
+
+
+class PooledPlaywrightLoader(Loader):
+    """Load a page in the warm browser pool and convert it to markdown."""
+
+    def __init__(self, timeout: float | None = 0, wait_until: WaitUntil | None = None) -> None:
+        self.timeout = timeout
+        self.wait_until = wait_until
+
+    async def async_load(self, url: str) -> str:
+        content = await get_browser_pool().fetch(url, timeout=self.timeout, wait_until=self.wait_until)
+        return await run_in_executor(html_to_markdown, content)
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import hashlib
+import os
+from collections.abc import Awaitable
+from collections.abc import Callable
+from functools import cache
+from typing import Final
+from urllib.parse import parse_qsl
+from urllib.parse import urlencode
+from urllib.parse import urlsplit
+from urllib.parse import urlunsplit
+
+from loguru import logger
+
+from ..cache import LRUCache
+from ..cache import SingleFlight
+from ..cache import get_cache_from_env
+
+DEFAULT_URL_CACHE_TTL: Final[int] = 6 * 60 * 60
+DEFAULT_URL_CACHE_MAX_BYTES: Final[int] = 64 * 1024 * 1024
+
+TRACKING_PARAMS: Final[frozenset[str]] = frozenset(
+    {"fbclid", "gclid", "igshid", "mc_cid", "mc_eid", "ref_src", "si", "spm"}
+)
+DEFAULT_PORTS: Final[dict[str, int]] = {"http": 80, "https": 443}
+
+_single_flight: SingleFlight[str] = SingleFlight()
+
+
+def normalize_url(url: str) -> str:
+    """Normalize a URL so that trivially different links share one cache entry.
+
+    Lowercases the scheme and host, drops default ports, fragments and tracking parameters,
+    and sorts the remaining query parameters.
+
+    Args:
+        url: The URL to normalize
+
+    Returns:
+        The normalized URL
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+
+    netloc = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{netloc}:{parts.port}"
+
+    query = sorted(
+        (k, v)
+        for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.startswith("utm_") and k not in TRACKING_PARAMS
+    )
+    return urlunsplit((scheme, netloc, parts.path or "/", urlencode(query), ""))
+
+
+def hash_url(url: str) -> str:
+    return hashlib.sha256(normalize_url(url).encode("utf-8")).hexdigest()
+
+
+@cache
+def get_url_cache() -> LRUCache:
+    return LRUCache(
+        get_cache_from_env(),
+        namespace="url",
+        max_bytes=int(os.getenv("URL_CACHE_MAX_BYTES", DEFAULT_URL_CACHE_MAX_BYTES)),
+        ttl=int(os.getenv("URL_CACHE_TTL", DEFAULT_URL_CACHE_TTL)),
+    )
+
+
+async def load_url_cached(url: str, load: Callable[[str], Awaitable[str]]) -> str:
+    """Load a URL through the content cache.
+
+    Concurrent calls for the same normalized URL share a single load.
+
+    Args:
+        url: The URL to load
+        load: The loader to call on a cache miss
+
+    Returns:
+        The content of the URL
+    """
+    key = hash_url(url)
+    url_cache = get_url_cache()
+
+    content = await url_cache.get(key)
+    if content is not None:
+        logger.info("URL cache hit for {url}", url=url)
+        return content
+
+    async def load_and_store() -> str:
+        content = await load(url)
+        if content:
+            await url_cache.set(key, content)
+        return content
+
+    return await _single_flight.do(key, load_and_store)
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import io
+from functools import cache
+from typing import Final
+
+import httpx
+from kabigon.loader import Loader
+from kabigon.pdf import read_pdf_content
+from kabigon.utils import html_to_markdown
+
+from ..executor import run_in_executor
+
+DEFAULT_HEADERS: Final[dict[str, str]] = {
+    "Accept-Language": "zh-TW,zh;q=0.9,ja;q=0.8,en-US;q=0.7,en;q=0.6",
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/129.0.0.0 Safari/537.36",  # noqa
+    "Cookie": "over18=1",  # Required for some sites like PTT
+}
+DEFAULT_TIMEOUT: Final[float] = 15.0
+
+
+@cache
+def get_http_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(headers=DEFAULT_HEADERS, follow_redirects=True, timeout=DEFAULT_TIMEOUT)
+
+
+async def close_http_client() -> None:
+    if get_http_client.cache_info().currsize:
+        await get_http_client().aclose()
+        get_http_client.cache_clear()
+
+
+def is_pdf_response(response: httpx.Response) -> bool:
+    content_type = response.headers.get("content-type", "")
+    return content_type.split(";")[0].strip().lower() == "application/pdf"
+
+
+class HttpLoader(Loader):
+    """Fetch a URL with a plain HTTP request on a shared client.
+
+    HTML is converted to markdown and PDF responses are converted to text, both off the event loop.
+    """
+
+    async def async_load(self, url: str) -> str:
+        response = await get_http_client().get(url)
+        response.raise_for_status()
+
+        if is_pdf_response(response):
+            return await run_in_executor(read_pdf_content, io.BytesIO(response.content))
+        return await run_in_executor(html_to_markdown, response.content)
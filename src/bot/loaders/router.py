@@ -0,0 +1,250 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import re
+import time
+from enum import Enum
+from functools import cache
+from typing import Final
+from urllib.parse import urlsplit
+
+import kabigon
+from kabigon.compose import replace_domain
+from kabigon.loader import Loader
+from kabigon.loader import LoaderError
+from loguru import logger
+
+from .browser import PooledPlaywrightLoader
+from .http import HttpLoader
+
+# content counts as usable when its prose, lines of at least MIN_LINE_WORDS words, holds MIN_WORDS words
+MIN_WORDS: Final[int] = 50
+MIN_LINE_WORDS: Final[int] = 5
+# JS shells, consent walls and paywalls, only trusted when the page has little prose besides them
+BLOCKED_PHRASES: Final[tuple[str, ...]] = (
+    "enable javascript",
+    "javascript is disabled",
+    "javascript is required",
+    "checking your browser",
+    "verify you are human",
+    "accept cookies",
+    "accept all cookies",
+    "cookie settings",
+    "subscribe to continue",
+    "subscribe to read",
+    "sign in to continue",
+    "log in to continue",
+)
+BLOCKED_MAX_WORDS: Final[int] = 300
+
+CJK: Final[str] = "\u3040-\u30ff\u3400-\u9fff\uac00-\ud7af"
+# a CJK character counts as one word, other words are runs of letters
+WORD_PATTERN: Final[re.Pattern[str]] = re.compile(rf"[{CJK}]|[^\W\d_{CJK}]+")
+LINK_PATTERN: Final[re.Pattern[str]] = re.compile(r"!\[[^\]]*\]\([^)]*\)|\[([^\]]*)\]\([^)]*\)|https?://\S+")
+
+YOUTUBE_HOSTS: Final[frozenset[str]] = frozenset(
+    {"youtube.com", "www.youtube.com", "m.youtube.com", "music.youtube.com", "youtu.be"}
+)
+INSTAGRAM_HOSTS: Final[frozenset[str]] = frozenset({"instagram.com", "www.instagram.com"})
+MEDIA_HOSTS: Final[frozenset[str]] = frozenset(
+    {
+        "vimeo.com",
+        "player.vimeo.com",
+        "tiktok.com",
+        "www.tiktok.com",
+        "twitch.tv",
+        "www.twitch.tv",
+        "clips.twitch.tv",
+        "dailymotion.com",
+        "www.dailymotion.com",
+        "soundcloud.com",
+        "bilibili.com",
+        "www.bilibili.com",
+        "b23.tv",
+        "podcasts.apple.com",
+    }
+)
+MEDIA_EXTENSIONS: Final[tuple[str, ...]] = (".mp3", ".m4a", ".wav", ".ogg", ".mp4", ".mov", ".webm", ".m3u8")
+
+
+class UrlKind(str, Enum):
+    YOUTUBE = "youtube"
+    REEL = "reel"
+    MEDIA = "media"
+    PDF = "pdf"
+    HTML = "html"
+
+
+def classify_url(url: str) -> UrlKind:
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    path = parts.path.lower()
+
+    if host in YOUTUBE_HOSTS:
+        return UrlKind.YOUTUBE
+    if host in INSTAGRAM_HOSTS and path.startswith("/reel"):
+        return UrlKind.REEL
+    if host in MEDIA_HOSTS or path.endswith(MEDIA_EXTENSIONS):
+        return UrlKind.MEDIA
+    if path.endswith(".pdf"):
+        return UrlKind.PDF
+    return UrlKind.HTML
+
+
+def count_prose_words(content: str) -> int:
+    """Count the words of the readable prose in loaded content.
+
+    Link targets, image tags and bare URLs are dropped, and lines shorter than MIN_LINE_WORDS words such as
+    menus, buttons and headings are not counted.
+    """
+    text = LINK_PATTERN.sub(lambda m: m.group(1) or "", content)
+    total = 0
+    for line in text.splitlines():
+        words = len(WORD_PATTERN.findall(line))
+        if words >= MIN_LINE_WORDS:
+            total += words
+    return total
+
+
+def is_usable(content: str) -> bool:
+    words = count_prose_words(content)
+    if words < MIN_WORDS:
+        return False
+    if words < BLOCKED_MAX_WORDS:
+        lowered = content.lower()
+        return not any(phrase in lowered for phrase in BLOCKED_PHRASES)
+    return True
+
+
+def rank_content(content: str) -> tuple[int, int]:
+    return count_prose_words(content), len(content)
+
+
+def get_loader_name(loader: Loader) -> str:
+    name = loader.__class__.__name__
+    if isinstance(loader, PooledPlaywrightLoader):
+        name += f"[{loader.wait_until or 'load'}]"
+    return name
+
+
+class LoaderStats:
+    def __init__(self) -> None:
+        self.successes = 0
+        self.failures = 0
+        self.latency_total = 0.0
+
+    def record(self, success: bool, latency: float) -> None:
+        if success:
+            self.successes += 1
+        else:
+            self.failures += 1
+        self.latency_total += latency
+
+    @property
+    def success_rate(self) -> float:
+        total = self.successes + self.failures
+        return self.successes / total if total else 0.0
+
+    @property
+    def latency_mean(self) -> float:
+        total = self.successes + self.failures
+        return self.latency_total / total if total else 0.0
+
+    def __repr__(self) -> str:
+        return (
+            f"LoaderStats(successes={self.successes}, failures={self.failures}, "
+            f"success_rate={self.success_rate:.2f}, latency_mean={self.latency_mean:.2f}s)"
+        )
+
+
+class LoaderRouter(Loader):
+    """Dispatch a URL straight to the loaders that fit its kind.
+
+    Each route is a list of stages, a stage only runs when the ones before it returned nothing. The loaders of
+    one stage run concurrently and the first usable result wins, or the one with the most prose once all of them
+    are done, so a cheap HTTP fetch can be hedged against Playwright for generic HTML pages. yt-dlp downloads and
+    transcribes the media, so it only runs for YouTube and media URLs.
+    """
+
+    def __init__(self, hedge: bool = True) -> None:
+        http_loader = HttpLoader()
+        playwright_loader = PooledPlaywrightLoader(timeout=50_000, wait_until="networkidle")
+        ytdlp_loader = kabigon.YtdlpLoader()
+
+        # hedge the cheap HTTP fetch against Playwright, or try them one after the other
+        html_route: list[list[Loader]] = (
+            [[http_loader, playwright_loader]] if hedge else [[http_loader], [playwright_loader]]
+        )
+        html_route.append([PooledPlaywrightLoader(timeout=10_000)])
+
+        self.routes: dict[UrlKind, list[list[Loader]]] = {
+            UrlKind.YOUTUBE: [[kabigon.YoutubeLoader()], [ytdlp_loader]],
+            UrlKind.REEL: [[kabigon.ReelLoader()]],
+            UrlKind.MEDIA: [[ytdlp_loader], *html_route],
+            UrlKind.PDF: [[kabigon.PDFLoader()], *html_route],
+            UrlKind.HTML: html_route,
+        }
+        self.stats: dict[str, LoaderStats] = {}
+
+    def load(self, url: str) -> str:
+        return asyncio.run(self.async_load(url))
+
+    async def async_load(self, url: str) -> str:
+        url = replace_domain(url)
+        kind = classify_url(url)
+        logger.info("Routing {url} as {kind}", url=url, kind=kind.value)
+
+        for stage in self.routes[kind]:
+            content = await self._race(stage, url)
+            # a short page is returned as it is, the next stages would only load it again more slowly
+            if content:
+                return content
+        raise LoaderError(f"Failed to load URL: {url}")
+
+    async def _race(self, loaders: list[Loader], url: str) -> str:
+        tasks = [asyncio.create_task(self._load(loader, url)) for loader in loaders]
+        best = ""
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                content = await next_done
+                if is_usable(content):
+                    return content
+                best = max(best, content, key=rank_content)
+        finally:
+            for task in tasks:
+                task.cancel()
+        return best
+
+    async def _load(self, loader: Loader, url: str) -> str:
+        name = get_loader_name(loader)
+        stats = self.stats.setdefault(name, LoaderStats())
+
+        start = time.perf_counter()
+        try:
+            content = await loader.async_load(url)
+        except asyncio.CancelledError:
+            logger.info("[{}] Cancelled loading URL: {}", name, url)
+            raise
+        except Exception as e:
+            stats.record(False, time.perf_counter() - start)
+            logger.info("[{}] Failed to load URL: {}, got error: {}", name, url, e)
+            return ""
+
+        stats.record(bool(content), time.perf_counter() - start)
+        if not content:
+            logger.info("[{}] Failed to load URL: {}, got empty result", name, url)
+            return ""
+
+        logger.info("[{}] Loaded URL: {} in {:.2f}s", name, url, time.perf_counter() - start)
+        return content
+
+
+@cache
+def get_loader_router() -> LoaderRouter:
+    hedge = os.getenv("LOADER_HEDGE", "true").lower() not in ("0", "false", "no")
+    return LoaderRouter(hedge=hedge)
+
+
+def get_loader_stats() -> dict[str, LoaderStats]:
+    return get_loader_router().stats
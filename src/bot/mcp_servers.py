@@ -0,0 +1,221 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+from functools import cache
+from typing import Any
+from typing import Final
+
+from agents.mcp import MCPServerStdio
+from agents.mcp import MCPServerStdioParams
+from loguru import logger
+from mcp.shared.exceptions import McpError
+from mcp.types import CallToolResult
+from mcp.types import Tool as MCPTool
+
+from .quotes import QuoteCachingMCPServer
+
+DEFAULT_CONNECT_TIMEOUT: Final[float] = 120.0
+DEFAULT_HEALTH_INTERVAL: Final[float] = 60.0
+PING_TIMEOUT: Final[float] = 10.0
+MAX_BACKOFF: Final[float] = 60.0
+
+
+def get_server_key(params: MCPServerStdioParams) -> str:
+    """Servers started with the same command, arguments, environment and directory are interchangeable."""
+    return json.dumps(
+        {
+            "command": params.get("command"),
+            "args": list(params.get("args", [])),
+            "env": params.get("env"),
+            "cwd": str(params.get("cwd")) if params.get("cwd") else None,
+        },
+        sort_keys=True,
+    )
+
+
+class ManagedMCPServer(QuoteCachingMCPServer):
+    """An MCP server that connects on first use and restarts itself.
+
+    The session lives in a supervisor task: stdio sessions are bound to the task that opened them, so opening and
+    closing them in one long-lived task lets any handler trigger the connection. The supervisor pings the server
+    every health_interval seconds and reconnects, with backoff, when a ping or a call fails.
+
+    While the server is starting or unavailable it lists no tools, so the agent answers without them instead of
+    waiting for the server.
+    """
+
+    def __init__(
+        self,
+        params: MCPServerStdioParams,
+        name: str | None = None,
+        connect_timeout: float | None = None,
+        health_interval: float | None = None,
+    ) -> None:
+        # the tools of a server do not change while it runs, the cache is dropped on every reconnect
+        super().__init__(params, name=name, cache_tools_list=True)
+        self.connect_timeout = connect_timeout or float(os.getenv("MCP_CONNECT_TIMEOUT", DEFAULT_CONNECT_TIMEOUT))
+        self.health_interval = health_interval or float(os.getenv("MCP_HEALTH_INTERVAL", DEFAULT_HEALTH_INTERVAL))
+        self.restarts = 0
+
+        self._task: asyncio.Task[None] | None = None
+        self._connecting = False
+        self._attempt: asyncio.Future[None] | None = None
+        self._stop = asyncio.Event()
+        self._restart = asyncio.Event()
+
+    def start(self) -> None:
+        """Start connecting in the background, without waiting for the server."""
+        if self._task is None or self._task.done():
+            self._stop.clear()
+            self._attempt = asyncio.get_running_loop().create_future()
+            self._task = asyncio.create_task(self._supervise(), name=f"mcp:{self.name}")
+
+    async def connect(self) -> None:
+        if self.session is not None:
+            return
+
+        self.start()
+        assert self._attempt is not None
+        await asyncio.shield(self._attempt)
+
+    async def list_tools(self) -> list[MCPTool]:
+        # the agents SDK lists the tools of every server on every run, so this never waits for a connection
+        if self.session is None:
+            self.start()
+            return []
+
+        try:
+            return await super().list_tools()
+        except Exception as e:
+            logger.warning("MCP server {name} is unavailable, got error: {error}", name=self.name, error=e)
+            return []
+
+    async def call_tool(self, tool_name: str, arguments: dict[str, Any] | None) -> CallToolResult:
+        await self.connect()
+        try:
+            return await super().call_tool(tool_name, arguments)
+        except McpError:
+            # the server answered, only the call failed
+            raise
+        except Exception:
+            self._restart.set()
+            raise
+
+    async def close(self) -> None:
+        """Stop the supervisor, which closes the session in its own task.
+
+        Not named cleanup: the base class calls cleanup from connect when connecting fails.
+        """
+        if self._task is None:
+            return
+
+        self._stop.set()
+        if self._connecting:
+            # a stuck npx or uvx would otherwise hold up shutdown for connect_timeout
+            self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _supervise(self) -> None:
+        try:
+            await self._run()
+        finally:
+            if self._attempt is not None and not self._attempt.done():
+                self._attempt.set_exception(RuntimeError(f"MCP server {self.name} is stopped"))
+                self._attempt.exception()
+
+    async def _run(self) -> None:
+        failures = 0
+        while not self._stop.is_set():
+            if self._attempt is None or self._attempt.done():
+                self._attempt = asyncio.get_running_loop().create_future()
+
+            self._connecting = True
+            try:
+                async with asyncio.timeout(self.connect_timeout):
+                    await MCPServerStdio.connect(self)
+            except asyncio.CancelledError:
+                # closed while connecting, the base class only cleans up after errors
+                await self.cleanup()
+                raise
+            except Exception as e:
+                failures += 1
+                logger.warning("Failed to start MCP server {name}, got error: {error!r}", name=self.name, error=e)
+                self._attempt.set_exception(e)
+                # mark the exception as retrieved, nobody may be waiting for this attempt
+                self._attempt.exception()
+                await self._wait(min(2**failures, MAX_BACKOFF))
+                continue
+            finally:
+                self._connecting = False
+
+            failures = 0
+            self.invalidate_tools_cache()
+            self._attempt.set_result(None)
+            logger.info("Started MCP server {name}", name=self.name)
+
+            try:
+                await self._watch()
+            finally:
+                await self.cleanup()
+
+            if not self._stop.is_set():
+                self.restarts += 1
+                logger.info("Restarting MCP server {name}", name=self.name)
+
+    async def _wait(self, seconds: float) -> bool:
+        """Wait for a stop or restart request for at most seconds, return whether one came."""
+        stop = asyncio.ensure_future(self._stop.wait())
+        restart = asyncio.ensure_future(self._restart.wait())
+        done, pending = await asyncio.wait([stop, restart], timeout=seconds, return_when=asyncio.FIRST_COMPLETED)
+        for future in pending:
+            future.cancel()
+        self._restart.clear()
+        return bool(done)
+
+    async def _watch(self) -> None:
+        """Return when the server should stop or restart."""
+        while not await self._wait(self.health_interval):
+            if self.session is None:
+                return
+            try:
+                async with asyncio.timeout(PING_TIMEOUT):
+                    await self.session.send_ping()
+            except Exception as e:
+                logger.warning("MCP server {name} failed a health check, got error: {error!r}", name=self.name, error=e)
+                return
+
+
+class MCPServerPool:
+    """Share one server between every agent configured with the same command and arguments."""
+
+    def __init__(self) -> None:
+        self.servers: dict[str, ManagedMCPServer] = {}
+
+    def get(self, name: str, params: MCPServerStdioParams) -> ManagedMCPServer:
+        key = get_server_key(params)
+        server = self.servers.get(key)
+        if server is None:
+            server = self.servers[key] = ManagedMCPServer(params, name=name)
+        return server
+
+    def start(self) -> None:
+        """Warm every server up in the background, the first tool call waits only for its own server."""
+        for server in self.servers.values():
+            server.start()
+
+    async def close(self) -> None:
+        await asyncio.gather(*[server.close() for server in self.servers.values()])
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        return {
+            server.name: {"connected": server.session is not None, "restarts": server.restarts}
+            for server in self.servers.values()
+        }
+
+
+@cache
+def get_mcp_server_pool() -> MCPServerPool:
+    return MCPServerPool()
@@ -0,0 +1,305 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+from abc import ABC
+from abc import abstractmethod
+from collections import OrderedDict
+from collections import deque
+from functools import cache
+from typing import Any
+from typing import Final
+from typing import NamedTuple
+
+import redis.asyncio as redis
+from loguru import logger
+
+from .cache import TieredCache
+from .cache import get_cache_from_env
+from .cache import get_redis_client
+
+Item = dict[str, Any]
+
+DEFAULT_MAX_BYTES: Final[int] = 1024 * 1024
+DEFAULT_IDLE_TTL: Final[int] = 30 * 24 * 60 * 60
+DEFAULT_MAX_CHATS: Final[int] = 10_000
+DEFAULT_EVICT_INTERVAL: Final[float] = 60.0
+
+# bytes held by each chat, and the last time each chat was active
+BYTES_KEY: Final[str] = "bot:memory:bytes"
+ACTIVITY_KEY: Final[str] = "bot:memory:activity"
+
+# push the items, trim to the item and byte quotas, refresh the idle TTL and record size and activity. The size
+# of the chat is kept up to date in the hash as items are pushed and popped, and only counted again when the hash
+# has lost it; it starts over when the list expired.
+APPEND_SCRIPT: Final[str] = """
+local key = KEYS[1]
+local total = 0
+if redis.call('EXISTS', key) == 1 then
+    total = tonumber(redis.call('HGET', KEYS[2], ARGV[1]))
+    if not total then
+        total = 0
+        for _, item in ipairs(redis.call('LRANGE', key, 0, -1)) do
+            total = total + string.len(item)
+        end
+    end
+end
+
+for i = 6, #ARGV do
+    total = total + string.len(ARGV[i])
+end
+local length = redis.call('RPUSH', key, unpack(ARGV, 6))
+
+local max_items = tonumber(ARGV[3])
+while max_items > 0 and length > max_items do
+    total = total - string.len(redis.call('LPOP', key))
+    length = length - 1
+end
+
+local max_bytes = tonumber(ARGV[4])
+while max_bytes > 0 and total > max_bytes and length > 1 do
+    total = total - string.len(redis.call('LPOP', key))
+    length = length - 1
+end
+
+local ttl = tonumber(ARGV[5])
+if ttl > 0 then
+    redis.call('EXPIRE', key, ttl)
+end
+
+redis.call('HSET', KEYS[2], ARGV[1], total)
+redis.call('ZADD', KEYS[3], ARGV[2], ARGV[1])
+return total
+"""
+
+
+class ChatUsage(NamedTuple):
+    chat_id: int
+    items: int
+    bytes: int
+    last_active: float
+
+
+def get_memory_key(chat_id: int) -> str:
+    return f"bot:{chat_id}:memory"
+
+
+def get_state_keys(chat_id: int) -> list[str]:
+    """The cache keys of the state kept next to the memory of a chat: its current agent and conversation summary."""
+    return [f"bot:{chat_id}:agent", f"bot:{chat_id}:summary"]
+
+
+def get_chat_keys(chat_id: int) -> list[str]:
+    """All keys holding the state of a chat: its memory, current agent and conversation summary."""
+    return [get_memory_key(chat_id), *get_state_keys(chat_id)]
+
+
+def get_idle_ttl() -> int:
+    return int(os.getenv("MEMORY_IDLE_TTL", DEFAULT_IDLE_TTL))
+
+
+def encode_item(item: Item) -> str:
+    return json.dumps(item, ensure_ascii=False)
+
+
+def decode_item(value: str | bytes) -> Item:
+    return json.loads(value)
+
+
+class MemoryStore(ABC):
+    """Append-only conversation memory of each chat, bounded to its newest items.
+
+    Each chat holds at most max_bytes of items and is forgotten after idle_ttl seconds without a new turn. When
+    more than max_chats chats are stored, the least recently active ones are evicted with all of their keys.
+    """
+
+    def __init__(self, max_bytes: int | None = None, idle_ttl: int | None = None, max_chats: int | None = None):
+        self.max_bytes = max_bytes or int(os.getenv("MEMORY_MAX_BYTES", DEFAULT_MAX_BYTES))
+        self.idle_ttl = idle_ttl or get_idle_ttl()
+        self.max_chats = max_chats or int(os.getenv("MEMORY_MAX_CHATS", DEFAULT_MAX_CHATS))
+
+    @abstractmethod
+    async def get(self, chat_id: int, limit: int | None = None) -> list[Item]:
+        """Return the newest `limit` items of the chat, oldest first."""
+
+    @abstractmethod
+    async def append(self, chat_id: int, items: list[Item], max_items: int | None = None) -> None:
+        """Append items to the chat and drop the oldest ones beyond max_items or the byte quota."""
+
+    @abstractmethod
+    async def clear(self, chat_id: int) -> None:
+        """Forget the chat together with its current agent and conversation summary."""
+
+    @abstractmethod
+    async def usage(self, limit: int = 10) -> list[ChatUsage]:
+        """Return the chats holding the most bytes, biggest first."""
+
+
+class InMemoryMemoryStore(MemoryStore):
+    """Keep each chat in a deque, the current agent and summary of a forgotten chat are deleted from `cache`."""
+
+    def __init__(
+        self,
+        max_bytes: int | None = None,
+        idle_ttl: int | None = None,
+        max_chats: int | None = None,
+        cache: TieredCache | None = None,
+    ):
+        super().__init__(max_bytes=max_bytes, idle_ttl=idle_ttl, max_chats=max_chats)
+        self.cache = cache
+        self._items: dict[int, deque[str]] = {}
+        self._bytes: dict[int, int] = {}
+        # chat_id -> last active time, least recently active first
+        self._activity: OrderedDict[int, float] = OrderedDict()
+
+    async def _expire(self) -> None:
+        deadline = time.time() - self.idle_ttl
+        while self._activity:
+            chat_id, last_active = next(iter(self._activity.items()))
+            if last_active > deadline:
+                break
+            await self._forget(chat_id)
+
+    async def _forget(self, chat_id: int) -> None:
+        self._items.pop(chat_id, None)
+        self._bytes.pop(chat_id, None)
+        self._activity.pop(chat_id, None)
+        # a forgotten chat starts over with the triage agent and no summary of the dropped history
+        if self.cache is not None:
+            for key in get_state_keys(chat_id):
+                await self.cache.delete(key)
+
+    async def get(self, chat_id: int, limit: int | None = None) -> list[Item]:
+        await self._expire()
+        items = self._items.get(chat_id, deque())
+        start = max(len(items) - limit, 0) if limit else 0
+        return [decode_item(items[i]) for i in range(start, len(items))]
+
+    async def append(self, chat_id: int, items: list[Item], max_items: int | None = None) -> None:
+        await self._expire()
+        stored = self._items.setdefault(chat_id, deque())
+        total = self._bytes.get(chat_id, 0)
+        # store encoded items like redis does, so callers never share mutable state with the store
+        for item in items:
+            value = encode_item(item)
+            stored.append(value)
+            total += len(value.encode("utf-8"))
+
+        while max_items and len(stored) > max_items:
+            total -= len(stored.popleft().encode("utf-8"))
+        while total > self.max_bytes and len(stored) > 1:
+            total -= len(stored.popleft().encode("utf-8"))
+
+        self._bytes[chat_id] = total
+        self._activity[chat_id] = time.time()
+        self._activity.move_to_end(chat_id)
+        while len(self._activity) > self.max_chats:
+            evicted = next(iter(self._activity))
+            logger.info("Evicting the memory of chat {chat_id}", chat_id=evicted)
+            await self._forget(evicted)
+
+    async def clear(self, chat_id: int) -> None:
+        await self._forget(chat_id)
+
+    async def usage(self, limit: int = 10) -> list[ChatUsage]:
+        await self._expire()
+        chat_ids = sorted(self._bytes, key=lambda chat_id: self._bytes[chat_id], reverse=True)[:limit]
+        return [
+            ChatUsage(chat_id, len(self._items[chat_id]), self._bytes[chat_id], self._activity[chat_id])
+            for chat_id in chat_ids
+        ]
+
+
+class RedisMemoryStore(MemoryStore):
+    """Keep each chat in a Redis list: a turn is one script call and a read is one LRANGE.
+
+    Sizes are kept in the bot:memory:bytes hash and activity in the bot:memory:activity sorted set, so evicting the
+    least recently active chats never scans the keyspace. Eviction runs at most once every evict_interval seconds.
+    """
+
+    def __init__(
+        self,
+        client: redis.Redis,
+        max_bytes: int | None = None,
+        idle_ttl: int | None = None,
+        max_chats: int | None = None,
+        evict_interval: float | None = None,
+    ) -> None:
+        super().__init__(max_bytes=max_bytes, idle_ttl=idle_ttl, max_chats=max_chats)
+        self.client = client
+        self.evict_interval = (
+            evict_interval
+            if evict_interval is not None
+            else float(os.getenv("MEMORY_EVICT_INTERVAL", DEFAULT_EVICT_INTERVAL))
+        )
+        self._append = client.register_script(APPEND_SCRIPT)
+        self._next_evict = 0.0
+
+    async def get(self, chat_id: int, limit: int | None = None) -> list[Item]:
+        values = await self.client.lrange(get_memory_key(chat_id), -limit if limit else 0, -1)
+        return [decode_item(value) for value in values]
+
+    async def append(self, chat_id: int, items: list[Item], max_items: int | None = None) -> None:
+        if not items:
+            return
+
+        await self._append(
+            keys=[get_memory_key(chat_id), BYTES_KEY, ACTIVITY_KEY],
+            args=[
+                chat_id,
+                time.time(),
+                max_items or 0,
+                self.max_bytes,
+                self.idle_ttl,
+                *[encode_item(item) for item in items],
+            ],
+        )
+
+        now = time.monotonic()
+        if now >= self._next_evict:
+            self._next_evict = now + self.evict_interval
+            await self.evict()
+
+    async def evict(self) -> None:
+        """Drop the bookkeeping of expired chats and evict the least recently active chats beyond max_chats."""
+        expired = await self.client.zrangebyscore(ACTIVITY_KEY, "-inf", time.time() - self.idle_ttl)
+        excess = await self.client.zcard(ACTIVITY_KEY) - len(expired) - self.max_chats
+        evicted = await self.client.zrange(ACTIVITY_KEY, len(expired), len(expired) + excess - 1) if excess > 0 else []
+
+        for value in [*expired, *evicted]:
+            await self.clear(int(value))
+        if evicted:
+            logger.info("Evicted the memory of {n} least recently active chats", n=len(evicted))
+
+    async def clear(self, chat_id: int) -> None:
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.delete(*get_chat_keys(chat_id))
+            pipe.hdel(BYTES_KEY, str(chat_id))
+            pipe.zrem(ACTIVITY_KEY, str(chat_id))
+            await pipe.execute()
+
+    async def usage(self, limit: int = 10) -> list[ChatUsage]:
+        sizes = await self.client.hgetall(BYTES_KEY)
+        biggest = sorted(sizes.items(), key=lambda item: int(item[1]), reverse=True)[:limit]
+
+        async with self.client.pipeline(transaction=False) as pipe:
+            for chat_id, _ in biggest:
+                pipe.llen(get_memory_key(int(chat_id)))
+                pipe.zscore(ACTIVITY_KEY, chat_id)
+            results = await pipe.execute()
+
+        return [
+            ChatUsage(int(chat_id), results[2 * i], int(size), results[2 * i + 1] or 0.0)
+            for i, (chat_id, size) in enumerate(biggest)
+        ]
+
+
+@cache
+def get_memory_store() -> MemoryStore:
+    client = get_redis_client()
+    if client is not None:
+        return RedisMemoryStore(client)
+
+    logger.info("Keeping conversation memory in process")
+    return InMemoryMemoryStore(cache=get_cache_from_env())
@@ -3,37 +3,68 @@ from __future__ import annotations
 import os
 from functools import cache
 
+import httpx
 import logfire
 from agents import ModelSettings
 from agents import OpenAIChatCompletionsModel
 from agents import set_tracing_disabled
 from openai import AsyncAzureOpenAI
 from openai import AsyncOpenAI
+from openai import DefaultAsyncHttpxClient
 
+from .ratelimit import RateLimitedTransport
+from .ratelimit import get_model_rate_limiter
 from .utils import logfire_is_enabled
 
 
+def get_openai_model_name() -> str:
+    return os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+
+
+def get_openai_temperature() -> float:
+    return float(os.getenv("OPENAI_TEMPERATURE", 0.0))
+
+
+def get_openai_max_tokens() -> int | None:
+    max_tokens = os.getenv("OPENAI_MAX_TOKENS")
+    return int(max_tokens) if max_tokens else None
+
+
+def get_openai_http_client() -> httpx.AsyncClient:
+    max_connections = int(os.getenv("OPENAI_MAX_CONNECTIONS", 100))
+    transport = httpx.AsyncHTTPTransport(
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", 60.0)),
+        )
+    )
+    # every model request waits for the requests and tokens per minute budget first
+    return DefaultAsyncHttpxClient(transport=RateLimitedTransport(transport, get_model_rate_limiter()))
+
+
 @cache
 def get_openai_client() -> AsyncOpenAI:
+    # one client (and one connection pool) is shared by the agents and chains.generate
+    client: AsyncOpenAI
     azure_api_key = os.getenv("AZURE_OPENAI_API_KEY")
     if azure_api_key:
         set_tracing_disabled(True)
-        return AsyncAzureOpenAI()
-    return AsyncOpenAI()
-
-
-@cache
-def get_openai_model() -> OpenAIChatCompletionsModel:
-    model_name = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
-    client = get_openai_client()
+        client = AsyncAzureOpenAI(http_client=get_openai_http_client())
+    else:
+        client = AsyncOpenAI(http_client=get_openai_http_client())
 
     if logfire_is_enabled():
         logfire.instrument_openai(client)
 
-    return OpenAIChatCompletionsModel(model_name, openai_client=client)
+    return client
+
+
+@cache
+def get_openai_model() -> OpenAIChatCompletionsModel:
+    return OpenAIChatCompletionsModel(get_openai_model_name(), openai_client=get_openai_client())
 
 
 @cache
 def get_openai_model_settings():
-    temperature = float(os.getenv("OPENAI_TEMPERATURE", 0.0))
-    return ModelSettings(temperature=temperature)
+    return ModelSettings(temperature=get_openai_temperature())
@@ -0,0 +1,260 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import functools
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+import weakref
+from collections.abc import Callable
+from collections.abc import Coroutine
+from functools import cache
+from typing import Any
+from typing import Final
+from typing import TypeVar
+
+import logfire
+from loguru import logger
+from telegram.ext import Application
+
+from .cache import get_cache_from_env
+from .executor import get_executor_stats
+from .loaders import get_browser_pool
+from .loaders import get_loader_stats
+from .mcp_servers import get_mcp_server_pool
+from .ratelimit import get_wait_stats
+from .utils import logfire_is_enabled
+
+DEFAULT_LAG_INTERVAL: Final[float] = 0.1
+DEFAULT_LAG_THRESHOLD: Final[float] = 0.25
+DEFAULT_METRICS_HOST: Final[str] = "127.0.0.1"
+# frames of the blocking call kept in a stall report, innermost last
+STACK_LIMIT: Final[int] = 12
+
+T = TypeVar("T")
+
+
+class LagStats:
+    def __init__(self) -> None:
+        self.samples = 0
+        self.lag_total = 0.0
+        self.lag_max = 0.0
+        self.stalls = 0
+        # handler -> number of stalls it caused
+        self.stalls_by_handler: dict[str, int] = {}
+
+    def record(self, lag: float) -> None:
+        self.samples += 1
+        self.lag_total += lag
+        self.lag_max = max(self.lag_max, lag)
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "samples": self.samples,
+            "lag_mean": self.lag_total / self.samples if self.samples else 0.0,
+            "lag_max": self.lag_max,
+            "stalls": self.stalls,
+            "stalls_by_handler": dict(self.stalls_by_handler),
+        }
+
+
+class LoopLagMonitor:
+    """Measure event loop lag and report what was blocking the loop when it stalls.
+
+    A heartbeat task sleeps for interval seconds and records how late it wakes up. A watchdog thread checks the
+    heartbeat, and when it is threshold seconds overdue it samples the stack of the loop thread and the handler
+    of the running task, so the stall is reported while it is still happening.
+    """
+
+    def __init__(self, interval: float | None = None, threshold: float | None = None) -> None:
+        self.interval = interval or float(os.getenv("LOOP_LAG_INTERVAL", DEFAULT_LAG_INTERVAL))
+        self.threshold = threshold or float(os.getenv("LOOP_LAG_THRESHOLD", DEFAULT_LAG_THRESHOLD))
+        self.stats = LagStats()
+
+        # task -> name of the handler it runs
+        self._handlers: weakref.WeakKeyDictionary[asyncio.Task[Any], str] = weakref.WeakKeyDictionary()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread_id: int | None = None
+        self._beat = time.monotonic()
+        self._task: asyncio.Task[None] | None = None
+        self._thread: threading.Thread | None = None
+        self._stopped = threading.Event()
+
+    def wrap(self, name: str, callback: Callable[..., Coroutine[Any, Any, T]]) -> Callable[..., Coroutine[Any, Any, T]]:
+        """Attribute stalls caused while the callback runs to the handler name."""
+
+        @functools.wraps(callback)
+        async def wrapper(*args: Any, **kwargs: Any) -> T:
+            task = asyncio.current_task()
+            if task is not None:
+                self._handlers[task] = name
+            return await callback(*args, **kwargs)
+
+        return wrapper
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True)
+        self._thread.start()
+        logger.info("Monitoring event loop lag, reporting stalls over {threshold}s", threshold=self.threshold)
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+
+        self._stopped.set()
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+        logger.info("Event loop lag: {stats}", stats=self.stats.as_dict())
+
+    async def _heartbeat(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(now - expected, 0.0)
+            self._beat = now
+
+            self.stats.record(lag)
+            if logfire_is_enabled():
+                get_lag_histogram().record(lag)
+
+    def _watch(self) -> None:
+        reported_beat = None
+        while not self._stopped.wait(self.interval):
+            beat = self._beat
+            overdue = time.monotonic() - beat - self.interval
+            # report each stall once, at the first sample over the threshold
+            if overdue < self.threshold or beat == reported_beat:
+                continue
+            reported_beat = beat
+            self._report(overdue)
+
+    def _report(self, overdue: float) -> None:
+        handler = self.current_handler() or "unknown"
+        self.stats.stalls += 1
+        self.stats.stalls_by_handler[handler] = self.stats.stalls_by_handler.get(handler, 0) + 1
+
+        logger.warning(
+            "Event loop blocked for {overdue:.2f}s in handler {handler}:\n{stack}",
+            overdue=overdue,
+            handler=handler,
+            stack=self.current_stack(),
+        )
+
+    def current_handler(self) -> str | None:
+        if self._loop is None:
+            return None
+        # reading the running task of another thread's loop is a dict lookup
+        task = asyncio.current_task(self._loop)
+        return self._handlers.get(task) if task is not None else None
+
+    def current_stack(self) -> str:
+        frame = sys._current_frames().get(self._loop_thread_id or 0)
+        if frame is None:
+            return ""
+        return "".join(traceback.format_stack(frame)[-STACK_LIMIT:])
+
+
+@cache
+def get_lag_histogram() -> Any:
+    return logfire.metric_histogram("event_loop.lag", unit="s", description="Event loop lag")
+
+
+@cache
+def get_loop_monitor() -> LoopLagMonitor:
+    return LoopLagMonitor()
+
+
+def instrument_handlers(application: Application) -> None:
+    """Wrap the callback of every registered handler so stalls are attributed to it."""
+    monitor = get_loop_monitor()
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            callback = handler.callback
+            name = getattr(callback, "__qualname__", None) or type(callback).__name__
+            handler.callback = monitor.wrap(name, callback)
+
+
+def collect_metrics() -> dict[str, Any]:
+    """Snapshot the stats of the event loop, executors, caches, loaders, browser pool, rate limit waits and MCP
+    servers.
+    """
+    return {
+        "event_loop": get_loop_monitor().stats.as_dict(),
+        "executors": get_executor_stats(),
+        "cache": get_cache_from_env().stats(),
+        "loaders": {
+            name: {
+                "successes": stats.successes,
+                "failures": stats.failures,
+                "success_rate": stats.success_rate,
+                "latency_mean": stats.latency_mean,
+            }
+            for name, stats in get_loader_stats().items()
+        },
+        "browser": get_browser_pool().stats(),
+        "rate_limits": get_wait_stats(),
+        "mcp_servers": get_mcp_server_pool().stats(),
+    }
+
+
+class MetricsServer:
+    """Serve collect_metrics as JSON on GET /metrics, meant to be bound to localhost."""
+
+    def __init__(self, host: str, port: int) -> None:
+        self.host = host
+        self.port = port
+        self._server: asyncio.Server | None = None
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        logger.info("Serving metrics on http://{host}:{port}/metrics", host=self.host, port=self.port)
+
+    async def stop(self) -> None:
+        if self._server is None:
+            return
+        self._server.close()
+        await self._server.wait_closed()
+        self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            parts = request_line.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+                status, body = "200 OK", json.dumps(collect_metrics()).encode("utf-8")
+            else:
+                status, body = "404 Not Found", b'{"error": "not found"}'
+
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1")
+                + body
+            )
+            await writer.drain()
+        except Exception as e:
+            logger.info("Failed to serve metrics, got error: {error}", error=e)
+        finally:
+            writer.close()
+
+
+@cache
+def get_metrics_server() -> MetricsServer | None:
+    port = os.getenv("METRICS_PORT")
+    if not port:
+        return None
+    return MetricsServer(os.getenv("METRICS_HOST", DEFAULT_METRICS_HOST), int(port))
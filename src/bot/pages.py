@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from collections.abc import Awaitable
+from collections.abc import Callable
+from functools import cache
+from typing import Any
+from typing import Final
+
+import httpx
+from loguru import logger
+from telegraph.exceptions import RetryAfterError
+from telegraph.exceptions import TelegraphException
+from telegraph.utils import html_to_nodes
+from telegraph.utils import json_dumps
+
+from .executor import run_in_executor
+
+TELEGRAPH_API_URL: Final[str] = "https://api.telegra.ph"
+DEFAULT_SHORT_NAME: Final[str] = "Narumi's Bot"
+DEFAULT_RETRIES: Final[int] = 3
+DEFAULT_TIMEOUT: Final[float] = 15.0
+MAX_RETRY_AFTER: Final[int] = 60
+# raised before the request reached Telegraph, so retrying cannot create a page twice
+UNSENT_ERRORS: Final[tuple[type[httpx.HTTPError], ...]] = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class TelegraphClient:
+    """Create Telegraph pages without blocking the event loop.
+
+    Requests go through one pooled HTTP client, the account is created once in start(), HTML is converted to
+    Telegraph nodes in the executor, and failed requests are retried, waiting out flood control when asked to.
+    The API is called directly, since telegraph.aio opens an HTTP client of its own that cannot be replaced.
+    """
+
+    def __init__(
+        self,
+        access_token: str | None = None,
+        short_name: str = DEFAULT_SHORT_NAME,
+        retries: int = DEFAULT_RETRIES,
+        max_connections: int = 10,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ) -> None:
+        self.access_token = access_token
+        self.short_name = short_name
+        self.retries = retries
+        self.http_client = httpx.AsyncClient(
+            base_url=TELEGRAPH_API_URL,
+            timeout=DEFAULT_TIMEOUT,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            transport=transport,
+        )
+        self._lock = asyncio.Lock()
+
+    async def start(self) -> None:
+        async with self._lock:
+            if self.access_token:
+                return
+            account = await self._retry(
+                "createAccount", lambda: self._call("createAccount", {"short_name": self.short_name})
+            )
+            self.access_token = account["access_token"]
+            logger.info("Created Telegraph account {name}", name=self.short_name)
+
+    async def close(self) -> None:
+        await self.http_client.aclose()
+
+    async def create_page(self, title: str, html_content: str) -> str:
+        """Create a page from HTML and return its URL."""
+        await self.start()
+
+        nodes = await run_in_executor(html_to_nodes, html_content)
+        values = {"access_token": self.access_token, "title": title, "content": json_dumps(nodes)}
+        resp = await self._retry("createPage", lambda: self._call("createPage", values), retry_on=UNSENT_ERRORS)
+        return resp["url"]
+
+    async def _call(self, method: str, values: dict[str, Any]) -> Any:
+        resp = await self.http_client.post(f"/{method}", data=values)
+        resp.raise_for_status()
+        try:
+            data = resp.json()
+        except ValueError as e:
+            raise httpx.DecodingError(f"Invalid Telegraph {method} response: {e}", request=resp.request) from e
+        if data.get("ok"):
+            return data["result"]
+
+        error = data.get("error")
+        if isinstance(error, str) and error.startswith("FLOOD_WAIT_"):
+            raise RetryAfterError(int(error.rsplit("_", 1)[-1]))
+        raise TelegraphException(error)
+
+    async def _retry(
+        self,
+        method: str,
+        call: Callable[[], Awaitable[Any]],
+        retry_on: tuple[type[httpx.HTTPError], ...] = (httpx.HTTPError,),
+    ) -> Any:
+        for attempt in range(1, self.retries + 2):
+            try:
+                return await call()
+            except RetryAfterError as e:
+                if attempt > self.retries or e.retry_after > MAX_RETRY_AFTER:
+                    raise
+                logger.warning(
+                    "Telegraph {method} flood control, retry in {seconds}s", method=method, seconds=e.retry_after
+                )
+                await asyncio.sleep(e.retry_after)
+            except httpx.HTTPError as e:
+                if attempt > self.retries or not isinstance(e, retry_on):
+                    raise
+                logger.warning(
+                    "Telegraph {method} failed on attempt {attempt}, retrying: {error}",
+                    method=method,
+                    attempt=attempt,
+                    error=e,
+                )
+                await asyncio.sleep(2 ** (attempt - 1))
+        raise AssertionError("unreachable")
+
+
+@cache
+def get_telegraph_client() -> TelegraphClient:
+    return TelegraphClient(
+        access_token=os.getenv("TELEGRAPH_ACCESS_TOKEN"),
+        max_connections=int(os.getenv("TELEGRAPH_MAX_CONNECTIONS", 10)),
+    )
+
+
+async def close_telegraph_client() -> None:
+    if get_telegraph_client.cache_info().currsize:
+        await get_telegraph_client().close()
+        get_telegraph_client.cache_clear()
+
+
+async def create_page(title: str, html_content: str) -> str:
+    return await get_telegraph_client().create_page(title=title, html_content=html_content)
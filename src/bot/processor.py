@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import sys
+from collections.abc import Awaitable
+from typing import Any
+from typing import Final
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+DEFAULT_MAX_CONCURRENT_UPDATES: Final[int] = 256
+DEFAULT_UPDATE_QUEUE_SIZE: Final[int] = 1024
+
+
+def get_chat_id(update: object) -> int | None:
+    if isinstance(update, Update) and update.effective_chat:
+        return update.effective_chat.id
+    return None
+
+
+class UpdateQueue(asyncio.Queue[Any]):
+    """An update queue bounded by the updates that are queued or still being processed.
+
+    With concurrent updates the application takes every update off the queue at once and processes it in a task,
+    so a maxsize queue never fills. Here put waits for a slot instead, and a slot is only freed by task_done,
+    which the application calls once the update has been processed.
+    """
+
+    def __init__(self, max_in_flight: int) -> None:
+        super().__init__()
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        # set whenever a slot may have been freed, waiters check again when it is
+        self._freed = asyncio.Event()
+
+    def full(self) -> bool:
+        return self.in_flight >= self.max_in_flight
+
+    async def put(self, item: Any) -> None:
+        while self.full():
+            self._freed.clear()
+            await self._freed.wait()
+        self.put_nowait(item)
+
+    def put_nowait(self, item: Any) -> None:
+        if self.full():
+            raise asyncio.QueueFull
+        super().put_nowait(item)
+        self.in_flight += 1
+
+    def task_done(self) -> None:
+        super().task_done()
+        self.in_flight -= 1
+        self._freed.set()
+
+
+def create_update_queue() -> UpdateQueue:
+    return UpdateQueue(int(os.getenv("UPDATE_QUEUE_SIZE", DEFAULT_UPDATE_QUEUE_SIZE)))
+
+
+class ChatUpdateProcessor(BaseUpdateProcessor):
+    """Process updates of the same chat one at a time and in order, and updates of different chats concurrently.
+
+    Each chat has a lock that is created on its first pending update and dropped with its last one. asyncio locks
+    wake their waiters in FIFO order, so the updates of a chat run in the order they were received.
+
+    An update takes one of the max_concurrent_updates slots only once it is its turn in its chat, so a burst from
+    one chat waits on the chat lock without using up the slots of every other chat.
+    """
+
+    def __init__(self, max_concurrent_updates: int | None = None) -> None:
+        # the base class takes its semaphore before do_process_update, where an update would hold it while
+        # waiting for its chat, so it is built unbounded and the slots are taken in do_process_update instead
+        self._max_updates = sys.maxsize
+        super().__init__(sys.maxsize)
+        self._max_updates = max_concurrent_updates or int(
+            os.getenv("MAX_CONCURRENT_UPDATES", DEFAULT_MAX_CONCURRENT_UPDATES)
+        )
+        self._slots = asyncio.Semaphore(self._max_updates)
+        self._running = 0
+        self._locks: dict[int, asyncio.Lock] = {}
+        self._pending: dict[int, int] = {}
+
+    @property
+    def max_concurrent_updates(self) -> int:
+        return self._max_updates
+
+    @property
+    def current_concurrent_updates(self) -> int:
+        return self._running
+
+    @property
+    def active_chats(self) -> int:
+        return len(self._pending)
+
+    def pending(self, chat_id: int) -> int:
+        return self._pending.get(chat_id, 0)
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        chat_id = get_chat_id(update)
+        if chat_id is None:
+            await self._run(coroutine)
+            return
+
+        lock = self._locks.setdefault(chat_id, asyncio.Lock())
+        self._pending[chat_id] = self._pending.get(chat_id, 0) + 1
+        try:
+            async with lock:
+                await self._run(coroutine)
+        finally:
+            self._pending[chat_id] -= 1
+            if not self._pending[chat_id]:
+                del self._pending[chat_id]
+                del self._locks[chat_id]
+
+    async def _run(self, coroutine: Awaitable[Any]) -> None:
+        async with self._slots:
+            self._running += 1
+            try:
+                await coroutine
+            finally:
+                self._running -= 1
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
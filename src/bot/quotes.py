@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from collections.abc import Awaitable
+from collections.abc import Callable
+from datetime import UTC
+from datetime import datetime
+from datetime import time
+from datetime import timedelta
+from enum import Enum
+from functools import cache
+from typing import Any
+from typing import Final
+from typing import NamedTuple
+from zoneinfo import ZoneInfo
+
+from agents.mcp import MCPServerStdio
+from loguru import logger
+from mcp.types import CallToolResult
+
+from .cache import LRUCache
+from .cache import SingleFlight
+from .cache import get_cache_from_env
+
+DEFAULT_OPEN_TTL: Final[int] = 30
+# a closed market is cached until the next open, but never shorter than this
+MIN_CLOSED_TTL: Final[int] = 60
+DEFAULT_QUOTE_CACHE_MAX_BYTES: Final[int] = 8 * 1024 * 1024
+DEFAULT_MCP_QUOTE_TOOLS: Final[str] = "get_ticker_info,get_stock_info"
+SYMBOL_ARGUMENTS: Final[tuple[str, ...]] = ("symbol", "symbols", "ticker", "tickers")
+
+_single_flight: SingleFlight[str] = SingleFlight()
+
+
+class TradingHours(NamedTuple):
+    timezone: ZoneInfo
+    open: time
+    close: time
+
+
+class Market(str, Enum):
+    TWSE = "twse"
+    US = "us"
+    # crypto, forex, futures, foreign listings and anything else unknown, treated as always trading
+    OTHER = "other"
+
+    @property
+    def hours(self) -> TradingHours | None:
+        return MARKET_HOURS.get(self)
+
+
+# regular sessions on weekdays, exchange holidays are treated as trading days, so a quote fetched on a holiday
+# is only cached for the open TTL
+MARKET_HOURS: Final[dict[Market, TradingHours]] = {
+    Market.TWSE: TradingHours(ZoneInfo("Asia/Taipei"), time(9, 0), time(13, 30)),
+    Market.US: TradingHours(ZoneInfo("America/New_York"), time(9, 30), time(16, 0)),
+}
+
+
+def get_market(symbol: str) -> Market:
+    """Guess the market of a Yahoo Finance or TWSE symbol from its shape, e.g. 2330, 2330.TW and 6488.TWO trade on
+    TWSE. US listings cannot be told apart by shape, only the symbol index knows them.
+    """
+    symbol = symbol.upper()
+    if symbol.isdigit() or symbol.endswith((".TW", ".TWO")):
+        return Market.TWSE
+    return Market.OTHER
+
+
+def is_open(market: Market, now: datetime | None = None) -> bool:
+    hours = market.hours
+    if hours is None:
+        return True
+
+    local = (now or datetime.now(hours.timezone)).astimezone(hours.timezone)
+    return local.weekday() < 5 and hours.open <= local.time() < hours.close
+
+
+def next_open(market: Market, now: datetime | None = None) -> datetime:
+    hours = market.hours
+    if hours is None:
+        return now or datetime.now(UTC)
+
+    local = (now or datetime.now(hours.timezone)).astimezone(hours.timezone)
+
+    day = local.date() if local.time() < hours.open else local.date() + timedelta(days=1)
+    while day.weekday() >= 5:
+        day += timedelta(days=1)
+    return datetime.combine(day, hours.open, tzinfo=hours.timezone)
+
+
+def get_quote_ttl(market: Market, now: datetime | None = None) -> int:
+    """Cache quotes briefly while the market trades, and until the next open while it is closed."""
+    now = now or datetime.now(UTC)
+    if is_open(market, now):
+        return int(os.getenv("QUOTE_CACHE_OPEN_TTL", DEFAULT_OPEN_TTL))
+    return max(int((next_open(market, now) - now).total_seconds()), MIN_CLOSED_TTL)
+
+
+@cache
+def get_quote_cache() -> LRUCache:
+    return LRUCache(
+        get_cache_from_env(),
+        namespace="quote",
+        max_bytes=int(os.getenv("QUOTE_CACHE_MAX_BYTES", DEFAULT_QUOTE_CACHE_MAX_BYTES)),
+    )
+
+
+async def cached_quote(
+    source: str, symbol: str, fetch: Callable[[], Awaitable[str]], market: Market | None = None
+) -> str:
+    """Return the cached quote of the symbol from the source, or fetch and cache it.
+
+    Concurrent requests for the same quote share one upstream call. Empty results are not cached.
+
+    Args:
+        source: The upstream, e.g. yahoo or twse
+        symbol: The symbol as sent upstream
+        fetch: Fetches the formatted quote on a cache miss
+        market: The market that sets the TTL, guessed from the shape of the symbol by default
+
+    Returns:
+        The formatted quote
+    """
+    key = f"{source}:{symbol}"
+    quote_cache = get_quote_cache()
+
+    value = await quote_cache.get(key)
+    if value is not None:
+        return value
+
+    async def fetch_and_store() -> str:
+        value = await fetch()
+        if value:
+            await quote_cache.set(key, value, ttl=get_quote_ttl(market or get_market(symbol)))
+        return value
+
+    return await _single_flight.do(key, fetch_and_store)
+
+
+def find_symbol(arguments: dict[str, Any] | None) -> str | None:
+    for name in SYMBOL_ARGUMENTS:
+        value = (arguments or {}).get(name)
+        if isinstance(value, list) and value:
+            value = value[0]
+        if isinstance(value, str) and value:
+            return value
+    return None
+
+
+class QuoteCachingMCPServer(MCPServerStdio):
+    """An MCP server whose quote tools share the market-hours-aware quote cache.
+
+    Calls to the tools named in MCP_QUOTE_TOOLS that carry a symbol argument are cached, other calls pass through.
+    """
+
+    def __init__(self, params: Any, **kwargs: Any) -> None:
+        super().__init__(params, **kwargs)
+        self.quote_tools = {t.strip() for t in os.getenv("MCP_QUOTE_TOOLS", DEFAULT_MCP_QUOTE_TOOLS).split(",")}
+
+    async def call_tool(self, tool_name: str, arguments: dict[str, Any] | None) -> CallToolResult:
+        symbol = find_symbol(arguments)
+        if tool_name not in self.quote_tools or symbol is None:
+            return await super().call_tool(tool_name, arguments)
+
+        async def fetch() -> str:
+            result = await super(QuoteCachingMCPServer, self).call_tool(tool_name, arguments)
+            if result.isError:
+                logger.info("Not caching the failed {tool} call", tool=tool_name)
+                return ""
+            return result.model_dump_json()
+
+        digest = hashlib.sha256(json.dumps(arguments, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+        value = await cached_quote(f"mcp:{self.name}:{tool_name}", digest, fetch, market=get_market(symbol))
+        if not value:
+            # the failed result was not cached, call again to hand the error to the agent
+            return await super().call_tool(tool_name, arguments)
+        return CallToolResult.model_validate_json(value)
@@ -0,0 +1,336 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import functools
+import heapq
+import itertools
+import os
+import time
+from collections.abc import Callable
+from collections.abc import Coroutine
+from contextvars import ContextVar
+from enum import IntEnum
+from functools import cache
+from typing import Any
+from typing import Final
+from typing import TypeVar
+
+import httpx
+import logfire
+from loguru import logger
+from telegram.error import RetryAfter
+from telegram.ext import Application
+from telegram.ext import BaseRateLimiter
+from telegram.ext import CommandHandler
+
+from .utils import logfire_is_enabled
+
+DEFAULT_TELEGRAM_GLOBAL_RATE: Final[float] = 30.0
+DEFAULT_TELEGRAM_CHAT_RATE: Final[float] = 1.0
+DEFAULT_TELEGRAM_GROUP_RATE: Final[float] = 20 / 60
+DEFAULT_TELEGRAM_CHAT_BURST: Final[float] = 3.0
+DEFAULT_TELEGRAM_MAX_RETRIES: Final[int] = 3
+DEFAULT_OPENAI_RPM: Final[float] = 500.0
+DEFAULT_OPENAI_TPM: Final[float] = 200_000.0
+# room kept for the completion of a request whose max_tokens is unknown
+DEFAULT_COMPLETION_TOKENS: Final[int] = 1_000
+DEFAULT_RETRY_AFTER: Final[float] = 1.0
+# idle chat buckets are dropped once there are more than this many
+MAX_CHAT_BUCKETS: Final[int] = 10_000
+# long polling is not rate limited by Telegram and would hold a slot for its whole timeout
+UNLIMITED_ENDPOINTS: Final[frozenset[str]] = frozenset({"getUpdates"})
+
+T = TypeVar("T")
+
+
+class Priority(IntEnum):
+    HIGH = 0
+    NORMAL = 1
+    LOW = 2
+
+
+# the priority of the update being handled, inherited by the tasks it creates
+current_priority: ContextVar[Priority] = ContextVar("current_priority", default=Priority.NORMAL)
+
+
+class WaitStats:
+    def __init__(self) -> None:
+        self.count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, seconds: float) -> None:
+        self.count += 1
+        self.wait_total += seconds
+        self.wait_max = max(self.wait_max, seconds)
+
+    def as_dict(self) -> dict[str, float]:
+        return {
+            "count": self.count,
+            "wait_mean": self.wait_total / self.count if self.count else 0.0,
+            "wait_max": self.wait_max,
+        }
+
+
+# bucket kind -> priority -> queue wait
+_wait_stats: dict[str, dict[Priority, WaitStats]] = {}
+
+
+def record_wait(kind: str, priority: Priority, seconds: float) -> None:
+    _wait_stats.setdefault(kind, {}).setdefault(priority, WaitStats()).record(seconds)
+    if logfire_is_enabled():
+        get_wait_histogram().record(seconds, attributes={"bucket": kind, "priority": priority.name.lower()})
+
+
+def get_wait_stats() -> dict[str, dict[str, dict[str, float]]]:
+    return {
+        kind: {priority.name.lower(): stats.as_dict() for priority, stats in sorted(by_priority.items())}
+        for kind, by_priority in _wait_stats.items()
+    }
+
+
+@cache
+def get_wait_histogram() -> Any:
+    return logfire.metric_histogram("rate_limit.wait", unit="s", description="Time spent waiting for a rate limit")
+
+
+class TokenBucket:
+    """A token bucket whose waiters are served by priority, then in arrival order.
+
+    A waiter never overtakes one of the same or higher priority, so a large request is not starved by a stream of
+    small ones, while a HIGH request goes ahead of every queued LOW one.
+    """
+
+    def __init__(self, kind: str, rate: float, capacity: float) -> None:
+        self.kind = kind
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        # tokens accrue from here on, a pause moves it into the future
+        self.updated = time.monotonic()
+
+        self._waiters: list[tuple[Priority, int, float]] = []
+        self._counter = itertools.count()
+        self._condition = asyncio.Condition()
+
+    @property
+    def idle(self) -> bool:
+        self._refill()
+        return not self._waiters and self.tokens >= self.capacity
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        if now > self.updated:
+            self.tokens = min(self.tokens + (now - self.updated) * self.rate, self.capacity)
+            self.updated = now
+
+    def pause(self, seconds: float) -> None:
+        """Hand out no tokens for the next seconds, e.g. after the upstream asked to retry later."""
+        self.tokens = min(self.tokens, 0.0)
+        self.updated = max(self.updated, time.monotonic() + seconds)
+
+    async def acquire(self, amount: float = 1.0, priority: Priority | None = None) -> float:
+        """Wait until amount tokens are available and take them.
+
+        Returns:
+            The seconds spent waiting
+        """
+        priority = current_priority.get() if priority is None else priority
+        amount = min(amount, self.capacity)
+        start = time.monotonic()
+
+        async with self._condition:
+            entry = (priority, next(self._counter), amount)
+            heapq.heappush(self._waiters, entry)
+            try:
+                while True:
+                    self._refill()
+                    if self._waiters[0] is entry and self.tokens >= amount:
+                        break
+                    # the first waiter sleeps until its tokens accrue, the others until the first one is served
+                    timeout = None
+                    if self._waiters[0] is entry:
+                        timeout = (amount - self.tokens) / self.rate + max(self.updated - time.monotonic(), 0.0)
+                    with contextlib.suppress(TimeoutError):
+                        await asyncio.wait_for(self._condition.wait(), timeout=timeout)
+            except BaseException:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._condition.notify_all()
+                raise
+
+            heapq.heappop(self._waiters)
+            self.tokens -= amount
+            self._condition.notify_all()
+
+        waited = time.monotonic() - start
+        record_wait(self.kind, priority, waited)
+        return waited
+
+
+class TelegramRateLimiter(BaseRateLimiter[int]):
+    """Throttle Bot API requests with a global bucket and a bucket per chat.
+
+    Telegram allows about 30 messages per second overall, one per second in a private chat and 20 per minute in a
+    group. Requests wait in priority order, see Priority. A RetryAfter pauses the bucket it was raised for, and
+    the request is retried up to max_retries times, or rate_limit_args times if given.
+    """
+
+    def __init__(
+        self,
+        global_rate: float | None = None,
+        chat_rate: float | None = None,
+        group_rate: float | None = None,
+        chat_burst: float | None = None,
+        max_retries: int | None = None,
+    ) -> None:
+        global_rate = global_rate or float(os.getenv("TELEGRAM_GLOBAL_RATE", DEFAULT_TELEGRAM_GLOBAL_RATE))
+        self.chat_rate = chat_rate or float(os.getenv("TELEGRAM_CHAT_RATE", DEFAULT_TELEGRAM_CHAT_RATE))
+        self.group_rate = group_rate or float(os.getenv("TELEGRAM_GROUP_RATE", DEFAULT_TELEGRAM_GROUP_RATE))
+        self.chat_burst = chat_burst or float(os.getenv("TELEGRAM_CHAT_BURST", DEFAULT_TELEGRAM_CHAT_BURST))
+        self.max_retries = max_retries or int(os.getenv("TELEGRAM_MAX_RETRIES", DEFAULT_TELEGRAM_MAX_RETRIES))
+
+        self.global_bucket = TokenBucket("telegram_global", global_rate, global_rate)
+        self._chat_buckets: dict[int | str, TokenBucket] = {}
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    def get_chat_bucket(self, chat_id: int | str) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) >= MAX_CHAT_BUCKETS:
+                self._chat_buckets = {k: v for k, v in self._chat_buckets.items() if not v.idle}
+
+            # negative ids and @usernames are groups and channels
+            is_group = isinstance(chat_id, str) or chat_id < 0
+            rate = self.group_rate if is_group else self.chat_rate
+            bucket = self._chat_buckets[chat_id] = TokenBucket("telegram_chat", rate, self.chat_burst)
+        return bucket
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, bool | dict[str, Any] | list[dict[str, Any]]]],
+        args: Any,
+        kwargs: dict[str, Any],
+        endpoint: str,
+        data: dict[str, Any],
+        rate_limit_args: int | None,
+    ) -> bool | dict[str, Any] | list[dict[str, Any]]:
+        if endpoint in UNLIMITED_ENDPOINTS:
+            return await callback(*args, **kwargs)
+
+        chat_id = data.get("chat_id")
+        with contextlib.suppress(ValueError, TypeError):
+            chat_id = int(chat_id)  # type: ignore[arg-type]
+        chat_bucket = self.get_chat_bucket(chat_id) if isinstance(chat_id, int | str) else None
+
+        max_retries = rate_limit_args or self.max_retries
+        retries = 0
+        while True:
+            if chat_bucket is not None:
+                await chat_bucket.acquire()
+            await self.global_bucket.acquire()
+
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                retries += 1
+                if retries > max_retries:
+                    raise
+
+                seconds = e.retry_after if isinstance(e.retry_after, int | float) else e.retry_after.total_seconds()
+                logger.info("Telegram asked to retry {endpoint} after {seconds}s", endpoint=endpoint, seconds=seconds)
+                (chat_bucket or self.global_bucket).pause(seconds)
+
+
+def parse_retry_after(response: httpx.Response) -> float:
+    retry_after_ms = response.headers.get("retry-after-ms")
+    retry_after = response.headers.get("retry-after")
+    with contextlib.suppress(ValueError):
+        if retry_after_ms is not None:
+            return float(retry_after_ms) / 1000
+        if retry_after is not None:
+            return float(retry_after)
+    return DEFAULT_RETRY_AFTER
+
+
+def estimate_tokens(request: httpx.Request) -> int:
+    # about 4 bytes of JSON per prompt token, plus room for the completion
+    return len(request.content) // 4 + DEFAULT_COMPLETION_TOKENS
+
+
+class ModelRateLimiter:
+    """Keep model requests within the requests and tokens per minute of the account."""
+
+    def __init__(self, rpm: float | None = None, tpm: float | None = None) -> None:
+        rpm = rpm or float(os.getenv("OPENAI_RPM", DEFAULT_OPENAI_RPM))
+        tpm = tpm or float(os.getenv("OPENAI_TPM", DEFAULT_OPENAI_TPM))
+        self.requests = TokenBucket("model_requests", rpm / 60, rpm)
+        self.tokens = TokenBucket("model_tokens", tpm / 60, tpm)
+
+    async def acquire(self, tokens: int) -> None:
+        await self.requests.acquire()
+        await self.tokens.acquire(tokens)
+
+    def pause(self, seconds: float) -> None:
+        self.requests.pause(seconds)
+        self.tokens.pause(seconds)
+
+
+class RateLimitedTransport(httpx.AsyncBaseTransport):
+    """Wait for the model rate limits before each request, and pause them all when one gets a 429.
+
+    The OpenAI client retries the 429 itself, but only after the pause has been applied to every other request.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, limiter: ModelRateLimiter) -> None:
+        self.transport = transport
+        self.limiter = limiter
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await self.limiter.acquire(estimate_tokens(request))
+        response = await self.transport.handle_async_request(request)
+        if response.status_code == 429:
+            seconds = parse_retry_after(response)
+            logger.info("Model rate limited, pausing requests for {seconds}s", seconds=seconds)
+            self.limiter.pause(seconds)
+        return response
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+@cache
+def get_model_rate_limiter() -> ModelRateLimiter:
+    return ModelRateLimiter()
+
+
+def prioritize_handlers(application: Application, priorities: dict[str, Priority]) -> None:
+    """Run the callbacks of the given commands, and everything they send or ask the model, at their priority."""
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            if not isinstance(handler, CommandHandler):
+                continue
+
+            matched = [priorities[command] for command in handler.commands if command in priorities]
+            if matched:
+                handler.callback = with_priority(min(matched), handler.callback)
+
+
+def with_priority(
+    priority: Priority, callback: Callable[..., Coroutine[Any, Any, T]]
+) -> Callable[..., Coroutine[Any, Any, T]]:
+    @functools.wraps(callback)
+    async def wrapper(*args: Any, **kwargs: Any) -> T:
+        token = current_priority.set(priority)
+        try:
+            return await callback(*args, **kwargs)
+        finally:
+            current_priority.reset(token)
+
+    return wrapper
@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import csv
+import io
+import os
+from functools import cache
+from typing import Any
+from typing import Final
+from typing import NamedTuple
+
+from loguru import logger
+
+from .cache import get_cache_from_env
+from .loaders.http import get_http_client
+from .quotes import Market
+from .quotes import get_market
+
+TWSE_LISTINGS_URL: Final[str] = "https://openapi.twse.com.tw/v1/exchangeReport/STOCK_DAY_ALL"
+TPEX_LISTINGS_URL: Final[str] = "https://www.tpex.org.tw/openapi/v1/tpex_mainboard_daily_close_quotes"
+US_LISTINGS_URL: Final[str] = "https://www.nasdaqtrader.com/dynamic/SymDir/nasdaqtraded.txt"
+
+INDEX_KEY: Final[str] = "bot:symbols:index"
+DEFAULT_REFRESH_INTERVAL: Final[int] = 24 * 60 * 60
+
+# Yahoo Finance suffixes of the Taiwan exchanges
+TWSE_SUFFIX: Final[str] = "TW"
+TPEX_SUFFIX: Final[str] = "TWO"
+
+# common names people type instead of the ticker, Taiwan company names come with the listings
+US_ALIASES: Final[dict[str, str]] = {
+    "APPLE": "AAPL",
+    "MICROSOFT": "MSFT",
+    "GOOGLE": "GOOGL",
+    "ALPHABET": "GOOGL",
+    "AMAZON": "AMZN",
+    "NVIDIA": "NVDA",
+    "TESLA": "TSLA",
+    "NETFLIX": "NFLX",
+    "FACEBOOK": "META",
+    "BERKSHIRE": "BRK-B",
+    "BITCOIN": "BTC-USD",
+    "ETHEREUM": "ETH-USD",
+}
+
+
+class Listing(NamedTuple):
+    symbol: str
+    market: Market
+
+
+class SymbolIndex:
+    """Map what users type to a canonical Yahoo Finance symbol and the exchange it trades on.
+
+    Taiwan codes are kept with their exchange suffix only, US symbols as a set and aliases as a flat dict, so the
+    whole index is a few hundred kilobytes.
+    """
+
+    def __init__(
+        self,
+        taiwan: dict[str, str] | None = None,
+        us: set[str] | frozenset[str] | None = None,
+        aliases: dict[str, str] | None = None,
+    ) -> None:
+        # code -> TW or TWO
+        self.taiwan = taiwan or {}
+        self.us = frozenset(us or ())
+        # upper case alias -> canonical symbol
+        self.aliases = {**US_ALIASES, **(aliases or {})}
+
+    def __len__(self) -> int:
+        return len(self.taiwan) + len(self.us)
+
+    def resolve(self, text: str) -> Listing:
+        """Resolve a symbol, e.g. 2330 to 2330.TW on TWSE. Unknown symbols are routed by their shape."""
+        text = text.strip()
+        symbol = self.aliases.get(text.upper(), text.upper())
+
+        code, _, suffix = symbol.partition(".")
+        if code in self.taiwan and suffix in ("", TWSE_SUFFIX, TPEX_SUFFIX):
+            return Listing(f"{code}.{self.taiwan[code]}", Market.TWSE)
+
+        # Yahoo Finance writes share classes with a dash, e.g. BRK-B
+        dashed = symbol.replace(".", "-")
+        if dashed in self.us:
+            return Listing(dashed, Market.US)
+
+        return Listing(symbol, get_market(symbol))
+
+    def to_dict(self) -> dict[str, Any]:
+        return {"taiwan": self.taiwan, "us": sorted(self.us), "aliases": self.aliases}
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> SymbolIndex:
+        return cls(taiwan=data["taiwan"], us=set(data["us"]), aliases=data["aliases"])
+
+
+async def fetch_taiwan_listings() -> tuple[dict[str, str], dict[str, str]]:
+    """Fetch the TWSE and TPEx listings from the open data APIs.
+
+    Returns:
+        The exchange suffix of each code, and the canonical symbol of each company name
+    """
+    client = get_http_client()
+    twse, tpex = await asyncio.gather(client.get(TWSE_LISTINGS_URL), client.get(TPEX_LISTINGS_URL))
+    twse.raise_for_status()
+    tpex.raise_for_status()
+
+    codes = {}
+    names = {}
+    for rows, code_field, name_field, suffix in [
+        (twse.json(), "Code", "Name", TWSE_SUFFIX),
+        (tpex.json(), "SecuritiesCompanyCode", "CompanyName", TPEX_SUFFIX),
+    ]:
+        for row in rows:
+            code = str(row.get(code_field, "")).strip()
+            if not code:
+                continue
+            codes[code] = suffix
+            name = str(row.get(name_field, "")).strip().upper()
+            if name:
+                names[name] = f"{code}.{suffix}"
+    return codes, names
+
+
+async def fetch_us_listings() -> set[str]:
+    """Fetch the symbols traded on US exchanges from the Nasdaq symbol directory."""
+    response = await get_http_client().get(US_LISTINGS_URL)
+    response.raise_for_status()
+
+    symbols = set()
+    for row in csv.DictReader(io.StringIO(response.text), delimiter="|"):
+        # the last line is the file creation time
+        symbol = row.get("Symbol")
+        if symbol and row.get("Test Issue") == "N":
+            symbols.add(symbol.replace(".", "-"))
+    return symbols
+
+
+async def build_symbol_index(previous: SymbolIndex | None = None) -> SymbolIndex:
+    """Build the index from the listings, keeping the part of the previous index whose source failed."""
+    previous = previous or SymbolIndex()
+    taiwan, us = await asyncio.gather(fetch_taiwan_listings(), fetch_us_listings(), return_exceptions=True)
+
+    if isinstance(taiwan, BaseException):
+        logger.warning("Failed to fetch Taiwan listings, got error: {error}", error=taiwan)
+        codes, names = previous.taiwan, {k: v for k, v in previous.aliases.items() if k not in US_ALIASES}
+    else:
+        codes, names = taiwan
+
+    if isinstance(us, BaseException):
+        logger.warning("Failed to fetch US listings, got error: {error}", error=us)
+        us = set(previous.us)
+
+    return SymbolIndex(taiwan=codes, us=us, aliases=names)
+
+
+class SymbolIndexService:
+    """Hold the symbol index and refresh it every refresh_interval seconds.
+
+    The index is also stored in the cache backend, so a restart resolves symbols right away instead of waiting
+    for the listings.
+    """
+
+    def __init__(self, refresh_interval: int | None = None) -> None:
+        self.refresh_interval = refresh_interval or int(
+            os.getenv("SYMBOL_INDEX_REFRESH_INTERVAL", DEFAULT_REFRESH_INTERVAL)
+        )
+        self.index = SymbolIndex()
+        self._task: asyncio.Task[None] | None = None
+
+    def resolve(self, text: str) -> Listing:
+        return self.index.resolve(text)
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+
+        try:
+            data = await get_cache_from_env().get(INDEX_KEY)
+        except Exception as e:
+            logger.warning("Failed to load the symbol index, got error: {error}", error=e)
+            data = None
+
+        if data is not None:
+            self.index = SymbolIndex.from_dict(data)
+            logger.info("Loaded {n} symbols", n=len(self.index))
+
+        self._task = asyncio.create_task(self._run(refresh_now=data is None))
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+
+    async def refresh(self) -> None:
+        self.index = await build_symbol_index(self.index)
+        logger.info("Refreshed the symbol index: {n} symbols", n=len(self.index))
+
+        try:
+            await get_cache_from_env().set(INDEX_KEY, self.index.to_dict(), ttl=2 * self.refresh_interval)
+        except Exception as e:
+            logger.warning("Failed to store the symbol index, got error: {error}", error=e)
+
+    async def _run(self, refresh_now: bool) -> None:
+        if not refresh_now:
+            await asyncio.sleep(self.refresh_interval)
+
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning("Failed to refresh the symbol index, got error: {error}", error=e)
+            await asyncio.sleep(self.refresh_interval)
+
+
+@cache
+def get_symbol_index() -> SymbolIndexService:
+    return SymbolIndexService()
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import math
+from abc import ABC
+from abc import abstractmethod
+from functools import cache
+
+import tiktoken
+from loguru import logger
+
+from .model import get_openai_model_name
+
+DEFAULT_ENCODING = "o200k_base"
+
+
+class Tokenizer(ABC):
+    @abstractmethod
+    def count(self, text: str) -> int: ...
+
+    @abstractmethod
+    def split(self, text: str, max_tokens: int) -> list[int]:
+        """Find the character offsets that cut the text into pieces of at most max_tokens tokens.
+
+        Args:
+            text: The text to split
+            max_tokens: The maximum number of tokens per piece
+
+        Returns:
+            The offsets of the cuts, excluding 0 and len(text)
+        """
+
+
+class TiktokenTokenizer(Tokenizer):
+    def __init__(self, encoding: tiktoken.Encoding) -> None:
+        self.encoding = encoding
+
+    def count(self, text: str) -> int:
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def split(self, text: str, max_tokens: int) -> list[int]:
+        tokens = self.encoding.encode(text, disallowed_special=())
+        _, offsets = self.encoding.decode_with_offsets(tokens)
+        return [offsets[i] for i in range(max_tokens, len(tokens), max_tokens) if 0 < offsets[i] < len(text)]
+
+
+class ApproximateTokenizer(Tokenizer):
+    """Estimate tokens without a BPE vocabulary: about 4 ASCII characters or 1 other character per token."""
+
+    def count(self, text: str) -> int:
+        non_ascii = sum(1 for char in text if not char.isascii())
+        return non_ascii + math.ceil((len(text) - non_ascii) / 4)
+
+    def split(self, text: str, max_tokens: int) -> list[int]:
+        cuts = []
+        ascii_chars = 0
+        other_chars = 0
+        for i, char in enumerate(text):
+            if char.isascii():
+                ascii_chars += 1
+            else:
+                other_chars += 1
+
+            if other_chars + math.ceil(ascii_chars / 4) > max_tokens:
+                cuts.append(i)
+                ascii_chars, other_chars = (1, 0) if char.isascii() else (0, 1)
+        return cuts
+
+
+@cache
+def get_tokenizer(model: str | None = None) -> Tokenizer:
+    model = model or get_openai_model_name()
+    try:
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding(DEFAULT_ENCODING)
+    except Exception as e:
+        # tiktoken downloads the vocabulary on first use
+        logger.warning("Failed to load tiktoken encoding for {model}, estimating tokens: {error}", model=model, error=e)
+        return ApproximateTokenizer()
+    return TiktokenTokenizer(encoding)
+
+
+def count_tokens(text: str, model: str | None = None) -> int:
+    return get_tokenizer(model).count(text)
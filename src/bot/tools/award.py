@@ -4,9 +4,11 @@ from agents import function_tool
 from loguru import logger
 from tripplus import RedemptionRequest
 
+from ..executor import run_in_executor
+
 
 @function_tool
-def search_award(ori: str, dst: str, cabin: Literal["y", "c", "f"], type: Literal["ow", "rt"]) -> str:
+async def search_award(ori: str, dst: str, cabin: Literal["y", "c", "f"], type: Literal["ow", "rt"]) -> str:
     """
     Search for award flight options between two airports.
 
@@ -32,6 +34,6 @@ def search_award(ori: str, dst: str, cabin: Literal["y", "c", "f"], type: Litera
     )
     logger.debug("RedemptionRequest: {req}", req=req)
 
-    resp = req.do().model_dump_json()
+    resp = (await run_in_executor(req.do)).model_dump_json()
     logger.debug("RedemptionResponse: {resp}", resp=resp)
     return resp
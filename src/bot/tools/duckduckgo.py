@@ -5,9 +5,11 @@ from agents import function_tool
 from bs4 import BeautifulSoup
 from duckduckgo_search import DDGS
 
+from ..executor import run_in_executor
+
 
 @function_tool
-def extract_content(url: str) -> str:
+async def extract_content(url: str) -> str:
     """Extract the main content from a webpage.
 
     Args:
@@ -17,7 +19,7 @@ def extract_content(url: str) -> str:
         The extracted content as a string.
     """
     try:
-        response = httpx.get(url, timeout=5)
+        response = await run_in_executor(httpx.get, url, timeout=5)
 
         soup = BeautifulSoup(response.content, "html.parser")
 
@@ -40,7 +42,7 @@ def extract_content(url: str) -> str:
 
 
 @function_tool
-def web_search(queries: list[str], max_results_per_query: int = 2) -> str:
+async def web_search(queries: list[str], max_results_per_query: int = 2) -> str:
     """Performs web searches for given queries and returns URLs.
 
     Args:
@@ -56,7 +58,7 @@ def web_search(queries: list[str], max_results_per_query: int = 2) -> str:
     try:
         urls = []
         for query in queries:
-            results = DDGS(proxies=None).text(query, max_results=max_results_per_query)
+            results = await run_in_executor(DDGS(proxies=None).text, query, max_results=max_results_per_query)
 
             for result in results:
                 link = result["href"]
@@ -3,9 +3,11 @@ from agents import function_tool
 from bs4 import BeautifulSoup
 from loguru import logger
 
+from ..executor import run_in_executor
+
 
 @function_tool
-def query_weblio(query: str) -> str:
+async def query_weblio(query: str) -> str:
     """Fetches the definitions of the query Japanese word from Weblio.
 
     Args:
@@ -17,7 +19,7 @@ def query_weblio(query: str) -> str:
     logger.info("Querying Weblio for {query}", query=query)
 
     url = f"https://www.weblio.jp/content/{query}"
-    response = httpx.get(url)
+    response = await run_in_executor(httpx.get, url)
     response.raise_for_status()
 
     soup = BeautifulSoup(response.text, "html.parser")
@@ -1,8 +1,10 @@
 from agents import function_tool
 
-from ..yahoo_finance import query_tickers
+from ..symbols import get_symbol_index
+from ..yahoo_finance import async_query_tickers
 
 
 @function_tool
-def query_ticker_from_yahoo_finance(symbols: list[str]) -> str:
-    return query_tickers(symbols)
+async def query_ticker_from_yahoo_finance(symbols: list[str]) -> str:
+    index = get_symbol_index()
+    return await async_query_tickers([index.resolve(symbol).symbol for symbol in symbols])
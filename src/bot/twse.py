@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from functools import partial
+from typing import Final
+
+from loguru import logger
+from twse.stock_info import get_stock_info
+
+from .executor import run_in_executor
+from .quotes import cached_quote
+
+DEFAULT_TWSE_TIMEOUT: Final[float] = 10.0
+
+
+def get_twse_timeout() -> float:
+    return float(os.getenv("TWSE_TIMEOUT", DEFAULT_TWSE_TIMEOUT))
+
+
+def to_channel(symbol: str) -> str:
+    """Convert a Yahoo Finance symbol to a TWSE channel, e.g. 2330.TW to tse_2330.tw and 6488.TWO to otc_6488.tw.
+
+    Bare codes are left as they are, the TWSE client then asks both exchanges.
+    """
+    code, _, suffix = symbol.upper().partition(".")
+    if suffix == "TW":
+        return f"tse_{code}.tw"
+    if suffix == "TWO":
+        return f"otc_{code}.tw"
+    return symbol
+
+
+def format_stock_info(symbol: str) -> str:
+    """Format the stock, or return an empty string when TWSE knows nothing about it so the miss is not cached."""
+    info = get_stock_info(to_channel(symbol))
+    if not info.msg_array:
+        return ""
+    return info.pretty_repr()
+
+
+async def query_stock(symbol: str, timeout: float | None = None) -> str:
+    """Fetch and format one TWSE stock through the quote cache, returning an empty string on failure.
+
+    A lookup that outlives the timeout is abandoned, its worker thread finishes in the background.
+    """
+    symbol = symbol.strip()
+    try:
+        return await asyncio.wait_for(
+            cached_quote("twse", symbol, partial(run_in_executor, format_stock_info, symbol)),
+            timeout=timeout or get_twse_timeout(),
+        )
+    except Exception as e:
+        logger.info("Failed to get TWSE stock {symbol}, got error: {error!r}", symbol=symbol, error=e)
+        return ""
+
+
+async def query_stocks(symbols: list[str], timeout: float | None = None) -> str:
+    """Query TWSE stocks concurrently, the output keeps their order and skips failures."""
+    results = await asyncio.gather(*[query_stock(symbol, timeout=timeout) for symbol in symbols])
+    return "\n\n".join(r for r in results if r).strip()
@@ -1,19 +1,17 @@
-import asyncio
-import concurrent.futures
 import functools
 import json
 import os
 import re
-from functools import cache
 from pathlib import Path
 from typing import Any
 
-import kabigon
 import logfire
-import telegraph
-from kabigon.compose import Compose
 from loguru import logger
 
+from .executor import run_in_executor
+from .loaders import get_loader_router
+from .loaders import load_url_cached
+
 
 def save_text(text: str, f: str) -> None:
     with open(f, "w") as fp:
@@ -40,53 +38,17 @@ def parse_url(s: str) -> str:
     return ""
 
 
-@functools.cache
-def get_telegraph_client() -> telegraph.Telegraph:
-    client = telegraph.Telegraph()
-    client.create_account(short_name="Narumi's Bot")
-    return client
-
-
-def create_page(title: str, **kwargs) -> str:
-    client = get_telegraph_client()
-
-    resp = client.create_page(title=title, **kwargs)
-    return resp["url"]
-
-
 def async_wrapper(func):
     @functools.wraps(func)
     async def wrapper(*args, **kwargs):
-        loop = asyncio.get_running_loop()
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            result = await loop.run_in_executor(executor, func, *args, **kwargs)
-            return result
+        return await run_in_executor(func, *args, **kwargs)
 
     return wrapper
 
 
-@cache
-def get_composed_loader() -> Compose:
-    return Compose(
-        [
-            kabigon.YoutubeLoader(),
-            kabigon.ReelLoader(),
-            kabigon.YtdlpLoader(),
-            kabigon.PDFLoader(),
-            kabigon.PlaywrightLoader(timeout=50_000, wait_until="networkidle"),
-            kabigon.PlaywrightLoader(timeout=10_000),
-        ]
-    )
-
-
-def load_url(url: str) -> str:
-    loader = get_composed_loader()
-    return loader.load(url)
-
-
 async def async_load_url(url: str) -> str:
-    loader = get_composed_loader()
-    return await loader.async_load(url)
+    loader = get_loader_router()
+    return await load_url_cached(url, loader.async_load)
 
 
 def logfire_is_enabled() -> bool:
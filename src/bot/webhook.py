@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import asyncio
+import hmac
+import os
+import secrets
+from typing import Final
+from urllib.parse import urlsplit
+
+import uvicorn
+from loguru import logger
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.responses import Response
+from starlette.routing import Route
+from telegram import Update
+from telegram.ext import Application
+
+from .processor import UpdateQueue
+
+DEFAULT_WEBHOOK_PATH: Final[str] = "/telegram"
+DEFAULT_QUEUE_TIMEOUT: Final[float] = 5.0
+# how long Telegram is asked to wait before redelivering an update the queue had no room for
+RETRY_AFTER_SECONDS: Final[int] = 5
+SECRET_TOKEN_HEADER: Final[str] = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def get_secret_token() -> str:
+    token = os.getenv("WEBHOOK_SECRET_TOKEN")
+    if not token:
+        # fine for a single instance, instances behind a load balancer must share the token
+        logger.warning("No webhook secret token provided, using a random one")
+        token = secrets.token_urlsafe(32)
+    return token
+
+
+def get_pending_updates(application: Application) -> int:
+    """Count the updates queued or still being processed."""
+    queue = application.update_queue
+    return queue.in_flight if isinstance(queue, UpdateQueue) else queue.qsize()
+
+
+def create_webhook_app(
+    application: Application,
+    secret_token: str,
+    path: str = DEFAULT_WEBHOOK_PATH,
+    queue_timeout: float | None = None,
+) -> Starlette:
+    """Create an ASGI app that feeds Telegram updates into the update queue of the application.
+
+    Requests without the secret token are rejected. When the update queue stays full for queue_timeout seconds
+    the update is refused with 503, so Telegram redelivers it later instead of the bot buffering without bound.
+    """
+    timeout = queue_timeout or float(os.getenv("WEBHOOK_QUEUE_TIMEOUT", DEFAULT_QUEUE_TIMEOUT))
+
+    async def receive_update(request: Request) -> Response:
+        if not hmac.compare_digest(request.headers.get(SECRET_TOKEN_HEADER, ""), secret_token):
+            logger.warning("Rejected a webhook request with a wrong secret token from {client}", client=request.client)
+            return Response(status_code=403)
+
+        try:
+            update = Update.de_json(await request.json(), application.bot)
+        except Exception as e:
+            logger.info("Rejected a malformed webhook update: {error}", error=e)
+            return Response(status_code=400)
+        if update is None:
+            return Response(status_code=400)
+
+        try:
+            await asyncio.wait_for(application.update_queue.put(update), timeout=timeout)
+        except TimeoutError:
+            logger.warning(
+                "Update queue is full ({size} updates), refusing update {update_id}",
+                size=get_pending_updates(application),
+                update_id=update.update_id,
+            )
+            return Response(status_code=503, headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
+
+        return Response(status_code=200)
+
+    async def health(request: Request) -> Response:
+        return JSONResponse({"running": application.running, "queued": get_pending_updates(application)})
+
+    return Starlette(
+        routes=[
+            Route(path, receive_update, methods=["POST"]),
+            Route("/healthz", health, methods=["GET"]),
+        ]
+    )
+
+
+async def serve_webhook(
+    application: Application,
+    webhook_url: str,
+    host: str,
+    port: int,
+    secret_token: str | None = None,
+) -> None:
+    """Run the application behind a webhook until the server is stopped, e.g. by SIGINT or SIGTERM.
+
+    The handlers, post_init and post_shutdown hooks are the same as in polling mode.
+    """
+    secret_token = secret_token or get_secret_token()
+    path = urlsplit(webhook_url).path or "/"
+    server = uvicorn.Server(
+        uvicorn.Config(
+            create_webhook_app(application, secret_token, path=path),
+            host=host,
+            port=port,
+            log_level="warning",
+        )
+    )
+
+    await application.initialize()
+    try:
+        if application.post_init:
+            await application.post_init(application)
+
+        await application.bot.set_webhook(
+            url=webhook_url,
+            allowed_updates=Update.ALL_TYPES,
+            secret_token=secret_token,
+        )
+        await application.start()
+        logger.info("Serving webhook {url} on {host}:{port}", url=webhook_url, host=host, port=port)
+
+        await server.serve()
+    finally:
+        if application.running:
+            await application.stop()
+            if application.post_stop:
+                await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
@@ -1,9 +1,16 @@
+import asyncio
 import re
+from functools import partial
 from typing import Any
+from typing import NamedTuple
 
 import yfinance as yf  # type: ignore
 from loguru import logger
 
+from .executor import run_in_executor
+from .quotes import cached_quote
+from .symbols import get_symbol_index
+
 
 class TickerError(Exception):
     """Exception raised for errors in ticker retrieval or processing."""
@@ -63,29 +70,93 @@ def format_value(value: float) -> str:
     return escape_markdown(f"{value:.2f}")
 
 
-def query_tickers(symbols: str | list[str]) -> str:
-    """Query multiple ticker symbols and return formatted information.
+class Quote(NamedTuple):
+    """The fields of a ticker that format_quote shows."""
+
+    symbol: str
+    short_name: str
+    open: float
+    high: float
+    low: float
+    last: float
+    previous_close: float
+    fifty_two_week_low: float
+    fifty_two_week_high: float
+    ask: float
+    bid: float
+    volume: float
+
+
+def normalize_symbols(symbols: str | list[str]) -> list[str]:
+    if isinstance(symbols, str):
+        symbols = [s.strip() for s in symbols.split(",") if s.strip()]
+
+    return [s.upper().strip() for s in symbols]
+
+
+def query_ticker(symbol: str) -> str:
+    """Fetch and format one ticker, returning an empty string on failure."""
+    try:
+        return format_quote(fetch_quote(symbol))
+    except Exception as e:
+        logger.info("Failed to get ticker for {symbol}, got error: {error}", symbol=symbol, error=e)
+        return ""
+
+
+async def async_query_tickers(symbols: str | list[str]) -> str:
+    """Query ticker symbols concurrently through the quote cache, the output keeps their order and skips failures.
 
     Args:
-        symbols: Single ticker symbol or list of symbols
+        symbols: Single ticker symbol, comma separated symbols or list of symbols
 
     Returns:
         Formatted string with ticker information
     """
-    if isinstance(symbols, str):
-        symbols = [s.strip() for s in symbols.split(",") if s.strip()]
+    # only listings the symbol index knows follow US market hours, anything else is cached as if trading
+    index = get_symbol_index()
+    results = await asyncio.gather(
+        *[
+            cached_quote("yahoo", s, partial(run_in_executor, query_ticker, s), market=index.resolve(s).market)
+            for s in normalize_symbols(symbols)
+        ]
+    )
+    return "\n\n".join(r for r in results if r).strip()
+
+
+def fetch_fast_quote(symbol: str) -> Quote:
+    """Fetch a quote from the chart API, which is much lighter than the quote summary behind Ticker.info.
+
+    The chart metadata has almost every field, fast_info fills in the rest from the same price history.
+    """
+    ticker = yf.Ticker(symbol)
+    metadata = ticker.get_history_metadata()
+    fast_info = ticker.fast_info
+    return Quote(
+        symbol=to_str(metadata.get("symbol", symbol)),
+        short_name=to_str(metadata.get("shortName") or metadata.get("longName") or symbol),
+        open=to_float(fast_info.open),
+        high=to_float(metadata.get("regularMarketDayHigh") or fast_info.day_high),
+        low=to_float(metadata.get("regularMarketDayLow") or fast_info.day_low),
+        last=to_float(metadata.get("regularMarketPrice") or fast_info.last_price),
+        previous_close=to_float(metadata.get("previousClose") or fast_info.previous_close),
+        fifty_two_week_low=to_float(metadata.get("fiftyTwoWeekLow") or fast_info.year_low),
+        fifty_two_week_high=to_float(metadata.get("fiftyTwoWeekHigh") or fast_info.year_high),
+        ask=0.0,
+        bid=0.0,
+        volume=to_float(metadata.get("regularMarketVolume") or fast_info.last_volume),
+    )
 
-    symbols = [s.upper().strip() for s in symbols]
 
-    results = []
-    for symbol in symbols:
-        try:
-            ticker = yf.Ticker(symbol)
-            results.append(format_ticker_info(ticker))
-        except Exception as e:
-            logger.info("Failed to get ticker for {symbol}, got error: {error}", symbol=symbol, error=e)
+def fetch_quote(symbol: str) -> Quote:
+    """Fetch a quote with the light path, falling back to Ticker.info for this symbol only."""
+    try:
+        quote = fetch_fast_quote(symbol)
+        check_quote(quote)
+        return quote
+    except Exception as e:
+        logger.info("Fast quote failed for {symbol}, falling back to info: {error}", symbol=symbol, error=e)
 
-    return "\n\n".join(results).strip()
+    return quote_from_info(get_info(yf.Ticker(symbol)))
 
 
 def get_info(ticker: yf.Ticker) -> dict:
@@ -110,6 +181,30 @@ def get_info(ticker: yf.Ticker) -> dict:
         raise TickerError(ticker.ticker, str(e)) from e
 
 
+def quote_from_info(info: dict) -> Quote:
+    symbol = to_str(info.get("symbol", "Unknown"))
+    return Quote(
+        symbol=symbol,
+        short_name=to_str(info.get("shortName", symbol)),
+        open=to_float(info.get("open")),
+        high=to_float(info.get("dayHigh")),
+        low=to_float(info.get("dayLow")),
+        last=to_float(info.get("currentPrice")),
+        previous_close=to_float(info.get("previousClose")),
+        fifty_two_week_low=to_float(info.get("fiftyTwoWeekLow")),
+        fifty_two_week_high=to_float(info.get("fiftyTwoWeekHigh")),
+        ask=to_float(info.get("ask")),
+        bid=to_float(info.get("bid")),
+        volume=to_float(info.get("volume")),
+    )
+
+
+def check_quote(quote: Quote) -> None:
+    # Check for essential data
+    if all(p == 0.0 for p in [quote.open, quote.high, quote.low]):
+        raise TickerError(quote.symbol, "Missing essential price data")
+
+
 def format_ticker_info(ticker: yf.Ticker) -> str:
     """Generate a formatted representation of ticker information.
 
@@ -119,36 +214,28 @@ def format_ticker_info(ticker: yf.Ticker) -> str:
     Returns:
         Formatted string with ticker information
     """
-    info = get_info(ticker)
+    return format_quote(quote_from_info(get_info(ticker)))
 
-    # Extract basic information
-    symbol = to_str(info.get("symbol", "Unknown"))
-    short_name = to_str(info.get("shortName", symbol))
-
-    # Extract price information
-    open_price = to_float(info.get("open"))
-    high_price = to_float(info.get("dayHigh"))
-    low_price = to_float(info.get("dayLow"))
-    last_price = to_float(info.get("currentPrice"))
-    previous_close = to_float(info.get("previousClose"))
-    fifty_two_week_low = to_float(info.get("fiftyTwoWeekLow"))
-    fifty_two_week_high = to_float(info.get("fiftyTwoWeekHigh"))
-    ask_price = to_float(info.get("ask"))
-    bid_price = to_float(info.get("bid"))
-    volume = to_float(info.get("volume"))
 
-    # Check for essential data
-    if all(p == 0.0 for p in [open_price, high_price, low_price]):
-        raise TickerError(symbol, "Missing essential price data")
+def format_quote(quote: Quote) -> str:
+    """Generate a formatted representation of a quote.
+
+    Args:
+        quote: The quote to format
+
+    Returns:
+        Formatted string with ticker information
+    """
+    check_quote(quote)
 
     # Calculate derived values: always return float
-    mid_price = (ask_price + bid_price) / 2  # ask_price and bid_price are floats
-    effective_last_price = last_price if last_price > 0.0 else mid_price
+    mid_price = (quote.ask + quote.bid) / 2
+    effective_last_price = quote.last if quote.last > 0.0 else mid_price
 
     # Calculate price change
     net_change = 0.0
-    if effective_last_price > 0.0 and previous_close > 0.0:
-        net_change = (effective_last_price / previous_close - 1.0) * 100
+    if effective_last_price > 0.0 and quote.previous_close > 0.0:
+        net_change = (effective_last_price / quote.previous_close - 1.0) * 100
 
     # Determine change indicator
     net_change_symbol = "⏸️"
@@ -159,13 +246,13 @@ def format_ticker_info(ticker: yf.Ticker) -> str:
 
     # Build the formatted output
     return (
-        f"📊 *{escape_markdown(short_name)} \\({escape_markdown(symbol)}\\)*\n"
-        f"Open: `{format_value(open_price)}`\n"
-        f"High: `{format_value(high_price)}`\n"
-        f"Low: `{format_value(low_price)}`\n"
+        f"📊 *{escape_markdown(quote.short_name)} \\({escape_markdown(quote.symbol)}\\)*\n"
+        f"Open: `{format_value(quote.open)}`\n"
+        f"High: `{format_value(quote.high)}`\n"
+        f"Low: `{format_value(quote.low)}`\n"
         f"Last: `{format_value(effective_last_price)}`\n"
         f"Change: {net_change_symbol} `{escape_markdown(f'{net_change:.2f}%')}`\n"
-        f"Volume: `{format_value(volume)}`\n"
-        f"52 Week Low: `{format_value(fifty_two_week_low)}`\n"
-        f"52 Week High: `{format_value(fifty_two_week_high)}`"
+        f"Volume: `{format_value(quote.volume)}`\n"
+        f"52 Week Low: `{format_value(quote.fifty_two_week_low)}`\n"
+        f"52 Week High: `{format_value(quote.fifty_two_week_high)}`"
     )
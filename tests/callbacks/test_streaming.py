@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from bot.callbacks.streaming import CURSOR
+from bot.callbacks.streaming import ERROR_TEXT
+from bot.callbacks.streaming import StreamingReply
+
+
+class FakeMessage:
+    def __init__(self) -> None:
+        self.texts: list[str] = []
+        self.reply: FakeMessage | None = None
+
+    async def reply_text(self, text: str, **kwargs) -> FakeMessage:
+        self.reply = FakeMessage()
+        self.reply.texts.append(text)
+        return self.reply
+
+    async def edit_text(self, text: str, **kwargs) -> FakeMessage:
+        self.texts.append(text)
+        return self
+
+
+async def chunks(*parts: str):
+    for part in parts:
+        yield part
+
+
+def test_streaming_reply_edits_placeholder() -> None:
+    async def run() -> list[str]:
+        message = FakeMessage()
+        reply = StreamingReply(message, title="Test", interval=0)  # type: ignore[arg-type]
+        text = await reply.stream(chunks("Hello", ", ", "world"))
+        await reply.finish(text)
+        assert message.reply is not None
+        return message.reply.texts
+
+    texts = asyncio.run(run())
+    assert texts[0] == "⏳"
+    assert texts[1:-1] == ["Hello" + CURSOR, "Hello, " + CURSOR, "Hello, world" + CURSOR]
+    assert texts[-1] == "Hello, world"
+
+
+def test_streaming_reply_throttles_edits() -> None:
+    async def run() -> list[str]:
+        message = FakeMessage()
+        reply = StreamingReply(message, title="Test", interval=60)  # type: ignore[arg-type]
+        text = await reply.stream(chunks(*"streaming"))
+        await reply.finish(text)
+        assert message.reply is not None
+        return message.reply.texts
+
+    assert asyncio.run(run()) == ["⏳", "streaming"]
+
+
+def test_streaming_reply_replaces_placeholder_on_error() -> None:
+    async def run() -> list[str]:
+        message = FakeMessage()
+        with pytest.raises(RuntimeError):
+            async with StreamingReply(message, title="Test") as reply:  # type: ignore[arg-type]
+                await reply.start()
+                raise RuntimeError("model call failed")
+        assert message.reply is not None
+        return message.reply.texts
+
+    assert asyncio.run(run()) == ["⏳", ERROR_TEXT]
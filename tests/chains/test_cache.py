@@ -0,0 +1,37 @@
+import asyncio
+
+from bot.cache import LRUCache
+from bot.cache import TieredCache
+from bot.chains import cache
+from bot.chains.cache import cached_response
+from bot.chains.cache import make_cache_key
+from bot.chains.keyword import Keywords
+
+
+def test_make_cache_key() -> None:
+    key = make_cache_key("gpt-4o-mini", "system", ["hello"], Keywords, 0.0)
+
+    assert key == make_cache_key("gpt-4o-mini", "system", ["hello"], Keywords, 0.0)
+    assert key != make_cache_key("gpt-4o-mini", "system", ["hello"], None, 0.0)
+    assert key != make_cache_key("gpt-4o", "system", ["hello"], Keywords, 0.0)
+    assert key != make_cache_key("gpt-4o-mini", "system", ["hello"], Keywords, 0.5)
+
+
+def test_cached_response(monkeypatch) -> None:
+    llm_cache = LRUCache(TieredCache(), namespace="llm", max_bytes=1024)
+    monkeypatch.setattr(cache, "get_llm_cache", lambda: llm_cache)
+
+    calls = 0
+
+    async def call() -> Keywords:
+        nonlocal calls
+        calls += 1
+        return Keywords(keywords=["a", "b"])
+
+    async def main() -> list[Keywords]:
+        return [await cached_response("key", call, Keywords) for _ in range(3)]
+
+    responses = asyncio.run(main())
+    assert calls == 1
+    assert all(response == Keywords(keywords=["a", "b"]) for response in responses)
+    assert llm_cache.hits == 2
@@ -0,0 +1,59 @@
+import pytest
+
+from bot.chains.chunker import chunk_spans
+from bot.chains.chunker import chunk_text
+from bot.tokens import ApproximateTokenizer
+
+tokenizer = ApproximateTokenizer()
+
+
+def test_chunk_text_covers_text() -> None:
+    text = "".join(f"Sentence number {i} is here. " for i in range(200))
+    spans = list(chunk_spans(text, max_tokens=50, tokenizer=tokenizer))
+
+    assert len(spans) > 1
+    assert spans[0].start == 0
+    assert spans[-1].end == len(text)
+    for prev, span in zip(spans, spans[1:], strict=False):
+        assert prev.end == span.start
+    for span in spans:
+        assert tokenizer.count(text[span.start : span.end]) <= 50
+        assert text[span.start : span.end].endswith(". ")
+
+
+def test_chunk_text_cjk() -> None:
+    text = "今日はいい天気ですね。" * 100
+    chunks = list(chunk_text(text, max_tokens=30, tokenizer=tokenizer))
+
+    assert "".join(chunks) == text
+    assert all(chunk.endswith("。") for chunk in chunks)
+    assert all(tokenizer.count(chunk) <= 30 for chunk in chunks)
+
+
+def test_chunk_text_prefers_paragraphs() -> None:
+    paragraph = "A short sentence. " * 5
+    text = "\n\n".join([paragraph] * 6)
+    chunks = list(chunk_text(text, max_tokens=60, tokenizer=tokenizer))
+
+    assert all(chunk.endswith("\n\n") for chunk in chunks[:-1])
+
+
+def test_chunk_text_long_sentence() -> None:
+    text = "字" * 95
+    chunks = list(chunk_text(text, max_tokens=10, tokenizer=tokenizer))
+
+    assert [len(chunk) for chunk in chunks] == [10] * 9 + [5]
+
+
+def test_chunk_text_overlap() -> None:
+    text = "".join(f"S{i}. " for i in range(100))
+    spans = list(chunk_spans(text, max_tokens=20, overlap_tokens=5, tokenizer=tokenizer))
+
+    for prev, span in zip(spans, spans[1:], strict=False):
+        assert span.start < prev.end
+    assert spans[-1].end == len(text)
+
+
+def test_chunk_text_invalid_overlap() -> None:
+    with pytest.raises(ValueError):
+        list(chunk_spans("text", max_tokens=10, overlap_tokens=10, tokenizer=tokenizer))
@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+from agents.exceptions import ModelBehaviorError
+
+from bot.chains import mapreduce
+from bot.chains.mapreduce import MapReduce
+from bot.tokens import ApproximateTokenizer
+
+
+@pytest.fixture(autouse=True)
+def approximate_tokenizer(monkeypatch):
+    monkeypatch.setattr(mapreduce, "get_tokenizer", lambda: ApproximateTokenizer())
+
+
+def test_map_reduce_single_chunk() -> None:
+    async def reduce_fn(text: str) -> int:
+        return len(text)
+
+    map_reduce = MapReduce(map_fn=lambda text: asyncio.sleep(0, text), reduce_fn=reduce_fn, max_tokens=100)
+    assert asyncio.run(map_reduce.run("short text.")) == len("short text.")
+    assert [timing.stage for timing in map_reduce.timings] == ["reduce"]
+
+
+def test_map_reduce_tree() -> None:
+    in_flight = 0
+    max_in_flight = 0
+
+    async def map_fn(text: str) -> str:
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.001)
+        in_flight -= 1
+        # each partial result is about half of the budget
+        return "x" * 160
+
+    async def reduce_fn(text: str) -> str:
+        return text
+
+    text = "A sentence of some length. " * 200
+    map_reduce = MapReduce(map_fn=map_fn, reduce_fn=reduce_fn, max_tokens=100, concurrency=3)
+    result = asyncio.run(map_reduce.run(text))
+
+    assert max_in_flight == 3
+    assert ApproximateTokenizer().count(result) <= 100
+    stages = {timing.stage for timing in map_reduce.timings}
+    assert {"map", "merge1", "reduce"} <= stages
+
+
+def test_map_reduce_retries() -> None:
+    attempts = 0
+
+    async def flaky(text: str) -> str:
+        nonlocal attempts
+        attempts += 1
+        if attempts == 1:
+            raise ModelBehaviorError("Invalid JSON when parsing the output")
+        return text
+
+    map_reduce = MapReduce(map_fn=flaky, reduce_fn=flaky, max_tokens=100)
+    assert asyncio.run(map_reduce.run("hello.")) == "hello."
+    assert map_reduce.timings[0].attempts == 2
+
+
+def test_map_reduce_leaves_other_errors_to_the_client() -> None:
+    attempts = 0
+
+    async def failing(text: str) -> str:
+        nonlocal attempts
+        attempts += 1
+        raise RuntimeError("rate limited")
+
+    map_reduce = MapReduce(map_fn=failing, reduce_fn=failing, max_tokens=100)
+    with pytest.raises(RuntimeError):
+        asyncio.run(map_reduce.run("hello."))
+    assert attempts == 1
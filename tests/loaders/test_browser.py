@@ -0,0 +1,152 @@
+import asyncio
+
+import pytest
+
+from bot.loaders.browser import BrowserPool
+
+
+class FakePage:
+    def __init__(self, context: "FakeContext") -> None:
+        self.context = context
+
+    async def goto(self, url, timeout=None, wait_until=None) -> None:
+        self.context.browser.open_pages += 1
+        self.context.browser.max_open_pages = max(self.context.browser.max_open_pages, self.context.browser.open_pages)
+        await asyncio.sleep(0.01)
+        self.context.browser.open_pages -= 1
+
+    async def content(self) -> str:
+        return "<html></html>"
+
+    async def evaluate(self, script):
+        return 0
+
+    async def close(self) -> None:
+        pass
+
+
+class FakeContext:
+    def __init__(self, browser: "FakeBrowser") -> None:
+        self.browser = browser
+        self.closed = False
+        self.crashed = False
+
+    async def new_page(self) -> FakePage:
+        if self.crashed:
+            raise RuntimeError("Target page, context or browser has been closed")
+        return FakePage(self)
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+class FakeBrowser:
+    def __init__(self) -> None:
+        self.contexts: list[FakeContext] = []
+        self.closed = False
+        self.open_pages = 0
+        self.max_open_pages = 0
+
+    def is_connected(self) -> bool:
+        return not self.closed
+
+    async def new_context(self) -> FakeContext:
+        context = FakeContext(self)
+        self.contexts.append(context)
+        return context
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+class FakeChromium:
+    def __init__(self) -> None:
+        self.browsers: list[FakeBrowser] = []
+
+    async def launch(self, headless=False) -> FakeBrowser:
+        browser = FakeBrowser()
+        self.browsers.append(browser)
+        return browser
+
+
+class MissingChromium:
+    async def launch(self, headless=False) -> FakeBrowser:
+        raise RuntimeError("Executable doesn't exist")
+
+
+class FakePlaywright:
+    def __init__(self) -> None:
+        self.chromium = FakeChromium()
+
+    async def stop(self) -> None:
+        pass
+
+
+def test_browser_pool_recycles() -> None:
+    async def main() -> FakePlaywright:
+        pool = BrowserPool(max_concurrency=2, max_pages_per_context=3, max_pages_per_browser=10)
+        playwright = FakePlaywright()
+        pool._playwright = playwright  # type: ignore[assignment]
+
+        await asyncio.gather(*[pool.fetch("https://example.com") for _ in range(12)])
+        assert pool.pages_loaded == 12
+        await pool.stop()
+        return playwright
+
+    playwright = asyncio.run(main())
+    browsers = playwright.chromium.browsers
+
+    # relaunched once after 10 pages, and the retired browser was closed
+    assert len(browsers) == 2
+    assert all(browser.closed for browser in browsers)
+    assert max(browser.max_open_pages for browser in browsers) <= 2
+    # contexts are reused up to 3 pages each
+    assert len(browsers[0].contexts) == 4
+
+
+def test_browser_pool_warm_up_without_chromium() -> None:
+    async def main() -> None:
+        pool = BrowserPool()
+        playwright = FakePlaywright()
+        playwright.chromium = MissingChromium()  # type: ignore[assignment]
+        pool._playwright = playwright  # type: ignore[assignment]
+
+        await pool.warm_up()
+        assert pool.browsers_launched == 0
+
+    asyncio.run(main())
+
+
+def test_browser_pool_releases_pages_after_stop() -> None:
+    async def main() -> None:
+        pool = BrowserPool(max_concurrency=1)
+        pool._playwright = FakePlaywright()  # type: ignore[assignment]
+
+        async with pool.page():
+            await pool.stop()
+
+        assert pool.pages_loaded == 1
+        assert pool.stats()["idle_contexts"] == 0
+
+    asyncio.run(main())
+
+
+def test_browser_pool_closes_contexts_that_fail_to_open_pages() -> None:
+    async def main() -> None:
+        pool = BrowserPool(max_concurrency=1, max_pages_per_browser=2)
+        playwright = FakePlaywright()
+        pool._playwright = playwright  # type: ignore[assignment]
+        await pool.start()
+        crashed = pool._idle[0].context
+        crashed.crashed = True  # type: ignore[attr-defined]
+
+        with pytest.raises(RuntimeError):
+            await pool.fetch("https://example.com")
+        assert crashed.closed  # type: ignore[attr-defined]
+        assert pool._active[playwright.chromium.browsers[0]] == 0  # type: ignore[index]
+
+        # the browser is still retired once its pages are done
+        await pool.fetch("https://example.com")
+        assert playwright.chromium.browsers[0].closed
+
+    asyncio.run(main())
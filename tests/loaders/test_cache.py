@@ -0,0 +1,17 @@
+import pytest
+
+from bot.loaders.cache import normalize_url
+
+
+@pytest.mark.parametrize(
+    "url, expected",
+    [
+        ("https://Example.com", "https://example.com/"),
+        ("https://example.com:443/a?b=2&a=1", "https://example.com/a?a=1&b=2"),
+        ("http://example.com:8080/a#section", "http://example.com:8080/a"),
+        ("https://example.com/a?utm_source=x&id=1&fbclid=y", "https://example.com/a?id=1"),
+        ("https://youtu.be/abc?si=xyz", "https://youtu.be/abc"),
+    ],
+)
+def test_normalize_url(url, expected):
+    assert normalize_url(url) == expected
@@ -0,0 +1,98 @@
+import asyncio
+
+import kabigon
+import pytest
+from kabigon.loader import Loader
+
+from bot.loaders.router import LoaderRouter
+from bot.loaders.router import UrlKind
+from bot.loaders.router import classify_url
+from bot.loaders.router import is_usable
+
+ARTICLE = "\n".join(
+    ["# Title", "Home | News | Sports"]
+    + [f"Paragraph {i} of the article explains the change in plain and readable words." for i in range(10)]
+)
+
+
+@pytest.mark.parametrize(
+    "url, expected",
+    [
+        ("https://www.youtube.com/watch?v=abc", UrlKind.YOUTUBE),
+        ("https://youtu.be/abc", UrlKind.YOUTUBE),
+        ("https://www.instagram.com/reel/abc/", UrlKind.REEL),
+        ("https://www.instagram.com/p/abc/", UrlKind.HTML),
+        ("https://vimeo.com/123456", UrlKind.MEDIA),
+        ("https://example.com/episode.mp3", UrlKind.MEDIA),
+        ("https://arxiv.org/pdf/2401.00001.pdf", UrlKind.PDF),
+        ("https://example.com/news/1", UrlKind.HTML),
+    ],
+)
+def test_classify_url(url, expected):
+    assert classify_url(url) == expected
+
+
+class FakeLoader(Loader):
+    def __init__(self, content: str, delay: float = 0.0, error: bool = False) -> None:
+        self.content = content
+        self.delay = delay
+        self.error = error
+
+    async def async_load(self, url: str) -> str:
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise RuntimeError("failed")
+        return self.content
+
+
+@pytest.mark.parametrize(
+    "content, expected",
+    [
+        (ARTICLE, True),
+        ("x" * 1000, False),
+        ("\n".join(f"[Link {i}](https://example.com/{i})" for i in range(100)), False),
+        ("You need to enable JavaScript to run this app.\n" + "<script src='app.js'></script>" * 20, False),
+        (ARTICLE + "\nSubscribe to continue reading this story.", False),
+        ("\n".join(["這是一段用中文寫成的文章內容。"] * 5), True),
+    ],
+)
+def test_is_usable(content, expected):
+    assert is_usable(content) == expected
+
+
+def test_router_hedges_and_falls_back():
+    router = LoaderRouter()
+    fast = FakeLoader(ARTICLE)
+    slow = FakeLoader(ARTICLE + "\nslow", delay=10)
+    router.routes[UrlKind.HTML] = [[FakeLoader("", error=True)], [slow, fast]]
+
+    content = asyncio.run(router.async_load("https://example.com"))
+    assert content == ARTICLE
+    assert router.stats["FakeLoader"].failures == 1
+    assert router.stats["FakeLoader"].successes == 1
+
+
+def test_router_skips_shell_pages():
+    router = LoaderRouter()
+    shell = FakeLoader("Please enable JavaScript and accept cookies to continue. " * 10)
+    browser = FakeLoader(ARTICLE, delay=0.1)
+    router.routes[UrlKind.HTML] = [[shell, browser]]
+
+    assert asyncio.run(router.async_load("https://example.com")) == ARTICLE
+
+
+def test_router_returns_short_pages_without_later_stages():
+    router = LoaderRouter()
+    teaser = "The first lines of the story are readable without a subscription."
+    later = FakeLoader(ARTICLE)
+    router.routes[UrlKind.HTML] = [[FakeLoader("x" * 1000), FakeLoader(teaser, delay=0.1)], [later]]
+
+    # the result with the most prose wins the stage, and the next stage never runs
+    assert asyncio.run(router.async_load("https://example.com")) == teaser
+    assert router.stats["FakeLoader"].successes == 2
+
+
+def test_router_uses_ytdlp_only_for_media():
+    router = LoaderRouter()
+    assert not any(isinstance(loader, kabigon.YtdlpLoader) for stage in router.routes[UrlKind.HTML] for loader in stage)
+    assert isinstance(router.routes[UrlKind.MEDIA][0][0], kabigon.YtdlpLoader)
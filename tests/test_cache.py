@@ -0,0 +1,112 @@
+import asyncio
+import json
+
+from fakeredis import FakeAsyncRedis
+
+from bot.cache import LRUCache
+from bot.cache import SingleFlight
+from bot.cache import TieredCache
+from bot.cache import create_redis_client
+from bot.cache import decode_value
+from bot.cache import encode_value
+
+
+def test_lru_cache_evicts_by_bytes() -> None:
+    async def main() -> None:
+        cache = LRUCache(TieredCache(), namespace="test", max_bytes=10)
+        await cache.set("a", "12345")
+        await cache.set("b", "12345")
+        assert await cache.get("a") == "12345"
+
+        # "b" is now the least recently used entry
+        await cache.set("c", "12345")
+        assert await cache.get("b") is None
+        assert await cache.get("a") == "12345"
+        assert await cache.get("c") == "12345"
+        assert cache.size == 10
+
+        # entries larger than the whole cache are not stored
+        await cache.set("d", "x" * 11)
+        assert await cache.get("d") is None
+
+    asyncio.run(main())
+
+
+def test_single_flight() -> None:
+    calls = 0
+
+    async def load() -> str:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "content"
+
+    async def main() -> list[str]:
+        single_flight: SingleFlight[str] = SingleFlight()
+        return await asyncio.gather(*[single_flight.do("key", load) for _ in range(5)])
+
+    assert asyncio.run(main()) == ["content"] * 5
+    assert calls == 1
+
+
+def test_encode_value_round_trip() -> None:
+    small = {"role": "user", "content": "哈囉"}
+    large = [small] * 100
+
+    assert encode_value(small).startswith(b"J")
+    assert encode_value(large).startswith(b"Z")
+    assert decode_value(encode_value(small)) == small
+    assert decode_value(encode_value(large)) == large
+
+    # values written by aiocache in earlier versions are plain JSON
+    assert decode_value(json.dumps(large).encode()) == large
+    assert decode_value(json.dumps("triage").encode()) == "triage"
+
+
+def test_tiered_cache_without_redis() -> None:
+    async def main() -> None:
+        cache = TieredCache(l1_max_bytes=100)
+        await cache.set("a", "x" * 40)
+        await cache.set("b", "y" * 40)
+        assert [await cache.get(key) for key in ["a", "b", "c"]] == ["x" * 40, "y" * 40, None]
+
+        # "a" is the least recently used entry
+        await cache.set("c", "z" * 40)
+        assert await cache.get("a") is None
+        assert await cache.get("c") == "z" * 40
+
+        await cache.delete("c")
+        assert await cache.get("c", default="missing") == "missing"
+
+        stats = cache.stats()
+        assert stats["l1"]["hits"] == 3
+        assert stats["l1"]["misses"] == 3
+
+    asyncio.run(main())
+
+
+def test_tiered_cache_skips_l1_for_shared_keys() -> None:
+    async def main() -> None:
+        l2 = FakeAsyncRedis()
+        worker, other = TieredCache(l2), TieredCache(l2)
+
+        await worker.set("bot:1:agent", "triage", local=False)
+        assert await worker.get("bot:1:agent", local=False) == "triage"
+        assert worker.l1.size == 0
+
+        # a chat moved to the other worker and back sees the agent it switched to at once
+        await other.set("bot:1:agent", "japanese", local=False)
+        assert await worker.get("bot:1:agent", local=False) == "japanese"
+
+        # without Redis the in-process tier is the only one
+        cache = TieredCache()
+        await cache.set("bot:1:agent", "triage", local=False)
+        assert await cache.get("bot:1:agent", local=False) == "triage"
+
+    asyncio.run(main())
+
+
+def test_create_redis_client_uses_pool_max_size() -> None:
+    client = create_redis_client("redis://localhost:6379/2?pool_max_size=3")
+    assert client.connection_pool.max_connections == 3
+    assert client.connection_pool.connection_kwargs["db"] == 2
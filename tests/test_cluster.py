@@ -0,0 +1,242 @@
+import asyncio
+import time
+from collections.abc import Callable
+from collections.abc import Coroutine
+from typing import Any
+
+import httpx
+import pytest
+from fakeredis import FakeAsyncRedis
+from redis.exceptions import ResponseError
+from telegram import Update
+from telegram.ext import Application
+from telegram.ext import ContextTypes
+from telegram.ext import TypeHandler
+from telegram.request import HTTPXRequest
+
+from bot.cluster import GROUP
+from bot.cluster import HANDED_OVER
+from bot.cluster import WORKERS_KEY
+from bot.cluster import ClusterWorker
+from bot.cluster import UpdatePublisher
+from bot.cluster import assign_partitions
+from bot.cluster import get_lease_key
+from bot.cluster import get_owner
+from bot.cluster import get_partition
+from bot.cluster import get_stream_key
+
+
+def test_get_partition() -> None:
+    chat = {"id": -1001234, "type": "supergroup"}
+    message = {"message_id": 1, "date": 0, "chat": chat, "text": "hi"}
+    update = Update.de_json({"update_id": 1, "message": message}, None)
+    assert update is not None
+    assert get_partition(update, 16) == -1001234 % 16
+
+    assert get_partition(Update(update_id=2), 16) == 0
+
+
+def test_assign_partitions() -> None:
+    workers = [f"worker-{i}" for i in range(4)]
+    assignments = {worker: assign_partitions(worker, workers, 64) for worker in workers}
+
+    # every partition has exactly one owner
+    assert sorted(p for partitions in assignments.values() for p in partitions) == list(range(64))
+    assert all(partitions for partitions in assignments.values())
+
+    # a joining worker only takes partitions, the others keep the rest
+    joined = [*workers, "worker-4"]
+    taken = assign_partitions("worker-4", joined, 64)
+    assert taken
+    for worker in workers:
+        assert assign_partitions(worker, joined, 64) == assignments[worker] - taken
+
+
+Callback = Callable[[Update, ContextTypes.DEFAULT_TYPE], Coroutine[Any, Any, None]]
+
+
+class BlockingFakeRedis(FakeAsyncRedis):
+    """fakeredis answers a blocking read at once, wait a little like Redis does when there is nothing to read."""
+
+    async def xreadgroup(self, *args: Any, **kwargs: Any) -> Any:
+        response = await super().xreadgroup(*args, **kwargs)
+        if not response and kwargs.get("block"):
+            await asyncio.sleep(0.01)
+        return response
+
+
+def make_update(update_id: int, chat_id: int = 42) -> Update:
+    chat = {"id": chat_id, "type": "private"}
+    update = Update.de_json({"update_id": update_id, "message": {"message_id": 1, "date": 0, "chat": chat}}, None)
+    assert update is not None
+    return update
+
+
+def build_application(
+    callback: Callback,
+) -> Application:
+    # answers getMe, the only Bot API call made when initializing
+    bot_user = {"id": 1, "is_bot": True, "first_name": "bot", "username": "bot"}
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, json={"ok": True, "result": bot_user}))
+    application = (
+        Application.builder()
+        .token("123:abc")
+        .base_url("http://bot-api.local/bot")
+        .request(HTTPXRequest(httpx_kwargs={"transport": transport}))
+        .updater(None)
+        .build()
+    )
+    application.add_handler(TypeHandler(Update, callback))
+    return application
+
+
+async def wait_until(condition: Callable[[], bool], timeout: float = 5.0) -> None:
+    async with asyncio.timeout(timeout):
+        while not condition():
+            await asyncio.sleep(0.01)
+
+
+def test_publisher_skips_duplicates_only_once_published() -> None:
+    async def run() -> None:
+        client = FakeAsyncRedis()
+        publisher = UpdatePublisher(client, partitions=1)
+
+        # a failed publish leaves no dedupe key behind, so the redelivered update still gets through
+        await client.set(get_stream_key(0), "not a stream")
+        with pytest.raises(ResponseError):
+            await publisher.publish(make_update(1))
+        await client.delete(get_stream_key(0))
+
+        assert await publisher.publish(make_update(1))
+        assert not await publisher.publish(make_update(1))
+        assert await client.xlen(get_stream_key(0)) == 1
+
+    asyncio.run(run())
+
+
+def test_partition_is_handed_over_after_its_updates_finish() -> None:
+    processed: list[tuple[str, int]] = []
+    blocked = asyncio.Event()
+
+    def record(name: str) -> Callback:
+        async def callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+            processed.append((name, update.update_id))
+            if update.update_id == 1:
+                await blocked.wait()
+
+        return callback
+
+    async def run() -> None:
+        client = BlockingFakeRedis()
+        publisher = UpdatePublisher(client, partitions=1)
+        old = ClusterWorker(build_application(record("old")), client, partitions=1, lease_ttl=0.6, claim_min_idle=0.1)
+        new = ClusterWorker(build_application(record("new")), client, partitions=1, lease_ttl=0.6, claim_min_idle=0.1)
+        # the joining worker wins the only partition
+        old.worker_id, new.worker_id = sorted(
+            ["worker-a", "worker-b"], key=lambda w: w == get_owner(0, ["worker-a", "worker-b"])
+        )
+
+        await old.application.initialize()
+        await new.application.initialize()
+        old_task = asyncio.create_task(old.run())
+        await wait_until(lambda: old.owned == {0})
+        await publisher.publish(make_update(1))
+        await wait_until(lambda: processed == [("old", 1)])
+
+        new_task = asyncio.create_task(new.run())
+        await wait_until(lambda: not old.owned)
+        await publisher.publish(make_update(2))
+        await asyncio.sleep(0.5)
+
+        # update 1 is still being processed, so the old worker keeps the lease and nobody reads update 2
+        assert await client.get(get_lease_key(0)) == old.worker_id.encode()
+        assert processed == [("old", 1)]
+
+        blocked.set()
+        await wait_until(lambda: processed == [("old", 1), ("new", 2)])
+        assert new.owned == {0}
+
+        old.stop()
+        new.stop()
+        await asyncio.gather(old_task, new_task)
+        assert await client.xpending(get_stream_key(0), GROUP) == {
+            "pending": 0,
+            "min": None,
+            "max": None,
+            "consumers": [],
+        }
+
+    asyncio.run(run())
+
+
+def test_new_owner_claims_unacknowledged_updates() -> None:
+    processed: list[int] = []
+
+    async def callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        processed.append(update.update_id)
+
+    async def run() -> None:
+        client = BlockingFakeRedis()
+        publisher = UpdatePublisher(client, partitions=1)
+        await client.xgroup_create(get_stream_key(0), GROUP, id="0", mkstream=True)
+        await publisher.publish(make_update(1))
+        # read by a worker that died before acknowledging it
+        await client.xreadgroup(GROUP, "dead", {get_stream_key(0): ">"})
+
+        worker = ClusterWorker(build_application(callback), client, partitions=1, lease_ttl=0.6, claim_min_idle=0.1)
+        await worker.application.initialize()
+        task = asyncio.create_task(worker.run())
+        await wait_until(lambda: worker.owned == {0})
+        await publisher.publish(make_update(2))
+        await wait_until(lambda: len(processed) == 2)
+        await asyncio.sleep(0.2)
+
+        worker.stop()
+        await task
+        assert processed == [1, 2]
+
+    asyncio.run(run())
+
+
+def test_entries_of_live_workers_are_claimed_only_once_stale() -> None:
+    processed: list[int] = []
+
+    async def callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        processed.append(update.update_id)
+
+    async def run() -> None:
+        client = BlockingFakeRedis()
+        publisher = UpdatePublisher(client, partitions=1)
+        await client.xgroup_create(get_stream_key(0), GROUP, id="0", mkstream=True)
+        worker = ClusterWorker(
+            build_application(callback),
+            client,
+            partitions=1,
+            lease_ttl=0.6,
+            claim_min_idle=0.1,
+            live_claim_min_idle=2.0,
+        )
+        # a live worker lost the partition: update 1 was handed over, update 2 may still be running there
+        worker.worker_id, alive = sorted(
+            ["worker-a", "worker-b"], key=lambda w: w != get_owner(0, ["worker-a", "worker-b"])
+        )
+        await client.zadd(WORKERS_KEY, {alive: time.time() + 60})
+        for update_id in (1, 2):
+            await publisher.publish(make_update(update_id))
+        response = await client.xreadgroup(GROUP, alive, {get_stream_key(0): ">"})
+        handed_over, _ = response[0][1]
+        await client.xclaim(get_stream_key(0), GROUP, HANDED_OVER, 0, [handed_over[0]], justid=True)
+
+        await worker.application.initialize()
+        task = asyncio.create_task(worker.run())
+        await wait_until(lambda: worker.owned == {0})
+        await publisher.publish(make_update(3))
+        await wait_until(lambda: processed == [1, 3])
+        await asyncio.sleep(0.5)
+        assert processed == [1, 3]
+
+        await wait_until(lambda: processed == [1, 3, 2])
+        worker.stop()
+        await task
+
+    asyncio.run(run())
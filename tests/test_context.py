@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+
+from bot import context
+from bot.cache import TieredCache
+from bot.context import ContextWindow
+from bot.tokens import ApproximateTokenizer
+
+
+@pytest.fixture(autouse=True)
+def approximate_tokenizer(monkeypatch):
+    monkeypatch.setattr(context, "get_tokenizer", lambda: ApproximateTokenizer())
+
+
+def test_context_window_folds_old_turns_into_summary(monkeypatch) -> None:
+    prompts: list[list[str]] = []
+
+    async def summarize_conversation(messages: list[str], previous_summary: str | None = None) -> str:
+        prompts.append(messages)
+        return "summary"
+
+    monkeypatch.setattr(context, "summarize_conversation", summarize_conversation)
+
+    # every message is 10 tokens
+    items = [{"role": "user", "content": f"{i:02d}" + "x" * 34} for i in range(6)]
+
+    async def main() -> tuple[list, list]:
+        window = ContextWindow(TieredCache(), max_tokens=25)
+        first = await window.build(1, items)
+        await asyncio.sleep(0)
+        second = await window.build(1, items)
+        await window.close()
+        return first, second
+
+    first, second = asyncio.run(main())
+
+    # the first turn drops the old items and summarizes them in the background
+    assert first == items[-2:]
+    assert len(prompts) == 1
+    assert [text[6:8] for text in prompts[0]] == ["00", "01", "02", "03"]
+
+    # the next turn reads the summary and has less room for items
+    assert second[0] == {"role": "system", "content": "Summary of the earlier conversation:\nsummary"}
+    assert second[1:] == items[-2:]
+    assert len(prompts) == 1
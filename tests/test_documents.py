@@ -0,0 +1,30 @@
+import pytest
+
+from bot import documents
+from bot.documents import make_digest
+from bot.documents import select_chunks
+from bot.tokens import ApproximateTokenizer
+
+
+@pytest.fixture(autouse=True)
+def approximate_tokenizer(monkeypatch):
+    monkeypatch.setattr(documents, "get_tokenizer", lambda: ApproximateTokenizer())
+
+
+def test_make_digest() -> None:
+    assert make_digest("short\n\ntext") == "short text"
+
+    digest = make_digest("word " * 1000, max_tokens=10)
+    assert digest.endswith("…")
+    assert ApproximateTokenizer().count(digest[:-1]) <= 10
+
+
+def test_select_chunks_prefers_chunks_matching_the_query() -> None:
+    paragraphs = [f"Paragraph {i} is about {topic}." for i, topic in enumerate(["cats", "dogs", "birds", "fish"])]
+    text = "\n\n".join(paragraphs)
+
+    assert select_chunks(text, "dogs", max_tokens=1_000) == text
+
+    selected = select_chunks(text, "what about birds?", max_tokens=10, chunk_tokens=10)
+    assert "birds" in selected
+    assert "cats" not in selected
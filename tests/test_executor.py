@@ -0,0 +1,28 @@
+import asyncio
+
+from bot.executor import get_executor_stats
+from bot.executor import run_in_executor
+from bot.executor import shutdown_executors
+
+
+def test_run_in_executor() -> None:
+    async def main() -> list[int]:
+        return await asyncio.gather(*[run_in_executor(pow, i, 2, pool="io") for i in range(10)])
+
+    assert asyncio.run(main()) == [i**2 for i in range(10)]
+
+    stats = get_executor_stats()["io"]
+    assert stats["completed"] >= 10
+    assert stats["queued"] == 0
+    assert stats["running"] == 0
+
+    shutdown_executors()
+    assert "io" not in get_executor_stats()
+
+
+def test_run_in_executor_kwargs() -> None:
+    async def main() -> int:
+        return await run_in_executor(int, "ff", base=16)
+
+    assert asyncio.run(main()) == 255
+    shutdown_executors()
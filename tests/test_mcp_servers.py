@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+import asyncio
+
+from bot.mcp_servers import MCPServerPool
+from bot.mcp_servers import get_server_key
+
+
+def test_get_server_key() -> None:
+    assert get_server_key({"command": "uvx", "args": ["yfmcp"]}) == get_server_key(
+        {"args": ["yfmcp"], "command": "uvx"}
+    )
+    assert get_server_key({"command": "uvx", "args": ["yfmcp"]}) != get_server_key(
+        {"command": "uvx", "args": ["twsemcp"]}
+    )
+
+
+def test_pool_shares_servers() -> None:
+    pool = MCPServerPool()
+    server = pool.get("yfmcp", {"command": "uvx", "args": ["yfmcp"]})
+
+    assert pool.get("yahoo", {"command": "uvx", "args": ["yfmcp"]}) is server
+    assert pool.get("twsemcp", {"command": "uvx", "args": ["twsemcp"]}) is not server
+
+
+def test_starting_server_lists_no_tools() -> None:
+    async def run() -> None:
+        pool = MCPServerPool()
+        # never answers the MCP handshake, like a package manager stuck resolving offline
+        server = pool.get("stuck", {"command": "sleep", "args": ["60"]})
+
+        async with asyncio.timeout(1):
+            assert await server.list_tools() == []
+            await pool.close()
+        assert pool.stats() == {"stuck": {"connected": False, "restarts": 0}}
+
+    asyncio.run(run())
@@ -0,0 +1,121 @@
+import asyncio
+
+from fakeredis import FakeAsyncRedis
+
+from bot.cache import TieredCache
+from bot.memory import BYTES_KEY
+from bot.memory import InMemoryMemoryStore
+from bot.memory import RedisMemoryStore
+from bot.memory import get_memory_key
+
+
+def test_in_memory_store_appends_and_trims() -> None:
+    async def main() -> None:
+        store = InMemoryMemoryStore()
+        await store.append(1, [{"role": "user", "content": str(i)} for i in range(3)], max_items=4)
+        await store.append(1, [{"role": "assistant", "content": str(i)} for i in range(3, 5)], max_items=4)
+
+        items = await store.get(1)
+        assert [item["content"] for item in items] == ["1", "2", "3", "4"]
+        assert [item["content"] for item in await store.get(1, limit=2)] == ["3", "4"]
+        assert await store.get(2) == []
+
+        # items read from the store are copies
+        items[0]["content"] = "changed"
+        assert (await store.get(1))[0]["content"] == "1"
+
+        await store.clear(1)
+        assert await store.get(1) == []
+
+    asyncio.run(main())
+
+
+def test_in_memory_store_enforces_quotas() -> None:
+    async def main() -> None:
+        store = InMemoryMemoryStore(max_bytes=110, max_chats=2)
+        item = {"role": "user", "content": "x" * 20}  # 51 bytes encoded
+
+        await store.append(1, [item] * 3)
+        assert len(await store.get(1)) == 2
+
+        await store.append(2, [item])
+        await store.append(1, [item])
+        await store.append(3, [item])
+
+        # chat 2 is the least recently active one
+        assert await store.get(2) == []
+        usage = await store.usage()
+        assert [(u.chat_id, u.items, u.bytes) for u in usage] == [(1, 2, 102), (3, 1, 51)]
+
+    asyncio.run(main())
+
+
+def test_redis_store_counts_bytes_incrementally() -> None:
+    async def main() -> None:
+        client = FakeAsyncRedis()
+        store = RedisMemoryStore(client, max_bytes=110, evict_interval=0)
+        item = {"role": "user", "content": "x" * 20}  # 51 bytes encoded
+
+        await store.append(1, [item] * 3, max_items=4)
+        assert len(await store.get(1)) == 2
+        assert (await store.usage())[0].bytes == 102
+
+        await store.append(1, [{"role": "user", "content": "y"}], max_items=2)
+        assert [i["content"] for i in await store.get(1)] == ["x" * 20, "y"]
+        assert (await store.usage())[0].bytes == 51 + 32
+
+        # an expired list starts over, a lost size is counted again
+        await client.delete(get_memory_key(1))
+        await store.append(1, [item])
+        assert (await store.usage())[0].bytes == 51
+        await client.hdel(BYTES_KEY, "1")
+        await store.append(1, [item])
+        assert (await store.usage())[0].bytes == 102
+
+    asyncio.run(main())
+
+
+def test_redis_store_evicts_periodically() -> None:
+    async def main() -> None:
+        client = FakeAsyncRedis()
+        store = RedisMemoryStore(client, max_chats=1, evict_interval=3600)
+        item = {"role": "user", "content": "x"}
+
+        await store.append(1, [item])
+        await store.append(2, [item])
+        assert await store.get(1) == [item]
+
+        store._next_evict = 0.0
+        await store.append(3, [item])
+        assert await store.get(1) == []
+        assert await store.get(2) == []
+        assert [u.chat_id for u in await store.usage()] == [3]
+
+    asyncio.run(main())
+
+
+def test_forgotten_chats_drop_their_agent_and_summary() -> None:
+    async def main() -> None:
+        cache = TieredCache()
+        store = InMemoryMemoryStore(max_chats=1, cache=cache)
+        for chat_id in (1, 2):
+            await cache.set(f"bot:{chat_id}:agent", "japanese")
+            await cache.set(f"bot:{chat_id}:summary", "earlier turns")
+            await store.append(chat_id, [{"role": "user", "content": "hi"}])
+
+        # chat 1 was evicted, chat 2 is cleared
+        await store.clear(2)
+        for chat_id in (1, 2):
+            assert await cache.get(f"bot:{chat_id}:agent") is None
+            assert await cache.get(f"bot:{chat_id}:summary") is None
+
+        client = FakeAsyncRedis()
+        redis_cache = TieredCache(client)
+        redis_store = RedisMemoryStore(client, max_chats=1, evict_interval=0)
+        for chat_id in (1, 2):
+            await redis_cache.set(f"bot:{chat_id}:agent", "japanese", local=False)
+            await redis_store.append(chat_id, [{"role": "user", "content": "hi"}])
+        assert await redis_cache.get("bot:1:agent", local=False) is None
+        assert await redis_cache.get("bot:2:agent", local=False) == "japanese"
+
+    asyncio.run(main())
@@ -0,0 +1,56 @@
+import asyncio
+import json
+import time
+
+from bot.monitor import LoopLagMonitor
+from bot.monitor import MetricsServer
+
+
+def test_monitor_attributes_stalls_to_the_handler() -> None:
+    monitor = LoopLagMonitor(interval=0.01, threshold=0.05)
+    stacks = []
+
+    def blocking_call() -> None:
+        time.sleep(0.2)
+
+    async def callback() -> None:
+        await asyncio.sleep(0.02)
+        stacks.append(monitor.current_stack())
+        blocking_call()
+
+    async def main() -> None:
+        await monitor.start()
+        await monitor.wrap("slow_callback", callback)()
+        await asyncio.sleep(0.05)
+        await monitor.stop()
+
+    asyncio.run(main())
+
+    assert monitor.stats.stalls_by_handler == {"slow_callback": 1}
+    assert monitor.stats.lag_max >= 0.1
+    assert "callback" in stacks[0]
+
+
+def test_metrics_server() -> None:
+    async def main() -> tuple[bytes, bytes]:
+        server = MetricsServer("127.0.0.1", 0)
+        await server.start()
+        assert server._server is not None
+        port = server._server.sockets[0].getsockname()[1]
+
+        responses = []
+        for path in ["/metrics", "/other"]:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+            responses.append(await reader.read())
+            writer.close()
+
+        await server.stop()
+        return responses[0], responses[1]
+
+    metrics, other = asyncio.run(main())
+
+    assert metrics.startswith(b"HTTP/1.1 200 OK")
+    body = json.loads(metrics.split(b"\r\n\r\n", 1)[1])
+    assert set(body) == {"event_loop", "executors", "cache", "loaders", "browser", "rate_limits", "mcp_servers"}
+    assert other.startswith(b"HTTP/1.1 404")
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from urllib.parse import parse_qs
+
+import httpx
+import pytest
+
+from bot.pages import TelegraphClient
+
+
+def test_create_page_creates_account_once_and_retries_flood_control() -> None:
+    calls: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        method = request.url.path.strip("/")
+        calls.append(method)
+        if method == "createAccount":
+            return httpx.Response(200, json={"ok": True, "result": {"access_token": "token"}})
+
+        values = parse_qs(request.content.decode())
+        assert values["access_token"] == ["token"]
+        assert json.loads(values["content"][0]) == [{"tag": "p", "children": ["hello"]}]
+        if calls.count("createPage") == 1:
+            return httpx.Response(200, json={"ok": False, "error": "FLOOD_WAIT_0"})
+        return httpx.Response(200, json={"ok": True, "result": {"url": "https://telegra.ph/Test-01-01"}})
+
+    async def run() -> list[str]:
+        client = TelegraphClient(transport=httpx.MockTransport(handler))
+        await client.start()
+        urls = [await client.create_page("Test", "<p>hello</p>") for _ in range(2)]
+        await client.close()
+        return urls
+
+    assert asyncio.run(run()) == ["https://telegra.ph/Test-01-01"] * 2
+    assert calls == ["createAccount", "createPage", "createPage", "createPage"]
+
+
+def test_retries_error_pages_and_only_unsent_page_creations() -> None:
+    calls: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        method = request.url.path.strip("/")
+        calls.append(method)
+        if method == "createAccount":
+            if calls.count("createAccount") == 1:
+                return httpx.Response(502, text="<html>Bad Gateway</html>")
+            if calls.count("createAccount") == 2:
+                return httpx.Response(200, text="<html>maintenance</html>")
+            return httpx.Response(200, json={"ok": True, "result": {"access_token": "token"}})
+
+        if calls.count("createPage") == 1:
+            raise httpx.ConnectError("connection refused", request=request)
+        raise httpx.ReadTimeout("timed out", request=request)
+
+    async def run() -> None:
+        client = TelegraphClient(transport=httpx.MockTransport(handler))
+        await client.start()
+        # the page may have been created before the read timed out, so it is not created again
+        with pytest.raises(httpx.ReadTimeout):
+            await client.create_page("Test", "<p>hello</p>")
+        await client.close()
+
+    asyncio.run(run())
+    assert calls == ["createAccount"] * 3 + ["createPage"] * 2
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import asyncio
+
+from telegram import Chat
+from telegram import Message
+from telegram import Update
+
+from bot.processor import ChatUpdateProcessor
+
+
+def make_update(update_id: int, chat_id: int) -> Update:
+    chat = Chat(id=chat_id, type=Chat.PRIVATE)
+    return Update(update_id=update_id, message=Message(message_id=update_id, date=None, chat=chat))  # type: ignore[arg-type]
+
+
+def test_chat_update_processor_orders_chats_and_runs_them_in_parallel() -> None:
+    events: list[tuple[int, str]] = []
+
+    async def handle(update_id: int, delay: float) -> None:
+        events.append((update_id, "start"))
+        await asyncio.sleep(delay)
+        events.append((update_id, "end"))
+
+    async def run() -> None:
+        processor = ChatUpdateProcessor(max_concurrent_updates=8)
+        await asyncio.gather(
+            processor.process_update(make_update(1, chat_id=1), handle(1, 0.05)),
+            processor.process_update(make_update(2, chat_id=1), handle(2, 0.0)),
+            processor.process_update(make_update(3, chat_id=2), handle(3, 0.0)),
+        )
+        assert processor.active_chats == 0
+
+    asyncio.run(run())
+
+    # the second update of chat 1 waits for the first, chat 2 does not
+    assert events.index((1, "end")) < events.index((2, "start"))
+    assert events.index((3, "end")) < events.index((1, "end"))
+
+
+def test_chat_update_processor_does_not_let_one_chat_take_every_slot() -> None:
+    async def run() -> None:
+        processor = ChatUpdateProcessor(max_concurrent_updates=2)
+        blocked = asyncio.Event()
+        flood = [
+            asyncio.create_task(processor.process_update(make_update(i, chat_id=1), blocked.wait())) for i in range(10)
+        ]
+        await asyncio.sleep(0)
+        assert processor.current_concurrent_updates == 1
+
+        # the other chat still gets a slot while chat 1 has a backlog
+        await asyncio.wait_for(processor.process_update(make_update(100, chat_id=2), asyncio.sleep(0)), timeout=1)
+
+        blocked.set()
+        await asyncio.gather(*flood)
+        assert processor.current_concurrent_updates == 0
+
+    asyncio.run(run())
@@ -0,0 +1,92 @@
+import asyncio
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from bot import quotes
+from bot.cache import LRUCache
+from bot.cache import TieredCache
+from bot.quotes import Market
+from bot.quotes import cached_quote
+from bot.quotes import get_market
+from bot.quotes import get_quote_ttl
+from bot.quotes import is_open
+from bot.quotes import next_open
+
+TAIPEI = ZoneInfo("Asia/Taipei")
+
+
+@pytest.fixture(autouse=True)
+def quote_cache(monkeypatch):
+    cache = LRUCache(TieredCache(), namespace="quote", max_bytes=1024)
+    monkeypatch.setattr(quotes, "get_quote_cache", lambda: cache)
+    return cache
+
+
+def test_get_market() -> None:
+    assert get_market("2330") == Market.TWSE
+    assert get_market("2330.tw") == Market.TWSE
+    assert get_market("6488.TWO") == Market.TWSE
+    # only the symbol index knows US listings
+    assert get_market("AAPL") == Market.OTHER
+    assert get_market("BTC-USD") == Market.OTHER
+    assert get_market("EURUSD=X") == Market.OTHER
+
+
+def test_market_hours() -> None:
+    # Friday 2025-01-10
+    assert is_open(Market.TWSE, datetime(2025, 1, 10, 10, 0, tzinfo=TAIPEI))
+    assert not is_open(Market.TWSE, datetime(2025, 1, 10, 14, 0, tzinfo=TAIPEI))
+    # 23:00 in Taipei is 10:00 in New York
+    assert is_open(Market.US, datetime(2025, 1, 10, 23, 0, tzinfo=TAIPEI))
+    assert not is_open(Market.TWSE, datetime(2025, 1, 11, 10, 0, tzinfo=TAIPEI))
+
+    assert next_open(Market.TWSE, datetime(2025, 1, 10, 14, 0, tzinfo=TAIPEI)) == datetime(
+        2025, 1, 13, 9, 0, tzinfo=TAIPEI
+    )
+    assert next_open(Market.TWSE, datetime(2025, 1, 13, 8, 0, tzinfo=TAIPEI)) == datetime(
+        2025, 1, 13, 9, 0, tzinfo=TAIPEI
+    )
+
+
+def test_get_quote_ttl() -> None:
+    assert get_quote_ttl(Market.TWSE, datetime(2025, 1, 10, 10, 0, tzinfo=TAIPEI)) == 30
+    assert get_quote_ttl(Market.TWSE, datetime(2025, 1, 13, 8, 0, tzinfo=TAIPEI)) == 60 * 60
+    assert get_quote_ttl(Market.TWSE, datetime(2025, 1, 13, 8, 59, 30, tzinfo=TAIPEI)) == 60
+    # crypto and other unknown symbols trade on weekends too
+    assert get_quote_ttl(Market.OTHER, datetime(2025, 1, 11, 10, 0, tzinfo=TAIPEI)) == 30
+
+
+def test_cached_quote_coalesces_and_caches() -> None:
+    calls = 0
+
+    async def fetch() -> str:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "quote"
+
+    async def main() -> None:
+        results = await asyncio.gather(*[cached_quote("yahoo", "AAPL", fetch) for _ in range(5)])
+        assert results == ["quote"] * 5
+        assert await cached_quote("yahoo", "AAPL", fetch) == "quote"
+
+    asyncio.run(main())
+    assert calls == 1
+
+
+def test_cached_quote_skips_empty_results() -> None:
+    calls = 0
+
+    async def fetch() -> str:
+        nonlocal calls
+        calls += 1
+        return ""
+
+    async def main() -> None:
+        assert await cached_quote("twse", "2330", fetch) == ""
+        assert await cached_quote("twse", "2330", fetch) == ""
+
+    asyncio.run(main())
+    assert calls == 2
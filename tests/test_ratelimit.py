@@ -0,0 +1,91 @@
+import asyncio
+
+import httpx
+import pytest
+from telegram.error import RetryAfter
+
+from bot.ratelimit import ModelRateLimiter
+from bot.ratelimit import Priority
+from bot.ratelimit import RateLimitedTransport
+from bot.ratelimit import TelegramRateLimiter
+from bot.ratelimit import TokenBucket
+from bot.ratelimit import current_priority
+from bot.ratelimit import get_wait_stats
+
+
+def test_token_bucket_serves_higher_priority_first() -> None:
+    order: list[str] = []
+
+    async def take(name: str, priority: Priority) -> None:
+        await bucket.acquire(priority=priority)
+        order.append(name)
+
+    async def main() -> None:
+        await bucket.acquire()
+        # queued in this order while the bucket is empty
+        await asyncio.gather(
+            take("low", Priority.LOW),
+            take("normal", Priority.NORMAL),
+            take("high", Priority.HIGH),
+        )
+
+    bucket = TokenBucket("test_bucket", rate=100, capacity=1)
+    asyncio.run(main())
+
+    assert order == ["high", "normal", "low"]
+    assert set(get_wait_stats()["test_bucket"]) == {"low", "normal", "high"}
+
+
+def test_token_bucket_pause() -> None:
+    async def main() -> float:
+        bucket = TokenBucket("test_pause", rate=1000, capacity=10)
+        bucket.pause(0.1)
+        return await bucket.acquire()
+
+    assert asyncio.run(main()) >= 0.09
+
+
+def test_telegram_rate_limiter_retries_after_flood_control() -> None:
+    calls: list[str] = []
+
+    async def send(text: str) -> dict:
+        calls.append(text)
+        if text == "flood" or len(calls) == 1:
+            raise RetryAfter(0)
+        return {"text": text}
+
+    async def main() -> None:
+        limiter = TelegramRateLimiter(chat_rate=100, group_rate=100, max_retries=1)
+        token = current_priority.set(Priority.HIGH)
+        try:
+            result = await limiter.process_request(send, ("hi",), {}, "sendMessage", {"chat_id": 42}, None)
+        finally:
+            current_priority.reset(token)
+        assert result == {"text": "hi"}
+
+        with pytest.raises(RetryAfter):
+            await limiter.process_request(send, ("flood",), {}, "sendMessage", {"chat_id": -42}, None)
+
+    asyncio.run(main())
+
+    assert calls == ["hi", "hi", "flood", "flood"]
+    assert get_wait_stats()["telegram_chat"]["high"]["count"] == 2
+
+
+def test_rate_limited_transport_pauses_on_429() -> None:
+    responses = [httpx.Response(429, headers={"retry-after-ms": "100"}), httpx.Response(200, json={})]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return responses.pop(0)
+
+    async def main() -> float:
+        limiter = ModelRateLimiter(rpm=60_000, tpm=10_000_000)
+        transport = RateLimitedTransport(httpx.MockTransport(handler), limiter)
+        async with httpx.AsyncClient(transport=transport) as client:
+            assert (await client.post("http://model.local/v1/chat/completions", json={})).status_code == 429
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            assert (await client.post("http://model.local/v1/chat/completions", json={})).status_code == 200
+            return loop.time() - start
+
+    assert asyncio.run(main()) >= 0.09
@@ -0,0 +1,42 @@
+import asyncio
+
+from bot import symbols
+from bot.quotes import Market
+from bot.symbols import Listing
+from bot.symbols import SymbolIndex
+from bot.symbols import build_symbol_index
+
+
+def test_resolve() -> None:
+    index = SymbolIndex(
+        taiwan={"2330": "TW", "6488": "TWO"}, us={"AAPL", "BRK-B", "GOOGL"}, aliases={"台積電": "2330.TW"}
+    )
+
+    assert index.resolve("2330") == Listing("2330.TW", Market.TWSE)
+    assert index.resolve("6488.tw") == Listing("6488.TWO", Market.TWSE)
+    assert index.resolve("台積電") == Listing("2330.TW", Market.TWSE)
+    assert index.resolve(" aapl ") == Listing("AAPL", Market.US)
+    assert index.resolve("brk.b") == Listing("BRK-B", Market.US)
+    assert index.resolve("google") == Listing("GOOGL", Market.US)
+    # unknown symbols are routed by their shape
+    assert index.resolve("9999") == Listing("9999", Market.TWSE)
+    assert index.resolve("^GSPC") == Listing("^GSPC", Market.OTHER)
+    assert index.resolve("bitcoin") == Listing("BTC-USD", Market.OTHER)
+
+    assert SymbolIndex.from_dict(index.to_dict()).resolve("6488") == Listing("6488.TWO", Market.TWSE)
+
+
+def test_build_symbol_index_keeps_previous_listings_on_failure(monkeypatch) -> None:
+    async def fetch_taiwan_listings():
+        return {"2330": "TW"}, {"台積電": "2330.TW"}
+
+    async def fetch_us_listings():
+        raise ConnectionError("unreachable")
+
+    monkeypatch.setattr(symbols, "fetch_taiwan_listings", fetch_taiwan_listings)
+    monkeypatch.setattr(symbols, "fetch_us_listings", fetch_us_listings)
+
+    index = asyncio.run(build_symbol_index(SymbolIndex(us={"AAPL"})))
+    assert index.resolve("台積電") == Listing("2330.TW", Market.TWSE)
+    assert index.resolve("AAPL") == Listing("AAPL", Market.US)
+    assert len(index) == 2
@@ -0,0 +1,39 @@
+import asyncio
+import time
+
+from twse.stock_info import StockInfoResponse
+
+from bot import quotes
+from bot import twse
+from bot.cache import LRUCache
+from bot.cache import TieredCache
+from bot.twse import query_stocks
+from bot.twse import to_channel
+
+
+def test_query_stocks_keeps_order_and_skips_failures(monkeypatch) -> None:
+    def format_stock_info(symbol: str) -> str:
+        if symbol == "BAD":
+            raise ValueError("not found")
+        time.sleep({"2330": 0.05, "SLOW": 0.5}.get(symbol, 0.0))
+        return f"stock {symbol}"
+
+    monkeypatch.setattr(twse, "format_stock_info", format_stock_info)
+    monkeypatch.setattr(quotes, "get_quote_cache", lambda: LRUCache(TieredCache(), namespace="quote", max_bytes=1024))
+
+    start = time.monotonic()
+    result = asyncio.run(query_stocks(["2330", "BAD", "SLOW", "0050 "], timeout=0.2))
+
+    assert result == "stock 2330\n\nstock 0050"
+    assert time.monotonic() - start < 0.5
+
+
+def test_to_channel() -> None:
+    assert to_channel("2330.TW") == "tse_2330.tw"
+    assert to_channel("6488.TWO") == "otc_6488.tw"
+    assert to_channel("2330") == "2330"
+
+
+def test_format_stock_info_returns_nothing_for_unknown_stocks(monkeypatch) -> None:
+    monkeypatch.setattr(twse, "get_stock_info", lambda channel: StockInfoResponse.model_construct(msg_array=[]))
+    assert twse.format_stock_info("9999") == ""
@@ -0,0 +1,130 @@
+import asyncio
+import json
+
+import httpx
+from telegram import Update
+from telegram.ext import Application
+from telegram.ext import ContextTypes
+from telegram.ext import MessageHandler
+from telegram.ext import filters
+from telegram.request import HTTPXRequest
+
+from bot.processor import ChatUpdateProcessor
+from bot.processor import UpdateQueue
+from bot.webhook import SECRET_TOKEN_HEADER
+from bot.webhook import create_webhook_app
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "bot", "username": "bot"}
+
+
+class FakeBotAPI:
+    """Answer Bot API calls locally and record them."""
+
+    def __init__(self) -> None:
+        self.calls: list[tuple[str, dict]] = []
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        method = request.url.path.rsplit("/", 1)[-1]
+        params = dict(httpx.QueryParams(request.content.decode())) if request.content else {}
+        self.calls.append((method, params))
+
+        if method == "getMe":
+            return httpx.Response(200, json={"ok": True, "result": BOT_USER})
+        if method == "sendMessage":
+            message = {"message_id": 2, "date": 0, "chat": {"id": int(params["chat_id"]), "type": "private"}}
+            return httpx.Response(200, json={"ok": True, "result": {**message, "text": params["text"]}})
+        return httpx.Response(200, json={"ok": True, "result": True})
+
+
+def make_update(update_id: int, text: str) -> dict:
+    chat = {"id": 42, "type": "private"}
+    user = {"id": 42, "is_bot": False, "first_name": "user"}
+    return {"update_id": update_id, "message": {"message_id": 1, "date": 0, "chat": chat, "from": user, "text": text}}
+
+
+def build_application(fake: FakeBotAPI, queue_size: int = 8) -> Application:
+    request = HTTPXRequest(httpx_kwargs={"transport": httpx.MockTransport(fake.handle)})
+    return (
+        Application.builder()
+        .token("123:abc")
+        .base_url("http://bot-api.local/bot")
+        .request(request)
+        .update_queue(UpdateQueue(queue_size))
+        .concurrent_updates(ChatUpdateProcessor(max_concurrent_updates=8))
+        .updater(None)
+        .build()
+    )
+
+
+def test_webhook_delivers_updates_to_handlers() -> None:
+    fake = FakeBotAPI()
+
+    async def echo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        assert update.message and update.message.text
+        await update.message.reply_text(update.message.text)
+
+    async def main() -> list[int]:
+        application = build_application(fake)
+        application.add_handler(MessageHandler(filters.TEXT, echo))
+        webhook = create_webhook_app(application, secret_token="secret", path="/telegram")
+
+        async with application:
+            await application.start()
+            transport = httpx.ASGITransport(app=webhook)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                statuses = [
+                    (await client.post("/telegram", json=make_update(1, "hi"), headers=headers)).status_code
+                    for headers in [{SECRET_TOKEN_HEADER: "secret"}, {SECRET_TOKEN_HEADER: "wrong"}, {}]
+                ]
+                statuses.append(
+                    (await client.post("/telegram", content=b"{", headers={SECRET_TOKEN_HEADER: "secret"})).status_code
+                )
+
+            for _ in range(100):
+                if any(method == "sendMessage" for method, _ in fake.calls):
+                    break
+                await asyncio.sleep(0.01)
+            await application.stop()
+        return statuses
+
+    assert asyncio.run(main()) == [200, 403, 403, 400]
+    assert [params["text"] for method, params in fake.calls if method == "sendMessage"] == ["hi"]
+
+
+def test_webhook_refuses_updates_when_the_queue_is_full() -> None:
+    fake = FakeBotAPI()
+
+    async def main() -> list[httpx.Response]:
+        application = build_application(fake, queue_size=1)
+        blocked = asyncio.Event()
+
+        async def wait(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+            await blocked.wait()
+
+        application.add_handler(MessageHandler(filters.TEXT, wait))
+        webhook = create_webhook_app(application, secret_token="secret", queue_timeout=0.05)
+
+        async with application:
+            await application.start()
+            transport = httpx.ASGITransport(app=webhook)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                headers = {SECRET_TOKEN_HEADER: "secret"}
+                responses = [await client.post("/telegram", json=make_update(1, "hi"), headers=headers)]
+                # the first update has left the queue but is still being processed
+                await asyncio.sleep(0.05)
+                responses.append(await client.post("/telegram", json=make_update(2, "hi"), headers=headers))
+                responses.append(await client.get("/healthz"))
+
+                blocked.set()
+                await application.update_queue.join()
+                responses.append(await client.post("/telegram", json=make_update(3, "hi"), headers=headers))
+            blocked.set()
+            await application.stop()
+        return responses
+
+    accepted, refused, health, accepted_again = asyncio.run(main())
+    assert accepted.status_code == 200
+    assert refused.status_code == 503
+    assert refused.headers["Retry-After"] == "5"
+    assert json.loads(health.content) == {"running": True, "queued": 1}
+    assert accepted_again.status_code == 200
@@ -1,6 +1,31 @@
-from bot.yahoo_finance import query_tickers
+import asyncio
+import time
 
+from bot import quotes
+from bot import yahoo_finance
+from bot.cache import LRUCache
+from bot.cache import TieredCache
+from bot.yahoo_finance import Quote
+from bot.yahoo_finance import async_query_tickers
 
-def test_query_tickers() -> None:
-    s = query_tickers("AAPL")
+
+def test_query_tickers(monkeypatch) -> None:
+    monkeypatch.setattr(quotes, "get_quote_cache", lambda: LRUCache(TieredCache(), namespace="quote", max_bytes=1024))
+    s = asyncio.run(async_query_tickers("AAPL"))
     assert "AAPL" in s
+
+
+def test_async_query_tickers_keeps_order_and_skips_failures(monkeypatch) -> None:
+    def fetch_quote(symbol: str) -> Quote:
+        if symbol == "BAD":
+            raise ValueError("no data")
+        time.sleep(0.05 if symbol == "AAPL" else 0.0)
+        return Quote(symbol, symbol.title(), 1.0, 2.0, 0.5, 1.5, 1.0, 0.1, 3.0, 0.0, 0.0, 100.0)
+
+    monkeypatch.setattr(yahoo_finance, "fetch_quote", fetch_quote)
+    monkeypatch.setattr(quotes, "get_quote_cache", lambda: LRUCache(TieredCache(), namespace="quote", max_bytes=1024))
+
+    result = asyncio.run(async_query_tickers(["aapl", "bad", "msft"]))
+    assert result.index("AAPL") < result.index("MSFT")
+    assert "BAD" not in result
+    assert "🔺 `50\\.00%`" in result